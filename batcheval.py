@@ -0,0 +1,228 @@
+# batcheval.py
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from bitboard import STEPS, UP_STEPS, DOWN_STEPS, FULL
+from encoding import POSITION_DTYPE, SIDES, load_positions
+from evaluation import WEIGHTS, ADVANCEMENT_ROWS, BACK_RANK_MASK, CENTRE_MASK
+
+# The features in the order of the columns of the feature matrix. Every feature is the
+# count of White minus the count of Red, see evaluation.py.
+FEATURES = ('man', 'king', 'advancement', 'centre', 'back_rank', 'mobility')
+
+# Positions evaluated at once, this bounds the memory of the temporary arrays
+CHUNK_SIZE = 65536
+
+
+def _weighted_planes(rows):
+    """
+    Function to split row weights into masks of the squares that have a bit of their weight set.
+    Args:
+        rows (list): (row mask, weight) pairs.
+    Returns:
+        list: (mask, bit value) pairs of the non-empty planes.
+    """
+    planes = []
+    for bit in range(max(weight for _, weight in rows).bit_length()):
+        mask = sum(row_mask for row_mask, weight in rows if weight >> bit & 1)
+        if mask:
+            planes.append((np.uint32(mask), 1 << bit))
+    return planes
+
+
+# The advancement is a count weighted by rows. It is split into bit planes, so it takes
+# three masked popcounts per color instead of one per row: (mask, factor) pairs.
+ADVANCEMENT_PLANES = {color: _weighted_planes(rows) for color, rows in ADVANCEMENT_ROWS.items()}
+# One step of a flying king in every direction, as (shift, source mask) parts with the
+# sign of the shift telling its direction, like bitboard.STEPS
+KING_STEPS = [[(shift, np.uint32(mask)) for shift, mask in parts] for parts in STEPS]
+MAN_STEPS = {'w': [(-shift, np.uint32(mask)) for shift, mask in UP_STEPS],
+             'r': [(shift, np.uint32(mask)) for shift, mask in DOWN_STEPS]}
+CENTRE = np.uint32(CENTRE_MASK)
+BACK_RANK = {color: np.uint32(mask) for color, mask in BACK_RANK_MASK.items()}
+
+if hasattr(np, 'bitwise_count'):
+    popcount = np.bitwise_count
+else:
+    # numpy before 2.0: the bits of every byte are looked up in a table
+    _BYTE_BITS = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+
+    def popcount(masks):
+        """
+        Function to count the set bits of every 32-bit mask.
+        """
+        masks = np.ascontiguousarray(masks, dtype=np.uint32)
+        return _BYTE_BITS[masks.view(np.uint8)].reshape(masks.shape + (4,)).sum(axis=-1, dtype=np.uint8)
+
+
+def _shift(masks, shift):
+    """
+    Function to shift masks by a signed amount, up the board (negative) or down (positive).
+    """
+    return masks << np.uint32(shift) if shift > 0 else masks >> np.uint32(-shift)
+
+
+def _mobility(men, kings, empty, player_color):
+    """
+    Function to count the non-capturing moves of one color in every position.
+    Returns:
+        ndarray: The counts as int32.
+    """
+    count = np.zeros(men.shape, dtype=np.int32)
+    for shift, mask in MAN_STEPS[player_color]:
+        count += popcount(_shift(men & mask, shift) & empty)
+    # flying kings: every direction is walked for all kings at once until they are blocked
+    for parts in KING_STEPS:
+        frontier = kings
+        while True:
+            reached = np.zeros_like(frontier)
+            for shift, mask in parts:
+                reached |= _shift(frontier & mask, shift)
+            frontier = reached & empty
+            if not frontier.any():
+                break
+            count += popcount(frontier)
+    return count
+
+
+def _side_features(own, kings, empty, player_color, out):
+    """
+    Function to add the feature counts of one color to the columns of a feature matrix.
+    """
+    men = own & ~kings
+    own_kings = own & kings
+    out[:, 0] += popcount(men)
+    out[:, 1] += popcount(own_kings)
+    for mask, factor in ADVANCEMENT_PLANES[player_color]:
+        out[:, 2] += popcount(men & mask).astype(np.int32) * factor
+    out[:, 3] += popcount(own & CENTRE)
+    out[:, 4] += popcount(men & BACK_RANK[player_color])
+    out[:, 5] += _mobility(men, own_kings, empty, player_color)
+
+
+def features(positions):
+    """
+    Function to compute the evaluation features of many positions at once.
+    Args:
+        positions (ndarray): Records with 'white', 'black' and 'kings' fields, e.g. an
+            array of encoding.POSITION_DTYPE or a file opened with encoding.load_positions.
+    Returns:
+        ndarray: An int32 matrix with a row per position and a column per feature of
+            FEATURES, the counts of White minus the counts of Red.
+    """
+    white = np.asarray(positions['white'], dtype=np.uint32)
+    black = np.asarray(positions['black'], dtype=np.uint32)
+    kings = np.asarray(positions['kings'], dtype=np.uint32)
+    empty = ~(white | black) & np.uint32(FULL)
+    white_part = np.zeros((len(white), len(FEATURES)), dtype=np.int32)
+    red_part = np.zeros_like(white_part)
+    _side_features(white, kings, empty, 'w', white_part)
+    _side_features(black, kings, empty, 'r', red_part)
+    white_part -= red_part
+    return white_part
+
+
+def weight_vector(weights=WEIGHTS):
+    """
+    Function to turn a weights dict into a vector in the order of FEATURES.
+    Features missing from the dict weigh 0.
+    """
+    return np.array([weights.get(name, 0) for name in FEATURES], dtype=np.float64)
+
+
+def evaluate_batch(positions, weights=WEIGHTS, chunk_size=CHUNK_SIZE):
+    """
+    Function to evaluate many positions at once, with the same scores as evaluation.evaluate.
+    Args:
+        positions (ndarray): Records with 'white', 'black', 'kings' and 'side' fields,
+            e.g. an array of encoding.POSITION_DTYPE or a memory-mapped position file.
+        weights (dict): The feature weights.
+        chunk_size (int): The number of positions evaluated at once.
+    Returns:
+        tuple: (scores, features). The scores are from the view of the side to move of
+            every position, the features are the matrix of features().
+    """
+    vector = weight_vector(weights)
+    scores = np.empty(len(positions), dtype=np.float64)
+    matrix = np.empty((len(positions), len(FEATURES)), dtype=np.int32)
+    for start in range(0, len(positions), chunk_size):
+        chunk = positions[start:start + chunk_size]
+        part = features(chunk)
+        matrix[start:start + len(part)] = part
+        score = part @ vector
+        # the features are White's counts minus Red's, Red sees them the other way round
+        score[np.asarray(chunk['side']) == SIDES['r']] *= -1
+        scores[start:start + len(part)] = score
+    return scores, matrix
+
+
+def pack_positions(positions, player_colors):
+    """
+    Function to put Position objects into a record array for evaluate_batch.
+    Args:
+        positions (list): The positions.
+        player_colors (str or list): The color to move in all positions, or in each one.
+    Returns:
+        ndarray: The records as encoding.POSITION_DTYPE.
+    """
+    records = np.zeros(len(positions), dtype=POSITION_DTYPE)
+    records['white'] = [position.white for position in positions]
+    records['black'] = [position.black for position in positions]
+    records['kings'] = [position.kings for position in positions]
+    if isinstance(player_colors, str):
+        records['side'] = SIDES[player_colors]
+    else:
+        records['side'] = [SIDES[color] for color in player_colors]
+    return records
+
+
+def evaluate_moves(position, player_color, moves, weights=WEIGHTS):
+    """
+    Function to evaluate the positions after every move of a position at once, e.g. the
+    leaves below a node at the search horizon or the root moves for move ordering.
+    Args:
+        position (Position): The position, it is the same again afterwards.
+        player_color (str): The color of the player to move.
+        moves (list): The moves to evaluate.
+        weights (dict): The feature weights.
+    Returns:
+        ndarray: The score after every move from the view of player_color.
+    """
+    children = []
+    for move in moves:
+        position.make(move, player_color)
+        children.append(position.copy())
+        position.unmake()
+    scores, _ = evaluate_batch(pack_positions(children, player_color), weights)
+    return scores
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python batcheval.py positions.ckps           (score a position file, print the speed)
+        python batcheval.py positions.ckps --limit 100000
+    """
+    parser = argparse.ArgumentParser(description="Evaluate a position file with vectorised numpy code.")
+    parser.add_argument("file", help="position file (encoding.py --positions)")
+    parser.add_argument("--limit", type=int, default=None, help="evaluate only the first N positions")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="positions evaluated at once")
+    args = parser.parse_args(argv)
+
+    positions = load_positions(args.file)[:args.limit]
+    started = time.perf_counter()
+    scores, matrix = evaluate_batch(positions, chunk_size=args.chunk)
+    elapsed = time.perf_counter() - started
+    print(f"{len(scores)} positions in {elapsed:.3f}s, {len(scores) / elapsed if elapsed > 0 else 0:.0f} positions/s")
+    if len(scores):
+        print(f"mean score {scores.mean():.1f}, mean features "
+              + ", ".join(f"{name} {value:.2f}" for name, value in zip(FEATURES, matrix.mean(axis=0))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
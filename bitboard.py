@@ -0,0 +1,973 @@
+# bitboard.py
+
+# Only the 32 dark squares of the board are playable. They are numbered row by row
+# from the top of the board (row 0 is rank 8), four squares per row:
+#     square = row * 4 + col // 2
+# Every set of pieces is stored as a 32-bit int mask where bit N stands for square N.
+
+from collections import namedtuple
+
+from zobrist import PIECE_KEYS, WHITE_MAN, WHITE_KING, RED_MAN, RED_KING, hash_masks
+
+FULL = 0xFFFFFFFF
+
+# (row, col) of every square and the reverse lookup
+SQUARE_TO_RC = [(sq // 4, 2 * (sq % 4) + (1 if (sq // 4) % 2 == 0 else 0)) for sq in range(32)]
+RC_TO_SQUARE = {rc: sq for sq, rc in enumerate(SQUARE_TO_RC)}
+
+# Diagonal directions as (row step, col step). White moves up the board, red moves down.
+UP_LEFT, UP_RIGHT, DOWN_LEFT, DOWN_RIGHT = 0, 1, 2, 3
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+FORWARD = {'w': (UP_LEFT, UP_RIGHT), 'r': (DOWN_LEFT, DOWN_RIGHT)}
+# Row on which a man of the given color is promoted to a king
+PROMOTION_ROW_MASK = {'w': 0x0000000F, 'r': 0xF0000000}
+
+
+def _build_steps():
+    """
+    Function to build the shift tables for one step in every direction.
+    The index distance to a diagonal neighbour depends on the parity of the row, so
+    every direction is split into (shift, source mask) parts, one per row parity.
+    Returns:
+        list: For every direction a list of (shift, source mask) tuples.
+    """
+    steps = []
+    for dr, dc in DIRECTIONS:
+        parts = {}
+        for sq, (row, col) in enumerate(SQUARE_TO_RC):
+            target = RC_TO_SQUARE.get((row + dr, col + dc))
+            if target is not None:
+                parts[target - sq] = parts.get(target - sq, 0) | (1 << sq)
+        steps.append(sorted(parts.items()))
+    return steps
+
+
+def _build_jumps():
+    """
+    Function to build the shift tables for a man's jump in every direction.
+    Returns:
+        list: For every direction a list of (step shift, jump shift, source mask) tuples,
+            where the step shift leads to the jumped square and the jump shift to the landing square.
+    """
+    jumps = []
+    for dr, dc in DIRECTIONS:
+        parts = {}
+        for sq, (row, col) in enumerate(SQUARE_TO_RC):
+            middle = RC_TO_SQUARE.get((row + dr, col + dc))
+            target = RC_TO_SQUARE.get((row + 2 * dr, col + 2 * dc))
+            if target is not None:
+                key = (middle - sq, target - sq)
+                parts[key] = parts.get(key, 0) | (1 << sq)
+        jumps.append([(step, jump, mask) for (step, jump), mask in sorted(parts.items())])
+    return jumps
+
+
+STEPS = _build_steps()
+JUMPS = _build_jumps()
+
+# The same tables with unsigned shift amounts, split by the direction of the shift:
+# moving up the board lowers the square number (>>), moving down raises it (<<).
+# Parts of both directions with the same shift are merged, the shift alone still
+# tells where a target square came from.
+def _merge(parts):
+    """
+    Function to merge table parts with equal shifts by joining their source masks.
+    Args:
+        parts (iterable): Tuples of shift amounts followed by a source mask.
+    Returns:
+        list: The merged tuples sorted by their shift amounts.
+    """
+    merged = {}
+    for key_and_mask in parts:
+        *key, mask = key_and_mask
+        merged[tuple(key)] = merged.get(tuple(key), 0) | mask
+    return [(*key, mask) for key, mask in sorted(merged.items())]
+
+
+UP_STEPS = _merge((-shift, mask) for direction in (UP_LEFT, UP_RIGHT) for shift, mask in STEPS[direction])
+DOWN_STEPS = _merge((shift, mask) for direction in (DOWN_LEFT, DOWN_RIGHT) for shift, mask in STEPS[direction])
+# A jump always covers the same distance in one direction, only the square in the middle
+# depends on the row parity, so both parity parts of a direction are kept together:
+# (jump, step a, rest a, mask a, step b, rest b, mask b)
+UP_JUMPS = [(-jump_a, -step_a, step_a - jump_a, mask_a, -step_b, step_b - jump_b, mask_b)
+            for (step_a, jump_a, mask_a), (step_b, jump_b, mask_b) in (JUMPS[UP_LEFT], JUMPS[UP_RIGHT])]
+DOWN_JUMPS = [(jump_a, step_a, jump_a - step_a, mask_a, step_b, jump_b - step_b, mask_b)
+              for (step_a, jump_a, mask_a), (step_b, jump_b, mask_b) in (JUMPS[DOWN_LEFT], JUMPS[DOWN_RIGHT])]
+
+
+def _build_rays():
+    """
+    Function to build the diagonal rays of every square.
+    Returns:
+        list: For every direction and square a tuple of (square, bit) pairs along the
+            diagonal, starting with the nearest square.
+    """
+    rays = []
+    for dr, dc in DIRECTIONS:
+        per_square = []
+        for row, col in SQUARE_TO_RC:
+            ray = []
+            row_next, col_next = row + dr, col + dc
+            while (row_next, col_next) in RC_TO_SQUARE:
+                square = RC_TO_SQUARE[(row_next, col_next)]
+                ray.append((square, 1 << square))
+                row_next, col_next = row_next + dr, col_next + dc
+            per_square.append(tuple(ray))
+        rays.append(per_square)
+    return rays
+
+
+# Tables computed once at import time, all indexed by square number:
+# RAYS[direction][square]   the squares along a diagonal in order, as (square, bit) pairs
+# NEIGHBOURS[direction][square]   the next square on the diagonal, or None at the edge
+# KING_RAYS[square]   the non-empty rays of a square, for walking kings
+# MAN_CAPTURES[square]   (captured square, captured bit, landing square, landing bit) of every jump
+RAYS = _build_rays()
+NEIGHBOURS = [[ray[0][0] if ray else None for ray in per_square] for per_square in RAYS]
+KING_RAYS = [tuple(RAYS[direction][square] for direction in range(4) if RAYS[direction][square])
+             for square in range(32)]
+MAN_CAPTURES = [tuple((ray[0][0], ray[0][1], ray[1][0], ray[1][1]) for ray in KING_RAYS[square] if len(ray) > 1)
+                for square in range(32)]
+
+
+def count_bits(bits):
+    """
+    Function to count the squares in a mask.
+    """
+    return bits.bit_count()
+
+
+def iter_squares(bits):
+    """
+    Function to iterate over the square numbers of a mask from the lowest to the highest.
+    """
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+# Source masks of the steps by 3 and by 5 squares. Which diagonal they follow depends on
+# the row parity, the step by 4 follows the other one, so a step by 4 and a step by 3 or 5
+# in the same direction make a jump (4 + 5 = 9 or 4 + 3 = 7 squares).
+UP_MASK_3, UP_MASK_5 = dict(UP_STEPS)[3], dict(UP_STEPS)[5]
+DOWN_MASK_3, DOWN_MASK_5 = dict(DOWN_STEPS)[3], dict(DOWN_STEPS)[5]
+
+# Masks of target squares are turned into move tuples by table lookups, in chunks of
+# bits 0-10, 11-21 and 22-31: one lookup per chunk instead of a loop per target square.
+STEP_CHUNKS = ((0, 11), (11, 11), (22, 10))
+
+
+def _build_step_tables(start_of):
+    """
+    Function to build the lookup tables of one kind of step.
+    Args:
+        start_of (callable): Gives the start square of a step from its target square.
+    Returns:
+        tuple: For every chunk a tuple with the (start square, end square) tuples of
+            every value of the chunk, ordered by their end squares.
+    """
+    tables = []
+    for offset, size in STEP_CHUNKS:
+        table = []
+        for value in range(1 << size):
+            table.append(tuple((start_of(end), end) for end in iter_squares(value << offset)))
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+def _build_king_walks():
+    """
+    Function to build the tables of the non-capturing moves of a king along its rays.
+    The moves of a ray only depend on the nearest piece on it: the highest occupied
+    square of the ray for the rays up the board, the lowest one for the rays down.
+    Returns:
+        list: For every square a pair (rays up, rays down) of tuples of (ray mask, moves)
+            pairs, where moves[0] are the moves along the free ray and moves[square + 1]
+            those up to a piece on that square.
+    """
+    walks = []
+    for square in range(32):
+        up, down = [], []
+        for direction in range(4):
+            ray = RAYS[direction][square]
+            if not ray:
+                continue
+            moves = [None] * 33
+            moves[0] = tuple((square, target) for target, _ in ray)
+            for index, (blocker, _) in enumerate(ray):
+                moves[blocker + 1] = tuple((square, target) for target, _ in ray[:index])
+            walk = (sum(bit for _, bit in ray), tuple(moves))
+            (up if direction in FORWARD['w'] else down).append(walk)
+        walks.append((tuple(up), tuple(down)))
+    return walks
+
+
+# The men's steps: a step by 4 and one by 3 or 5 (see above) for each color,
+# the chunk tables of both joined into one tuple
+MAN_STEP_TABLES = {
+    'w': (_build_step_tables(lambda end: end + 4)
+          + _build_step_tables(lambda end: end + (3 if end // 4 % 2 else 5))),
+    'r': (_build_step_tables(lambda end: end - 4)
+          + _build_step_tables(lambda end: end - (5 if end // 4 % 2 else 3))),
+}
+# KING_WALKS[square]   the rays of a king as (ray mask, moves) pairs, see _build_king_walks
+KING_WALKS = _build_king_walks()
+
+
+# A complete legal move.
+#     path (tuple): The squares visited by the moving piece, from the start to the end square.
+#     captured (tuple): The squares of the captured pieces in the order they were jumped.
+#     promotion (bool): True if a man becomes a king during the move.
+Move = namedtuple('Move', ['path', 'captured', 'promotion'])
+
+# The tables of the non-capturing moves again with Move tuples, so legal_moves looks up
+# the moves themselves. A man is promoted when its step ends on the last row.
+MAN_MOVE_TABLES = {
+    color: tuple(tuple(tuple(Move(step, (), bool(PROMOTION_ROW_MASK[color] >> step[1] & 1)) for step in steps)
+                       for steps in table)
+                 for table in tables)
+    for color, tables in MAN_STEP_TABLES.items()
+}
+KING_MOVE_WALKS = [tuple(tuple((mask, tuple(steps and tuple(Move(step, (), False) for step in steps) for steps in walks))
+                               for mask, walks in rays)
+                         for rays in square_walks)
+                   for square_walks in KING_WALKS]
+
+
+class Position:
+    """
+    A checkers position stored as bitboards.
+    Moves can be made and taken back in place with make() and unmake(). Every make()
+    pushes a record of exactly what it changed on the undo stack, so unmake() restores
+    the position without copying or rescanning anything.
+    Attributes:
+        white (int): Mask of the white pieces (men and kings).
+        black (int): Mask of the red pieces (men and kings).
+        kings (int): Mask of the kings of both colors.
+        tagged (int): Mask of pieces already captured during the current move ('c' and 'C'
+            on the grid board). They stay in their color's mask and keep blocking the board
+            until the move is finished, but they can't be captured again.
+        hash (int): The Zobrist hash of the pieces (see zobrist.py), without the side to move.
+        counts (list): The number of white men, white kings, red men and red kings,
+            indexed by the piece kinds of zobrist.py.
+        undo_stack (list): The records of the moves made with make().
+    """
+    __slots__ = ('white', 'black', 'kings', 'tagged', 'hash', 'counts', 'undo_stack')
+
+    def __init__(self, white=0, black=0, kings=0, tagged=0, hash=None):
+        self.white = white
+        self.black = black
+        self.kings = kings
+        self.tagged = tagged
+        # the hash and the counts are computed from scratch only for new positions, moves update them
+        self.hash = hash_masks(white, black, kings) if hash is None else hash
+        self.counts = [(white & ~kings).bit_count(), (white & kings).bit_count(),
+                       (black & ~kings).bit_count(), (black & kings).bit_count()]
+        self.undo_stack = []
+
+    def __eq__(self, other):
+        return (isinstance(other, Position) and self.white == other.white and self.black == other.black
+                and self.kings == other.kings and self.tagged == other.tagged)
+
+    def __repr__(self):
+        return f"Position(white={self.white:#010x}, black={self.black:#010x}, kings={self.kings:#010x}, tagged={self.tagged:#010x})"
+
+    def copy(self):
+        """
+        Function to copy the position without its undo stack.
+        """
+        return Position(self.white, self.black, self.kings, self.tagged, self.hash)
+
+    def pieces(self, player_color):
+        """
+        Function to get the mask of a player's pieces.
+        Args:
+            player_color (str): The color of the player ('w' for white, 'r' for red).
+        """
+        return self.white if player_color == 'w' else self.black
+
+    def opponents(self, player_color):
+        """
+        Function to get the mask of the opponent's pieces that can still be captured.
+        Args:
+            player_color (str): The color of the current player ('w' for white, 'r' for red).
+        """
+        return (self.black if player_color == 'w' else self.white) & ~self.tagged
+
+    def empty(self):
+        """
+        Function to get the mask of the empty squares.
+        """
+        return ~(self.white | self.black) & FULL
+
+    def piece_count(self, player_color):
+        """
+        Function to get the number of pieces of a player.
+        Args:
+            player_color (str): The color of the player ('w' for white, 'r' for red).
+        """
+        counts = self.counts
+        return counts[WHITE_MAN] + counts[WHITE_KING] if player_color == 'w' else counts[RED_MAN] + counts[RED_KING]
+
+    def material(self, player_color, man=100, king=300):
+        """
+        Function to get the material of a player from the piece counts.
+        Args:
+            player_color (str): The color of the player ('w' for white, 'r' for red).
+            man (int): The value of a man.
+            king (int): The value of a king.
+        """
+        counts = self.counts
+        if player_color == 'w':
+            return man * counts[WHITE_MAN] + king * counts[WHITE_KING]
+        return man * counts[RED_MAN] + king * counts[RED_KING]
+
+    def make(self, move, player_color):
+        """
+        Function to make a complete move in place.
+        Tagged pieces are removed as well, since they belong to a move that has just been finished.
+        Args:
+            move (Move): The move to make.
+            player_color (str): The color of the current player ('w' for white, 'r' for red).
+        """
+        start, end = move.path[0], move.path[-1]
+        white, black, kings = self.white, self.black, self.kings
+        moved = (1 << start) | (1 << end) if start != end else 0
+        removed = self.tagged
+        for square in move.captured:
+            removed |= 1 << square
+        king = kings >> start & 1
+        promoted = 0 if king else int(move.promotion)
+        removed_white, removed_black, removed_kings = white & removed, black & removed, kings & removed
+
+        # hash update: the piece leaves its start square and arrives on its end square,
+        # possibly as a new king, and every removed piece leaves the board
+        own_kind = WHITE_MAN if player_color == 'w' else RED_MAN
+        delta = PIECE_KEYS[own_kind + king][start] ^ PIECE_KEYS[own_kind + (king | promoted)][end]
+        bits = removed
+        while bits:
+            low = bits & -bits
+            delta ^= PIECE_KEYS[(WHITE_MAN if white & low else RED_MAN) + (1 if kings & low else 0)][low.bit_length() - 1]
+            bits ^= low
+
+        self.undo_stack.append((player_color, start, end, king, promoted,
+                                removed_white, removed_black, removed_kings, self.tagged, delta))
+
+        kings &= ~removed
+        if king:
+            kings ^= moved
+        elif promoted:
+            kings |= 1 << end
+        if player_color == 'w':
+            self.white = (white ^ moved) & ~removed
+            self.black = black & ~removed
+        else:
+            self.white = white & ~removed
+            self.black = (black ^ moved) & ~removed
+        self.kings = kings
+        self.tagged = 0
+        self.hash ^= delta
+
+        counts = self.counts
+        if promoted:
+            counts[own_kind] -= 1
+            counts[own_kind + 1] += 1
+        if removed:
+            counts[WHITE_MAN] -= (removed_white & ~removed_kings).bit_count()
+            counts[WHITE_KING] -= (removed_white & removed_kings).bit_count()
+            counts[RED_MAN] -= (removed_black & ~removed_kings).bit_count()
+            counts[RED_KING] -= (removed_black & removed_kings).bit_count()
+
+    def unmake(self):
+        """
+        Function to take back the last move made with make().
+        """
+        (player_color, start, end, king, promoted,
+         removed_white, removed_black, removed_kings, tagged, delta) = self.undo_stack.pop()
+        moved = (1 << start) | (1 << end) if start != end else 0
+        kings = self.kings
+        if king:
+            kings ^= moved
+        elif promoted:
+            kings &= ~(1 << end)
+        self.kings = kings | removed_kings
+        if player_color == 'w':
+            self.white = (self.white ^ moved) | removed_white
+            self.black |= removed_black
+        else:
+            self.white |= removed_white
+            self.black = (self.black ^ moved) | removed_black
+        self.tagged = tagged
+        self.hash ^= delta
+
+        counts = self.counts
+        if promoted:
+            own_kind = WHITE_MAN if player_color == 'w' else RED_MAN
+            counts[own_kind] += 1
+            counts[own_kind + 1] -= 1
+        if removed_white or removed_black:
+            counts[WHITE_MAN] += (removed_white & ~removed_kings).bit_count()
+            counts[WHITE_KING] += (removed_white & removed_kings).bit_count()
+            counts[RED_MAN] += (removed_black & ~removed_kings).bit_count()
+            counts[RED_KING] += (removed_black & removed_kings).bit_count()
+
+
+def square_name(square):
+    """
+    Function to get the name of a square in 'a3' format.
+    Args:
+        square (int): The square number.
+    Returns:
+        str: The square name.
+    """
+    row, col = SQUARE_TO_RC[square]
+    return f"{chr(col + ord('a'))}{8 - row}"
+
+
+def move_to_notation(move):
+    """
+    Function to write a move in the notation the players type in, e.g. 'a3-b4' or 'c3-e5-c7'.
+    Args:
+        move (Move): The move to write.
+    Returns:
+        str: The move in 'a3-b4-d6' format.
+    """
+    return "-".join(square_name(square) for square in move.path)
+
+
+def from_board(board, with_hash=True):
+    """
+    Function to convert the 8x8 grid board into a bitboard position.
+    Args:
+        board (list): A 2D list representing the checkers board.
+        with_hash (bool): False to leave the hash at zero, for quick rule checks that
+            neither search nor make moves (computing it takes half of the time).
+    Returns:
+        Position: The same position as bitboards.
+    """
+    white = black = kings = tagged = 0
+    for sq, (row, col) in enumerate(SQUARE_TO_RC):
+        cell = board[row][col]
+        if cell == '.':
+            continue
+        bit = 1 << sq
+        if cell == 'w':
+            white |= bit
+        elif cell == 'r':
+            black |= bit
+        elif cell == 'W':
+            white |= bit
+            kings |= bit
+        elif cell == 'R':
+            black |= bit
+            kings |= bit
+        elif cell == 'c':
+            # red piece captured by white
+            black |= bit
+            tagged |= bit
+        elif cell == 'C':
+            # white piece captured by red
+            white |= bit
+            tagged |= bit
+    return Position(white, black, kings, tagged, None if with_hash else 0)
+
+
+def to_board(position):
+    """
+    Function to convert a bitboard position into the 8x8 grid board.
+    Args:
+        position (Position): The position to convert.
+    Returns:
+        list: A 2D list representing the checkers board.
+    """
+    board = [['.' for _ in range(8)] for _ in range(8)]
+    for sq, (row, col) in enumerate(SQUARE_TO_RC):
+        bit = 1 << sq
+        if position.white & bit:
+            if position.tagged & bit:
+                board[row][col] = 'C'
+            else:
+                board[row][col] = 'W' if position.kings & bit else 'w'
+        elif position.black & bit:
+            if position.tagged & bit:
+                board[row][col] = 'c'
+            else:
+                board[row][col] = 'R' if position.kings & bit else 'r'
+    return board
+
+
+def _man_steps(men, empty, player_color, tables=MAN_STEP_TABLES):
+    """
+    Function to get the non-capturing moves of a player's men, all of them at once
+    with two shifts and the lookups of the target squares.
+    Args:
+        men (int): Mask of the men.
+        empty (int): Mask of the empty squares.
+        player_color (str): The color of the men ('w' for white, 'r' for red).
+        tables (dict): MAN_STEP_TABLES for (start square, end square) tuples, MAN_MOVE_TABLES for Move tuples.
+    Returns:
+        list: The moves.
+    """
+    if player_color == 'w':
+        near = men >> 4 & empty
+        far = ((men & UP_MASK_5) >> 5 | (men & UP_MASK_3) >> 3) & empty
+    else:
+        near = men << 4 & empty
+        far = ((men & DOWN_MASK_5) << 5 | (men & DOWN_MASK_3) << 3) & empty
+    near_low, near_middle, near_high, far_low, far_middle, far_high = tables[player_color]
+    return [*near_low[near & 0x7FF], *near_middle[near >> 11 & 0x7FF], *near_high[near >> 22],
+            *far_low[far & 0x7FF], *far_middle[far >> 11 & 0x7FF], *far_high[far >> 22]]
+
+
+def _king_steps(square, occupied, walks=KING_WALKS):
+    """
+    Function to get the non-capturing moves of a flying king: along every ray up to the
+    nearest piece, looked up in the walk tables.
+    Args:
+        square (int): The square of the king.
+        occupied (int): Mask of the occupied squares.
+        walks (list): KING_WALKS for (start square, end square) tuples, KING_MOVE_WALKS for Move tuples.
+    Returns:
+        list: The moves.
+    """
+    up, down = walks[square]
+    moves = []
+    for mask, ray_moves in up:
+        moves += ray_moves[(occupied & mask).bit_length()]
+    for mask, ray_moves in down:
+        blockers = occupied & mask
+        moves += ray_moves[(blockers & -blockers).bit_length()]
+    return moves
+
+
+def _man_jumps(men, opponent, empty):
+    """
+    Function to get the capture steps of men, all of them at once. Men jump over a
+    neighbouring opponent's piece in any of the four directions: a step by 4 and then
+    one by 5 or 3, or the other way round (see UP_MASK_3).
+    Args:
+        men (int): Mask of the men.
+        opponent (int): Mask of the pieces that can be captured.
+        empty (int): Mask of the empty squares.
+    Returns:
+        list: A list of (start square, end square) tuples, by direction and end square.
+    """
+    up = men >> 4 & opponent
+    down = men << 4 & opponent
+    up_left = ((up & UP_MASK_5) >> 5 | ((men & UP_MASK_5) >> 5 & opponent) >> 4) & empty
+    up_right = ((up & UP_MASK_3) >> 3 | ((men & UP_MASK_3) >> 3 & opponent) >> 4) & empty
+    down_left = ((down & DOWN_MASK_3) << 3 | ((men & DOWN_MASK_3) << 3 & opponent) << 4) & empty
+    down_right = ((down & DOWN_MASK_5) << 5 | ((men & DOWN_MASK_5) << 5 & opponent) << 4) & empty
+    if not up_left | up_right | down_left | down_right:
+        return []
+    steps = []
+    # a jump up and left covers 9 squares, up and right 7, down and left 7, down and right 9
+    for landings, jump in ((up_left, 9), (up_right, 7), (down_left, -7), (down_right, -9)):
+        while landings:
+            low = landings & -landings
+            end = low.bit_length() - 1
+            steps.append((end + jump, end))
+            landings ^= low
+    return steps
+
+
+def _king_can_capture(square, empty, opponent):
+    """
+    Function to check if a king has a capture step.
+    Args:
+        square (int): The square of the king.
+        empty (int): Mask of the empty squares.
+        opponent (int): Mask of the pieces that can be captured.
+    Returns:
+        bool: True if the king can capture.
+    """
+    for ray in KING_RAYS[square]:
+        squares = iter(ray)
+        for _, bit in squares:
+            if not empty & bit:
+                break
+        else:
+            continue
+        if opponent & bit and empty & next(squares, (None, 0))[1]:
+            return True
+    return False
+
+
+def _king_captures(square, empty, opponent):
+    """
+    Function to get the capture steps of a flying king. The king walks up to the first
+    piece on a ray and lands on an empty square behind it. It may choose any of those
+    squares, unless it can go on capturing from some of them: then it has to land on
+    one of these.
+    Args:
+        square (int): The square of the king.
+        empty (int): Mask of the empty squares.
+        opponent (int): Mask of the pieces that can be captured.
+    Returns:
+        list: A list of (captured square, landing square) tuples.
+    """
+    steps = []
+    for ray in KING_RAYS[square]:
+        squares = iter(ray)
+        for taken, bit in squares:
+            if not empty & bit:
+                break
+        else:
+            continue
+        if not opponent & bit:
+            continue
+        landings = []
+        for landing, bit in squares:
+            if not empty & bit:
+                break
+            landings.append(landing)
+        if len(landings) > 1:
+            # after the step the king's square is empty, the captured piece stays until the end of the move
+            after = empty | (1 << square)
+            rest = opponent & ~(1 << taken)
+            going_on = [landing for landing in landings if _king_can_capture(landing, after & ~(1 << landing), rest)]
+            if going_on:
+                landings = going_on
+        steps += [(taken, landing) for landing in landings]
+    return steps
+
+
+def quiet_moves(position, player_color):
+    """
+    Function to get all non-capturing moves of a player.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        list: A list of (start square, end square) tuples, the men's moves first.
+    """
+    white, black, kings = position.white, position.black, position.kings
+    occupied = white | black
+    own = (white if player_color == 'w' else black) & ~position.tagged
+    moves = _man_steps(own & ~kings, occupied ^ FULL, player_color)
+    own_kings = own & kings
+    while own_kings:
+        low = own_kings & -own_kings
+        own_kings ^= low
+        moves += _king_steps(low.bit_length() - 1, occupied)
+    return moves
+
+
+def capture_steps(position, player_color, specific_square=None):
+    """
+    Function to get all single capture steps of a player.
+    Men capture in all four directions, kings capture along a whole diagonal, see _king_captures.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+        specific_square (int): A specific square to check for captures, if any.
+    Returns:
+        list: A list of (start square, end square) tuples, the men's steps first.
+    """
+    white, black, kings, tagged = position.white, position.black, position.kings, position.tagged
+    empty = ~(white | black) & FULL
+    # tagged pieces are left out of the opponent's mask, so they can't be captured twice
+    if player_color == 'w':
+        own, opponent = white & ~tagged, black & ~tagged
+    else:
+        own, opponent = black & ~tagged, white & ~tagged
+    if specific_square is not None:
+        own &= 1 << specific_square
+    captures = _man_jumps(own & ~kings, opponent, empty)
+    own_kings = own & kings
+    while own_kings:
+        low = own_kings & -own_kings
+        start = low.bit_length() - 1
+        own_kings ^= low
+        captures += [(start, landing) for _, landing in _king_captures(start, empty, opponent)]
+    return captures
+
+
+def legal_steps(position, player_color):
+    """
+    Function to get the steps a player can make: the capture steps if there are any
+    (captures are mandatory), the non-capturing moves otherwise. The same lists as
+    capture_steps and quiet_moves, with the masks computed once for both.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        list: A list of (start square, end square) tuples.
+    """
+    white, black, kings, tagged = position.white, position.black, position.kings, position.tagged
+    occupied = white | black
+    empty = occupied ^ FULL
+    if player_color == 'w':
+        own, opponent = white & ~tagged, black & ~tagged
+    else:
+        own, opponent = black & ~tagged, white & ~tagged
+    men = own & ~kings
+    steps = _man_jumps(men, opponent, empty)
+    own_kings = own & kings
+    if not own_kings:
+        return steps or _man_steps(men, empty, player_color)
+    squares = list(iter_squares(own_kings))
+    for start in squares:
+        steps += [(start, landing) for _, landing in _king_captures(start, empty, opponent)]
+    if steps:
+        return steps
+    steps = _man_steps(men, empty, player_color)
+    for start in squares:
+        steps += _king_steps(start, occupied)
+    return steps
+
+
+def _capture_sources(position, player_color):
+    """
+    Function to get the pieces of a player that have a first capture step, as a mask.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        int: Mask of the squares a capture sequence can start from.
+    """
+    white, black, kings, tagged = position.white, position.black, position.kings, position.tagged
+    empty = ~(white | black) & FULL
+    if player_color == 'w':
+        own, opponent = white & ~tagged, black & ~tagged
+    else:
+        own, opponent = black & ~tagged, white & ~tagged
+    sources = 0
+    for start, _ in _man_jumps(own & ~kings, opponent, empty):
+        sources |= 1 << start
+    own_kings = own & kings
+    while own_kings:
+        low = own_kings & -own_kings
+        own_kings ^= low
+        if _king_can_capture(low.bit_length() - 1, empty, opponent):
+            sources |= low
+    return sources
+
+
+def _piece_captures(square, king, empty, opponent):
+    """
+    Function to get the capture steps of a single piece.
+    Args:
+        square (int): The square of the piece.
+        king (bool): True if the piece is a king.
+        empty (int): Mask of the empty squares.
+        opponent (int): Mask of the pieces that can be captured.
+    Returns:
+        list: A list of (captured square, landing square) tuples.
+    """
+    if king:
+        return _king_captures(square, empty, opponent)
+    # a man lands right behind the captured piece
+    steps = []
+    for taken, taken_bit, landing, landing_bit in MAN_CAPTURES[square]:
+        if opponent & taken_bit and empty & landing_bit:
+            steps.append((taken, landing))
+    return steps
+
+
+def _extend_capture(moves, path, captured, square, king, promoted, empty, opponent, promotion_row):
+    """
+    Function to follow a capture sequence until the piece can't capture anymore.
+    Captured pieces stay on the board until the end of the move (the Turkish strike rule),
+    so they keep blocking the diagonals but can't be captured a second time.
+    Args:
+        moves (list): The list the finished moves are appended to.
+        path (list): The squares visited so far.
+        captured (list): The squares captured so far.
+        square (int): The current square of the piece.
+        king (bool): True if the piece is (already) a king.
+        promoted (bool): True if the piece was promoted during this move.
+        empty (int): Mask of the empty squares.
+        opponent (int): Mask of the opponent's pieces that can still be captured.
+        promotion_row (int): Mask of the squares where the piece is promoted.
+    """
+    steps = _piece_captures(square, king, empty, opponent)
+    if not steps:
+        moves.append(Move(tuple(path), tuple(captured), promoted))
+        return
+    for taken, landing in steps:
+        landing_bit = 1 << landing
+        # a man that reaches the last row continues the capture as a king
+        promote = not king and bool(landing_bit & promotion_row)
+        path.append(landing)
+        captured.append(taken)
+        _extend_capture(moves, path, captured, landing, king or promote, promoted or promote,
+                        (empty | (1 << square)) & ~landing_bit, opponent & ~(1 << taken), promotion_row)
+        path.pop()
+        captured.pop()
+
+
+def capture_moves(position, player_color):
+    """
+    Function to get all complete capture moves of a player.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        list: A list of Move tuples, each with its whole capture path.
+    """
+    # only the pieces with a first capture step can start a capture sequence
+    sources = _capture_sources(position, player_color)
+    if not sources:
+        return []
+    moves = []
+    opponent = position.opponents(player_color)
+    promotion_row = PROMOTION_ROW_MASK[player_color]
+    empty = position.empty()
+    while sources:
+        low = sources & -sources
+        start = low.bit_length() - 1
+        sources ^= low
+        king = bool(position.kings & low)
+        _extend_capture(moves, [start], [], start, king, False, empty, opponent, promotion_row)
+    return moves
+
+
+def legal_moves(position, player_color):
+    """
+    Function to get all complete legal moves of a player. Captures are mandatory,
+    so quiet moves are only returned when no capture is possible.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        list: A list of Move tuples.
+    """
+    moves = capture_moves(position, player_color)
+    if moves:
+        return moves
+    white, black, kings = position.white, position.black, position.kings
+    occupied = white | black
+    own = (white if player_color == 'w' else black) & ~position.tagged
+    moves = _man_steps(own & ~kings, occupied ^ FULL, player_color, MAN_MOVE_TABLES)
+    own_kings = own & kings
+    while own_kings:
+        low = own_kings & -own_kings
+        own_kings ^= low
+        moves += _king_steps(low.bit_length() - 1, occupied, KING_MOVE_WALKS)
+    return moves
+
+
+# Lazy variants of the step generators above. They yield one step at a time, so a caller
+# that only needs the first match (or to know there is one) stops the work there.
+# The men's moves of a position come from one lookup, the kings' moves are then
+# generated one king at a time; the rules are shared with the list versions through
+# the same helpers, which stay the fast path for search and perft.
+
+def iter_quiet_moves(position, player_color):
+    """
+    Function to go through the non-capturing moves of a player one at a time.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Yields:
+        tuple: (start square, end square) of every move, in the order of quiet_moves.
+    """
+    white, black, kings = position.white, position.black, position.kings
+    occupied = white | black
+    own = (white if player_color == 'w' else black) & ~position.tagged
+    yield from _man_steps(own & ~kings, occupied ^ FULL, player_color)
+    for start in iter_squares(own & kings):
+        yield from _king_steps(start, occupied)
+
+
+def iter_capture_steps(position, player_color, specific_square=None):
+    """
+    Function to go through the single capture steps of a player one at a time.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+        specific_square (int): A specific square to check for captures, if any.
+    Yields:
+        tuple: (start square, end square) of every step, in the order of capture_steps.
+    """
+    white, black, kings, tagged = position.white, position.black, position.kings, position.tagged
+    empty = ~(white | black) & FULL
+    if player_color == 'w':
+        own, opponent = white & ~tagged, black & ~tagged
+    else:
+        own, opponent = black & ~tagged, white & ~tagged
+    if specific_square is not None:
+        own &= 1 << specific_square
+    yield from _man_jumps(own & ~kings, opponent, empty)
+    for start in iter_squares(own & kings):
+        for _, landing in _king_captures(start, empty, opponent):
+            yield start, landing
+
+
+def has_any_legal_move(position, player_color):
+    """
+    Function to check if a player can move at all, without generating any move.
+    A player can move if a piece has an empty square next to it in a direction it may
+    step in, or an opponent's piece next to it with an empty square behind. A flying
+    king's longer captures need an empty neighbour too, so they don't change the answer.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        bool: True if the player has a legal move.
+    """
+    white, black, kings, tagged = position.white, position.black, position.kings, position.tagged
+    empty = ~(white | black) & FULL
+    if player_color == 'w':
+        own, opponent = white & ~tagged, black & ~tagged
+        # men step up the board, kings in every direction
+        up, down = own, own & kings
+    else:
+        own, opponent = black & ~tagged, white & ~tagged
+        up, down = own & kings, own
+    for shift, mask in UP_STEPS:
+        if ((up & mask) >> shift) & empty:
+            return True
+    for shift, mask in DOWN_STEPS:
+        if ((down & mask) << shift) & empty:
+            return True
+    # men capture backwards as well
+    for _, step_a, rest_a, mask_a, step_b, rest_b, mask_b in UP_JUMPS:
+        if ((((own & mask_a) >> step_a) & opponent) >> rest_a | (((own & mask_b) >> step_b) & opponent) >> rest_b) & empty:
+            return True
+    for _, step_a, rest_a, mask_a, step_b, rest_b, mask_b in DOWN_JUMPS:
+        if ((((own & mask_a) << step_a) & opponent) << rest_a | (((own & mask_b) << step_b) & opponent) << rest_b) & empty:
+            return True
+    return False
+
+
+def is_legal_step(position, player_color, start, end, specific_square=None):
+    """
+    Function to check a single step of a move as the player types it: a capture step
+    when a capture is possible (captures are mandatory), a quiet move otherwise.
+    Args:
+        position (Position): The current position.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+        start (int): The start square of the step.
+        end (int): The end square of the step.
+        specific_square (int): The piece that has to go on capturing, if any.
+    Returns:
+        bool: True if the step is legal.
+    """
+    step = (start, end)
+    captures = iter_capture_steps(position, player_color, specific_square)
+    first = next(captures, None)
+    if first is not None:
+        return first == step or any(capture == step for capture in captures)
+    if specific_square is not None:
+        return False
+    return any(quiet == step for quiet in iter_quiet_moves(position, player_color))
+
+
+def play(position, move, player_color):
+    """
+    Function to make a complete move and get the resulting position.
+    The given position is left unchanged, use Position.make() to move in place.
+    Args:
+        position (Position): The position before the move.
+        move (Move): The move to make.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        Position: The position after the move.
+    """
+    child = position.copy()
+    child.make(move, player_color)
+    child.undo_stack.clear()
+    return child
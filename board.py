@@ -1,10 +1,97 @@
 # board.py
 
+from bitboard import RC_TO_SQUARE, Position, from_board
+from renderer import RENDERER
+from zobrist import WHITE_MAN, WHITE_KING, RED_MAN, RED_KING
+
+# The cells of the pieces of a grid board, as from_board reads them
+WHITE_CELLS = ('w', 'W', 'C')
+RED_CELLS = ('r', 'R', 'c')
+KING_CELLS = ('W', 'R')
+TAGGED_CELLS = ('c', 'C')
+# The piece count of a bitboard Position every piece cell adds to
+COUNT_KINDS = {'w': WHITE_MAN, 'C': WHITE_MAN, 'W': WHITE_KING, 'r': RED_MAN, 'c': RED_MAN, 'R': RED_KING}
+
+
+class BoardRow(list):
+    """
+    A row of a Board: a list of cells that reports every change to its board.
+    """
+    __slots__ = ('board', 'row')
+
+    def __init__(self, cells, board=None, row=0):
+        super().__init__(cells)
+        self.board = board
+        self.row = row
+
+    def __setitem__(self, col, cell):
+        board = self.board
+        if board is not None and isinstance(col, int):
+            old = self[col]
+            super().__setitem__(col, cell)
+            board._changed(self.row, col % 8, old, cell)
+            return
+        super().__setitem__(col, cell)
+        if board is not None:
+            board.refresh()
+
+
+class Board(list):
+    """
+    The 8x8 grid board (a list of rows of cells, as before) that keeps its pieces as a
+    bitboard Position as well. Setting a cell updates the position, so the rules never
+    have to convert the grid. Plain lists of lists still work everywhere, they are
+    converted on every call.
+    Attributes:
+        position (Position): The same pieces as a bitboard position, without a hash. It
+            changes with the board, so it is only read: copy() it to make moves on it.
+    """
+
+    def __init__(self, rows=()):
+        super().__init__(BoardRow(cells, self, row) for row, cells in enumerate(rows))
+        self.refresh()
+
+    def __setitem__(self, row, cells):
+        super().__setitem__(row, BoardRow(cells, self, row))
+        self.refresh()
+
+    def __reduce_ex__(self, protocol):
+        # copies and pickles (e.g. for the worker processes of server.py) are built from the cells
+        return Board, ([list(cells) for cells in self],)
+
+    def refresh(self):
+        """
+        Function to compute the position from the cells again, e.g. after a row was replaced.
+        """
+        self.position = from_board(self, with_hash=False) if len(self) == 8 else Position(hash=0)
+
+    def _changed(self, row, col, old, cell):
+        """
+        Function to update the position after a cell was set from old to cell.
+        """
+        square = RC_TO_SQUARE.get((row, col))
+        if square is None:
+            # pieces never stand on the light cells, from_board leaves them out as well
+            return
+        # the same change on the square of the position, as from_board would make it
+        position = self.position
+        bit = 1 << square
+        keep = ~bit
+        position.white = position.white & keep | (bit if cell in WHITE_CELLS else 0)
+        position.black = position.black & keep | (bit if cell in RED_CELLS else 0)
+        position.kings = position.kings & keep | (bit if cell in KING_CELLS else 0)
+        position.tagged = position.tagged & keep | (bit if cell in TAGGED_CELLS else 0)
+        if old in COUNT_KINDS:
+            position.counts[COUNT_KINDS[old]] -= 1
+        if cell in COUNT_KINDS:
+            position.counts[COUNT_KINDS[cell]] += 1
+
+
 def initialize_board():
     """
     Function to initialize the checkers board with the standard setup.
     Returns:
-        list: A 2D list representing the checkers board.
+        Board: A 2D list representing the checkers board.
     """
     board = [['.' for _ in range(8)] for _ in range(8)]
 
@@ -20,61 +107,16 @@ def initialize_board():
             if (row + col) % 2 == 1:
                 board[row][col] = 'w'
 
-    return board
+    return Board(board)
 
 def display_board(board, player_name, color, move_history, rotated=False):
     """
     Function to display the checkers board in the terminal.
+    Only what changed since the last call is redrawn, see renderer.py.
     Args:
         board (list): A 2D list representing the checkers board.
+        player_name, color: The player to move.
+        move_history (dict): The moves of "White" and "Black".
         rotated (bool): A flag indicating if the board should be displayed rotated.
     """
-    print("\033c")
-    # Display the move history
-    print("\nMove History:")
-    for color_m, moves in move_history.items():
-        print(f"{color_m} Moves: {', '.join(moves)}")
-    print("")
-    # displaying who's turn is now
-    print(f"{player_name} ({color}), it's your turn.")
-    # visualization settings for black's move
-    if rotated:
-        horizontal_labels = "  h g f e d c b a"
-        vertical_labels = range(1, 9)
-        rows = range(7, -1, -1)
-        cols = range(7, -1, -1)
-    # visualization settings for white's move
-    else:
-        horizontal_labels = "  a b c d e f g h"
-        vertical_labels = range(8, 0, -1)
-        rows = range(8)
-        cols = range(8)
-    
-    # display the board with colors for checkers and queens
-    # upper line with letters
-    print(horizontal_labels)
-    for row in rows:
-        row_label = vertical_labels[7 - row] if rotated else vertical_labels[row]
-        # number from the left of the board
-        print(f"{row_label} ", end="")
-        # line of the board with checkers
-        for col in cols:
-            cell = board[row][col]
-            if cell == 'r':
-                print("\033[31m0\033[0m ", end="")  # Red checkers
-            elif cell == 'w':
-                print("\033[37m0\033[0m ", end="")  # White checkers
-            elif cell == 'R':
-                print("\033[31mX\033[0m ", end="")  # Red queen
-            elif cell == 'W':
-                print("\033[37mX\033[0m ", end="")  # White queen
-            elif cell == 'C':
-                print("\033[37m*\033[0m ", end="")  # White captured piece
-            elif cell == 'c':
-                print("\033[31m*\033[0m ", end="")  # Black captured piece
-            elif cell == '.':
-                print("\033[37m·\033[0m ", end="")  # White dots for empty fields
-        # number from the right of the board
-        print(f"{row_label}")
-    # bottom line with letters
-    print(horizontal_labels)
+    RENDERER.draw(board, player_name, color, move_history, rotated)
@@ -0,0 +1,303 @@
+# book.py
+
+import argparse
+import bisect
+import itertools
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import tempfile
+
+from bitboard import from_board, legal_moves, move_to_notation
+from board import initialize_board
+from movecache import cached_legal_moves
+from zobrist import side_hash
+
+# File layout: a header, then fixed-size records sorted by position key and move
+#     header: magic, number of records, format version
+#     record: position key (hash with the side to move), move code (see move_code),
+#             wins, draws and losses of the side to move after playing the move
+HEADER = struct.Struct("<4sII4x")
+RECORD = struct.Struct("<QQHHH")
+MAGIC = b"CKBK"
+# Version 1 books (version 0 in the header) only kept the start and end square of a move,
+# so captures with the same squares but other captured pieces shared their counts
+VERSION = 2
+# The counters are 16-bit, larger counts are scaled down keeping their ratio
+MAX_COUNT = 0xFFFF
+
+DEFAULT_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")
+
+
+def move_code(move):
+    """
+    Function to pack a move into the move code of a record: the captured squares as a
+    mask, then the start and end square. Two captures with the same start and end square
+    but other captured pieces get different codes.
+    Args:
+        move (Move): The move.
+    Returns:
+        int: The move code.
+    """
+    captured = 0
+    for square in move.captured:
+        captured |= 1 << square
+    return captured << 10 | move.path[0] << 5 | move.path[-1]
+
+
+def find_book_move(moves, code):
+    """
+    Function to find the move with a move code in a list of legal moves.
+    Args:
+        moves (list): The legal moves of the position.
+        code (int): The move code from the book.
+    Returns:
+        Move: The move, or None if no legal move has the code.
+    """
+    return next((move for move in moves if move_code(move) == code), None)
+
+
+class _RecordKeys:
+    """
+    The position keys of the records as a read-only sequence, for bisect.
+    """
+
+    def __init__(self, data, count):
+        self.data = data
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        return struct.unpack_from("<Q", self.data, HEADER.size + number * RECORD.size)[0]
+
+
+class OpeningBook:
+    """
+    Read access to a book file. The file is memory-mapped and searched with bisect,
+    a lookup reads about log2(records) keys and nothing is loaded up front.
+    Attributes:
+        path (str): The book file.
+        count (int): The number of records.
+    """
+
+    def __init__(self, path=DEFAULT_BOOK):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, version = HEADER.unpack_from(self.data)
+        if magic == MAGIC and version != VERSION:
+            self.data.close()
+            raise ValueError(f"Opening book of version {version or 1}, build it again for version {VERSION}: {path}")
+        if magic != MAGIC or len(self.data) != HEADER.size + self.count * RECORD.size:
+            self.data.close()
+            raise ValueError(f"Broken opening book: {path}")
+        self.keys = _RecordKeys(self.data, self.count)
+
+    def __reduce__(self):
+        # the map can't be sent to another process, it opens the file again
+        return OpeningBook, (self.path,)
+
+    def entries(self, position, player_color):
+        """
+        Function to get the book moves of a position.
+        Args:
+            position (Position): The position.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        Returns:
+            list: (move code, wins, draws, losses) tuples, empty if the position is not in the book.
+        """
+        key = side_hash(position.hash, player_color)
+        number = bisect.bisect_left(self.keys, key)
+        entries = []
+        while number < self.count:
+            record = RECORD.unpack_from(self.data, HEADER.size + number * RECORD.size)
+            if record[0] != key:
+                break
+            entries.append(record[1:])
+            number += 1
+        return entries
+
+    def choose(self, position, player_color, rng=random):
+        """
+        Function to pick a book move, at random weighted by the points it scored
+        (two per win, one per draw). Moves that never scored are not played.
+        Args:
+            position (Position): The position.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+            rng (random.Random): The random generator.
+        Returns:
+            Move: A legal move, or None if the book has no move for the position.
+        """
+        entries = self.entries(position, player_color)
+        if not entries:
+            return None
+        moves = legal_moves(position, player_color)
+        choices, weights = [], []
+        for code, wins, draws, _ in entries:
+            move = find_book_move(moves, code)
+            if move is not None and 2 * wins + draws:
+                choices.append(move)
+                weights.append(2 * wins + draws)
+        if not choices:
+            return None
+        return rng.choices(choices, weights)[0]
+
+    def close(self):
+        """
+        Function to unmap the file.
+        """
+        self.data.close()
+
+
+def load_book(path=DEFAULT_BOOK):
+    """
+    Function to open the book for the engine.
+    Returns:
+        OpeningBook: The book, or None if the file doesn't exist.
+    """
+    return OpeningBook(path) if os.path.exists(path) else None
+
+
+def collect(games, max_plies=16):
+    """
+    Function to count the results of the moves played in the first plies of games.
+    Args:
+        games (iterable): (result, moves) pairs: "White", "Black" or "Draw" and the moves
+            in 'a3-b4-d6' notation, White first.
+        max_plies (int): The number of plies of every game to count.
+    Returns:
+        dict: (position key, move code) -> [wins, draws, losses] of the player who moved.
+    """
+    stats = {}
+    start = from_board(initialize_board())
+    for result, moves in games:
+        position = start.copy()
+        player_color = 'w'
+        for notation in moves[:max_plies]:
+            # the openings of many games are the same, their move lists come from the cache
+            move = next((m for m in cached_legal_moves(position, player_color) if move_to_notation(m) == notation), None)
+            if move is None:
+                raise ValueError(f"Illegal move in game record: {notation}")
+            counts = stats.setdefault((side_hash(position.hash, player_color), move_code(move)), [0, 0, 0])
+            if result == "Draw":
+                counts[1] += 1
+            elif (result == "White") == (player_color == 'w'):
+                counts[0] += 1
+            else:
+                counts[2] += 1
+            position.make(move, player_color)
+            player_color = 'r' if player_color == 'w' else 'w'
+    return stats
+
+
+def read_records(path):
+    """
+    Function to read game records from a JSON lines file, as written by match.py --moves.
+    Yields:
+        tuple: (result, moves) of every game with moves.
+    """
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                game = json.loads(line)
+                if game.get('moves'):
+                    yield game['result'], game['moves']
+
+
+def write_book(stats, path, min_games=2):
+    """
+    Function to write the collected statistics as a sorted book file.
+    Args:
+        stats (dict): The statistics from collect().
+        path (str): The book file.
+        min_games (int): Moves played fewer times are left out.
+    Returns:
+        int: The number of records written.
+    """
+    records = []
+    for (key, code), counts in sorted(stats.items()):
+        if sum(counts) < min_games:
+            continue
+        largest = max(counts)
+        if largest > MAX_COUNT:
+            counts = [count * MAX_COUNT // largest for count in counts]
+        records.append(RECORD.pack(key, code, *counts))
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(records), VERSION))
+        f.write(b"".join(records))
+    os.replace(path + ".tmp", path)
+    return len(records)
+
+
+def self_play(engine, games, workers=None, opening_plies=2, seed=0):
+    """
+    Function to play games of an engine against itself on all cores.
+    Returns:
+        list: (result, moves) of every game.
+    """
+    # imported here, match.py is only needed to build books by self-play
+    from match import run_match
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "games.jsonl")
+        run_match(engine, engine, games, workers, opening_plies=opening_plies, seed=seed,
+                  output=output, keep_moves=True, log=None)
+        return list(read_records(output))
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python book.py --self-play 2000 --engine alphabeta:depth=6
+        python book.py --games results.jsonl --output opening_book.bin
+        python book.py --pdn collection.pdn
+        python book.py --show
+    """
+    parser = argparse.ArgumentParser(description="Build the opening book from game records or self-play.")
+    parser.add_argument("--games", action="append", default=[], help="JSON lines file of games with moves (match.py --moves)")
+    parser.add_argument("--pdn", action="append", default=[], help="PDN file of games, read one game at a time")
+    parser.add_argument("--self-play", type=int, default=0, metavar="N", help="play N games of the engine against itself")
+    parser.add_argument("--engine", default="alphabeta:depth=6", help="engine for the self-play games")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes for self-play (default: all cores)")
+    parser.add_argument("--opening-plies", type=int, default=2, help="random moves at the start of every self-play game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    parser.add_argument("--plies", type=int, default=16, help="plies of every game that go into the book")
+    parser.add_argument("--min-games", type=int, default=2, help="leave out moves played fewer times")
+    parser.add_argument("--output", default=DEFAULT_BOOK, help="book file")
+    parser.add_argument("--show", action="store_true", help="print the book moves of the start position")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        book = OpeningBook(args.output)
+        position = from_board(initialize_board())
+        moves = legal_moves(position, 'w')
+        print(f"{book.count} records")
+        for code, wins, draws, losses in book.entries(position, 'w'):
+            move = find_book_move(moves, code)
+            print(f"{move_to_notation(move) if move else code:<10} +{wins} ={draws} -{losses}")
+        book.close()
+        return 0
+
+    # the game files are read one game at a time, only the statistics are kept
+    sources = [read_records(path) for path in args.games]
+    if args.pdn:
+        # imported here, pdn.py is only needed to build books from PDN files
+        from pdn import game_records
+        sources.extend(game_records(path) for path in args.pdn)
+    if args.self_play:
+        sources.append(self_play(args.engine, args.self_play, args.workers, args.opening_plies, args.seed))
+    if not sources:
+        parser.error("no games, give --games, --pdn or --self-play")
+    counter = itertools.count()
+    games = (game for game, _ in zip(itertools.chain.from_iterable(sources), counter))
+    count = write_book(collect(games, args.plies), args.output, args.min_games)
+    print(f"{count} records from {next(counter)} games written to {args.output} ({os.path.getsize(args.output)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
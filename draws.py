@@ -0,0 +1,101 @@
+# draws.py
+
+from zobrist import WHITE_MAN, WHITE_KING, RED_MAN, RED_KING, side_hash
+
+# A position seen this often with the same player to move is a draw
+REPETITIONS = 3
+# Plies in a row with only king moves and no captures: 15 moves of each player
+KING_MOVE_PLIES = 30
+# Plies the side with three kings (or more) gets to win against a lone king: 15 moves each
+LONE_KING_PLIES = 30
+# Plies without a capture or promotion after which an endgame with kings on both sides
+# is a draw, by the number of pieces on the board: 30 moves each with 4 or 5 pieces,
+# 60 moves each with 6 or 7 pieces
+ENDGAME_PLIES = {4: 60, 5: 60, 6: 120, 7: 120}
+
+# Reasons of a draw, as shown to the players
+REPETITION = "threefold repetition"
+KING_MOVES = "15 king moves without captures"
+LONE_KING = "three kings did not win against a lone king"
+ENDGAME = "no progress in the endgame"
+
+
+def _endgame_limit(counts):
+    """
+    Function to get the number of plies without captures or promotions after which
+    the material on the board is a draw.
+    Args:
+        counts (list): The piece counts of a position, see Position.counts.
+    Returns:
+        tuple: (plies, reason), or None if the material has no limit.
+    """
+    white_men, white_kings, red_men, red_kings = (counts[WHITE_MAN], counts[WHITE_KING],
+                                                  counts[RED_MAN], counts[RED_KING])
+    if (white_kings >= 3 and red_kings == 1 and not red_men) or (red_kings >= 3 and white_kings == 1 and not white_men):
+        return LONE_KING_PLIES, LONE_KING
+    plies = ENDGAME_PLIES.get(white_men + white_kings + red_men + red_kings)
+    if plies is not None and white_kings and red_kings:
+        return plies, ENDGAME
+    return None
+
+
+class DrawTracker:
+    """
+    Keeps what the draw rules need as the game goes on: how often every position was
+    seen and two counters of plies. Every update is O(1), the game is never replayed.
+    The repetition history is emptied after a man moves or a piece is captured, no
+    position from before can come back after that.
+    Attributes:
+        seen (dict): The number of times every position was seen since the last man move
+            or capture, by its hash with the player to move.
+        king_plies (int): The plies in a row with only king moves and no captures.
+        material_plies (int): The plies since the last capture or promotion.
+        reason (str): The reason of the draw after the last update, None if there is none.
+    """
+
+    def __init__(self, position, player_color):
+        """
+        Args:
+            position (Position): The starting position.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        """
+        self.seen = {side_hash(position.hash, player_color): 1}
+        self.king_plies = 0
+        self.material_plies = 0
+        self.reason = None
+        self._last = (position.white & ~position.kings, position.black & ~position.kings, list(position.counts))
+
+    def update(self, position, player_color):
+        """
+        Function to add the position after a move.
+        Args:
+            position (Position): The position after the move.
+            player_color (str): The color of the player to move next.
+        Returns:
+            str: The reason of the draw, or None if the game goes on.
+        """
+        white_men, black_men = position.white & ~position.kings, position.black & ~position.kings
+        last_white_men, last_black_men, last_counts = self._last
+        counts = list(position.counts)
+        material_changed = counts != last_counts
+        if material_changed or white_men != last_white_men or black_men != last_black_men:
+            # a man moved or a piece was captured: nothing before can repeat
+            self.seen.clear()
+            self.king_plies = 0
+        else:
+            self.king_plies += 1
+        self.material_plies = 0 if material_changed else self.material_plies + 1
+        self._last = (white_men, black_men, counts)
+
+        key = side_hash(position.hash, player_color)
+        self.seen[key] = self.seen.get(key, 0) + 1
+        self.reason = None
+        if self.seen[key] >= REPETITIONS:
+            self.reason = REPETITION
+        elif self.king_plies >= KING_MOVE_PLIES:
+            self.reason = KING_MOVES
+        else:
+            limit = _endgame_limit(counts)
+            if limit is not None and self.material_plies >= limit[0]:
+                self.reason = limit[1]
+        return self.reason
@@ -0,0 +1,391 @@
+# encoding.py
+
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import sys
+
+from bitboard import Position, from_board, legal_moves, move_to_notation, square_name
+from board import initialize_board
+
+try:
+    import numpy as np
+except ImportError:
+    # the files are read with memoryview and struct then, only slower
+    np = None
+
+# Position files: a header, then one fixed-size record per position
+#     header: magic, format version, number of positions
+#     record: white, black and king masks (bitboard squares), side to move (0 white, 1 red),
+#             result of the game from White's view (1, 0 or -1), ply of the position in its game
+# The records are 16 bytes, so they are aligned for numpy and memoryview.cast('I').
+POSITIONS_HEADER = struct.Struct("<4sIQ")
+POSITION = struct.Struct("<IIIBbH")
+POSITIONS_MAGIC = b"CKPS"
+
+# Game files: a header, then every game as a small record followed by its moves
+#     header: magic, format version, number of games
+#     game: result from White's view, number of plies, number of bytes of the moves
+#     move: number of captured pieces, the squares of the path (start and end square of a
+#           quiet move), the captured squares; one byte each, bitboard squares
+# A move is stored by its squares, not by its place in a generated move list, so the files
+# don't depend on the order of the move generator. Version 1 files stored that place and
+# are refused.
+GAMES_HEADER = struct.Struct("<4sIQ")
+GAME = struct.Struct("<bHI")
+GAMES_MAGIC = b"CKGM"
+
+POSITIONS_VERSION = 1
+GAMES_VERSION = 2
+SIDES = {'w': 0, 'r': 1}
+COLORS = ('w', 'r')
+RESULT_VALUES = {"White": 1, "Draw": 0, "Black": -1}
+
+if np is not None:
+    # the position record as a numpy type, for numpy.memmap and vectorised code
+    POSITION_DTYPE = np.dtype([('white', '<u4'), ('black', '<u4'), ('kings', '<u4'),
+                               ('side', 'u1'), ('result', 'i1'), ('ply', '<u2')])
+    assert POSITION_DTYPE.itemsize == POSITION.size
+
+
+def pack_position(position, player_color, result=0, ply=0):
+    """
+    Function to pack a position into its fixed-size record.
+    Args:
+        position (Position): The position, without tagged pieces.
+        player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        result (int): The result of the game from White's view: 1, 0 or -1.
+        ply (int): The number of moves played before the position.
+    Returns:
+        bytes: The record.
+    """
+    return POSITION.pack(position.white, position.black, position.kings, SIDES[player_color], result, ply)
+
+
+def unpack_position(data, offset=0):
+    """
+    Function to read a position from a record.
+    Returns:
+        tuple: (Position, player color, result, ply)
+    """
+    white, black, kings, side, result, ply = POSITION.unpack_from(data, offset)
+    return Position(white, black, kings), COLORS[side], result, ply
+
+
+def _pack_move(move):
+    """
+    Function to pack a move as bytes, see the game files above.
+    """
+    return bytes((len(move.captured), *move.path, *move.captured))
+
+
+def _split_moves(codes):
+    """
+    Function to split encoded moves into the squares of every move.
+    Args:
+        codes (bytes): The encoded moves, any bytes-like object.
+    Yields:
+        tuple: (path, captured squares) of every move.
+    Raises:
+        ValueError: If the codes end in the middle of a move or hold a square that doesn't exist.
+    """
+    codes = bytes(codes)
+    offset = 0
+    while offset < len(codes):
+        captured = codes[offset]
+        squares = max(captured + 1, 2)
+        end = offset + 1 + squares + captured
+        if end > len(codes):
+            raise ValueError(f"Broken game record: move at byte {offset} ends after the last byte")
+        move = codes[offset + 1:end]
+        if max(move) >= 32:
+            raise ValueError(f"Broken game record: square {max(move)} at byte {offset}")
+        yield tuple(move[:squares]), tuple(move[squares:])
+        offset = end
+
+
+def encode_moves(moves, position=None, player_color='w'):
+    """
+    Function to encode the moves of a game by their squares.
+    Args:
+        moves (list): The moves in 'a3-b4-d6' notation or as Move tuples.
+        position (Position): The starting position, the standard setup if None.
+        player_color (str): The color of the player to move first.
+    Returns:
+        bytes: The moves, see the game files above.
+    Raises:
+        ValueError: If a move is not legal.
+    """
+    position = from_board(initialize_board()) if position is None else position.copy()
+    codes = bytearray()
+    for move in moves:
+        possible_moves = legal_moves(position, player_color)
+        notations = [move_to_notation(m) for m in possible_moves] if isinstance(move, str) else possible_moves
+        try:
+            move = possible_moves[notations.index(move)]
+        except ValueError:
+            raise ValueError(f"Illegal move in game record: {move if isinstance(move, str) else move_to_notation(move)}") from None
+        codes += _pack_move(move)
+        position.make(move, player_color)
+        player_color = 'r' if player_color == 'w' else 'w'
+    return bytes(codes)
+
+
+def decode_moves(codes, position=None, player_color='w'):
+    """
+    Function to turn encoded moves back into moves, replaying them from the start.
+    Args:
+        codes (bytes): The encoded moves, any bytes-like object.
+        position (Position): The starting position, the standard setup if None.
+        player_color (str): The color of the player to move first.
+    Yields:
+        tuple: (position before the move, player color, Move). The position is the same
+            object all the time, the move is made on it after it was yielded.
+    Raises:
+        ValueError: If the codes are broken or a move is not legal in its position.
+    """
+    position = from_board(initialize_board()) if position is None else position.copy()
+    for path, captured in _split_moves(codes):
+        move = next((move for move in legal_moves(position, player_color)
+                     if move.path == path and move.captured == captured), None)
+        if move is None:
+            raise ValueError(f"Broken game record: illegal move {'-'.join(square_name(square) for square in path)}")
+        yield position, player_color, move
+        position.make(move, player_color)
+        player_color = 'r' if player_color == 'w' else 'w'
+
+
+class _Writer:
+    """
+    Base of the dataset writers: the records are appended to a temporary file and the
+    header with the final count is written when the file is closed.
+    """
+    header = None
+    magic = None
+    version = None
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = open(path + ".tmp", "wb")
+        self.file.write(self.header.pack(self.magic, self.version, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(keep=exc_type is None)
+
+    def close(self, keep=True):
+        """
+        Function to finish the file, or to drop it if keep is False.
+        """
+        if self.file.closed:
+            return
+        self.file.seek(0)
+        self.file.write(self.header.pack(self.magic, self.version, self.count))
+        self.file.close()
+        if keep:
+            os.replace(self.path + ".tmp", self.path)
+        else:
+            os.remove(self.path + ".tmp")
+
+
+class PositionWriter(_Writer):
+    """
+    Writer of a position file, e.g.:
+        with PositionWriter("positions.ckps") as writer:
+            writer.write(position, 'w', result=1)
+    """
+    header = POSITIONS_HEADER
+    magic = POSITIONS_MAGIC
+    version = POSITIONS_VERSION
+
+    def write(self, position, player_color, result=0, ply=0):
+        """
+        Function to append a position, see pack_position.
+        """
+        self.file.write(pack_position(position, player_color, result, ply))
+        self.count += 1
+
+    def write_game(self, result, codes, position=None, player_color='w'):
+        """
+        Function to append every position of an encoded game, labelled with its result.
+        """
+        records = [pack_position(p, color, result, ply)
+                   for ply, (p, color, _) in enumerate(decode_moves(codes, position, player_color))]
+        self.file.write(b"".join(records))
+        self.count += len(records)
+
+
+class GameWriter(_Writer):
+    """
+    Writer of a game file, e.g.:
+        with GameWriter("games.ckgm") as writer:
+            writer.write("White", encode_moves(moves))
+    """
+    header = GAMES_HEADER
+    magic = GAMES_MAGIC
+    version = GAMES_VERSION
+
+    def write(self, result, codes):
+        """
+        Function to append a game.
+        Args:
+            result (str or int): "White", "Black", "Draw" or the value from White's view.
+            codes (bytes): The moves from encode_moves.
+        """
+        if isinstance(result, str):
+            result = RESULT_VALUES[result]
+        plies = sum(1 for _ in _split_moves(codes))
+        self.file.write(GAME.pack(result, plies, len(codes)))
+        self.file.write(codes)
+        self.count += 1
+
+
+def _map(path, header, magic, expected_version):
+    """
+    Function to map a dataset file and check its header.
+    Returns:
+        tuple: (mmap, number of records)
+    """
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    found, version, count = header.unpack_from(data)
+    if found != magic or version != expected_version:
+        data.close()
+        raise ValueError(f"Not a version {expected_version} {magic.decode()} file: {path}")
+    return data, count
+
+
+def load_positions(path):
+    """
+    Function to open a position file without reading it. Slices of the result are views
+    of the mapped file, nothing is copied until the values are used.
+    Returns:
+        numpy.memmap: The records as POSITION_DTYPE if numpy is installed, otherwise a
+            memoryview of unsigned 32-bit words, four per position (white, black, kings
+            and side, result and ply packed like POSITION).
+    """
+    if np is not None:
+        _map(path, POSITIONS_HEADER, POSITIONS_MAGIC, POSITIONS_VERSION)[0].close()
+        return np.memmap(path, dtype=POSITION_DTYPE, mode='r', offset=POSITIONS_HEADER.size)
+    data, count = _map(path, POSITIONS_HEADER, POSITIONS_MAGIC, POSITIONS_VERSION)
+    return memoryview(data)[POSITIONS_HEADER.size:POSITIONS_HEADER.size + count * POSITION.size].cast('I')
+
+
+def iter_positions(path):
+    """
+    Function to read the positions of a file one at a time.
+    Yields:
+        tuple: (Position, player color, result, ply)
+    """
+    data, count = _map(path, POSITIONS_HEADER, POSITIONS_MAGIC, POSITIONS_VERSION)
+    try:
+        for offset in range(POSITIONS_HEADER.size, POSITIONS_HEADER.size + count * POSITION.size, POSITION.size):
+            yield unpack_position(data, offset)
+    finally:
+        data.close()
+
+
+def iter_games(path):
+    """
+    Function to read the games of a file one at a time.
+    Yields:
+        tuple: (result from White's view, encoded moves as bytes)
+    """
+    data, count = _map(path, GAMES_HEADER, GAMES_MAGIC, GAMES_VERSION)
+    offset = GAMES_HEADER.size
+    try:
+        for _ in range(count):
+            result, _, size = GAME.unpack_from(data, offset)
+            offset += GAME.size
+            yield result, data[offset:offset + size]
+            offset += size
+    finally:
+        data.close()
+
+
+def convert(games, positions_path=None, games_path=None):
+    """
+    Function to write game records as a game file, a position file or both.
+    Args:
+        games (iterable): (result, moves) pairs as read by book.read_records or pdn.game_records.
+        positions_path (str): The position file to write, if any.
+        games_path (str): The game file to write, if any.
+    Returns:
+        tuple: The number of games and positions written.
+    """
+    position_writer = PositionWriter(positions_path) if positions_path else None
+    game_writer = GameWriter(games_path) if games_path else None
+    count = 0
+    try:
+        for result, moves in games:
+            codes = encode_moves(moves)
+            if game_writer is not None:
+                game_writer.write(result, codes)
+            if position_writer is not None:
+                position_writer.write_game(RESULT_VALUES[result], codes)
+            count += 1
+    except BaseException:
+        for writer in (position_writer, game_writer):
+            if writer is not None:
+                writer.close(keep=False)
+        raise
+    for writer in (position_writer, game_writer):
+        if writer is not None:
+            writer.close()
+    return count, position_writer.count if position_writer else 0
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python encoding.py --games results.jsonl --positions positions.ckps --game-file games.ckgm
+        python encoding.py --pdn collection.pdn --positions positions.ckps
+        python encoding.py --show positions.ckps
+    """
+    parser = argparse.ArgumentParser(description="Convert game records to compact binary datasets.")
+    parser.add_argument("--games", action="append", default=[], help="JSON lines file of games with moves (match.py --moves)")
+    parser.add_argument("--pdn", action="append", default=[], help="PDN file of games")
+    parser.add_argument("--game-file", default=None, help="game file to write, the squares of every move")
+    parser.add_argument("--positions", default=None, help="position file to write, every position of every game")
+    parser.add_argument("--show", default=None, metavar="FILE", help="print the size of a position or game file")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        with open(args.show, "rb") as f:
+            magic, _, count = POSITIONS_HEADER.unpack(f.read(POSITIONS_HEADER.size))
+        size = os.path.getsize(args.show)
+        if magic == POSITIONS_MAGIC:
+            print(f"{count} positions, {size} bytes")
+        else:
+            games = plies = 0
+            data, count = _map(args.show, GAMES_HEADER, GAMES_MAGIC, GAMES_VERSION)
+            offset = GAMES_HEADER.size
+            for _ in range(count):
+                _, game_plies, game_size = GAME.unpack_from(data, offset)
+                games += 1
+                plies += game_plies
+                offset += GAME.size + game_size
+            data.close()
+            print(f"{games} games, {plies} moves, {size} bytes")
+        return 0
+
+    # imported here, they are only needed to read the game records
+    from book import read_records
+    from pdn import game_records
+    sources = [read_records(path) for path in args.games] + [game_records(path) for path in args.pdn]
+    if not sources:
+        parser.error("no games, give --games or --pdn")
+    if not args.positions and not args.game_file:
+        parser.error("nothing to write, give --positions or --game-file")
+    games, positions = convert(itertools.chain.from_iterable(sources), args.positions, args.game_file)
+    print(f"{games} games, {positions} positions written")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
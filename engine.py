@@ -0,0 +1,565 @@
+# engine.py
+
+import random
+import time
+from collections import namedtuple
+
+from bitboard import legal_moves, capture_moves, has_any_legal_move, play
+from book import load_book
+from evaluation import evaluate
+from tablebase import DRAW, load_tablebase
+from transposition import TranspositionTable, EXACT, LOWER, UPPER, NO_MOVE, encode_move, find_move
+from zobrist import side_hash
+
+# Score of a won position. Wins found closer to the root score higher.
+WIN_SCORE = 100000
+# Scores beyond this are wins or losses with a known distance
+WIN_BOUND = WIN_SCORE - 1000
+# How often (in nodes) the search looks at the clock
+CHECK_EVERY = 1024
+# Late move reductions: from this remaining depth on, the quiet moves after the first
+# few are searched one ply less deep, and again to the full depth if they look better
+REDUCTION_DEPTH = 2
+REDUCTION_MOVES = 2
+
+# Result of a search
+#     move (Move): The best move found.
+#     score (int): The score of the best move from the point of view of the side to move.
+#     depth (int): The last depth that was searched to the end.
+#     nodes (int): The number of positions visited.
+#     elapsed (float): The search time in seconds.
+SearchResult = namedtuple('SearchResult', ['move', 'score', 'depth', 'nodes', 'elapsed'])
+
+# Settings of the computer player for the strength levels of the menu
+STRENGTH_LEVELS = {
+    "1": {'max_depth': 2, 'time_ms': 200},      # Easy
+    "2": {'max_depth': 6, 'time_ms': 500},      # Medium
+    "3": {'max_depth': 64, 'time_ms': 1000},    # Hard, depth 10 to 12 in the middle game
+    "4": {'max_depth': 64, 'time_ms': 1000, 'workers': None},   # Hard on all cores
+}
+
+
+def opponent_of(player_color):
+    """
+    Function to get the color of the opponent.
+    """
+    return 'r' if player_color == 'w' else 'w'
+
+
+def score_to_table(score, ply):
+    """
+    Function to store a win or loss score as a distance from the stored position
+    instead of from the root, so it stays right when the position is reached at another ply.
+    """
+    if score >= WIN_BOUND:
+        return score + ply
+    if score <= -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    """
+    Function to turn a stored win or loss score back into a distance from the root.
+    """
+    if score >= WIN_BOUND:
+        return score - ply
+    if score <= -WIN_BOUND:
+        return score + ply
+    return score
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside the search when the time budget or the node limit is used up.
+    """
+
+
+class Engine:
+    """
+    Base class of the computer players. An engine gets a bitboard position and the
+    color to move and returns one of the complete legal moves.
+    """
+    name = "engine"
+
+    def choose_move(self, position, player_color):
+        """
+        Function to choose a move.
+        Args:
+            position (Position): The current position.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        Returns:
+            Move: The chosen move, or None if there are no legal moves.
+        """
+        raise NotImplementedError
+
+    def new_game(self):
+        """
+        Function to forget everything learned during the previous game.
+        """
+
+    def ponder(self, position, player_color, stop_event):
+        """
+        Function to think on the opponent's time, until stop_event is set. What the engine
+        finds is kept for its next search. Engines that can't ponder return right away.
+        Args:
+            position (Position): The current position, with the opponent to move.
+            player_color (str): The color of the opponent ('w' for white, 'r' for red).
+            stop_event (Event): Set when the opponent has moved.
+        """
+
+    def close(self):
+        """
+        Function to free what the engine holds besides memory, e.g. processes.
+        """
+
+
+class RandomEngine(Engine):
+    """
+    The original computer player, it picks any legal move at random.
+    """
+    name = "random"
+
+    def __init__(self, rng=None):
+        self.rng = rng or random.Random()
+
+    def choose_move(self, position, player_color):
+        moves = legal_moves(position, player_color)
+        return self.rng.choice(moves) if moves else None
+
+
+class AlphaBetaEngine(Engine):
+    """
+    Negamax alpha-beta search with iterative deepening. The search of every depth is
+    extended by a quiescence search while captures are forced, and it stops when the
+    time budget or the node limit is used up.
+    Searched positions are kept in a transposition table, which stays filled between
+    the moves of a game.
+    Attributes:
+        max_depth (int): The deepest iteration to search.
+        time_ms (int): The time budget per move in milliseconds, None for no limit.
+        node_limit (int): The node budget per move, None for no limit.
+        tt (TranspositionTable): The transposition table.
+        tablebase (Tablebase): Endgame tables to look up positions with few pieces, if any.
+        book (OpeningBook): Opening moves played without a search, if any.
+        stop_event (Event): Stops the running search when it is set, if any.
+        ponder_results (dict): The results of ponder() by position key, used by the next search.
+    """
+    name = "alphabeta"
+    # depth of the first iteration, the helper processes of smp.py start deeper
+    first_depth = 1
+
+    def __init__(self, max_depth=64, time_ms=1000, node_limit=None, tt_mb=16, tablebase=None, book=None):
+        self.max_depth = max_depth
+        self.time_ms = time_ms
+        self.node_limit = node_limit
+        self.tt = TranspositionTable(tt_mb)
+        self.tablebase = tablebase
+        self.book = book
+        self.nodes = 0
+        self.deadline = None
+        # history heuristic: (start, end) of moves that caused cutoffs, weighted by depth
+        self.history = {}
+        # killer moves: (start, end) of the last two quiet moves that caused a cutoff at every ply
+        self.killers = []
+        self.stop_event = None
+        self.ponder_results = {}
+        self.last_result = None
+
+    def choose_move(self, position, player_color):
+        return self.search(position, player_color).move
+
+    def new_game(self):
+        self.tt.clear()
+        self.ponder_results.clear()
+
+    def search(self, position, player_color):
+        """
+        Function to search a position with iterative deepening.
+        Args:
+            position (Position): The position to search.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        Returns:
+            SearchResult: The result of the deepest finished iteration.
+        """
+        started = time.perf_counter()
+        if self.book is not None:
+            move = self.book.choose(position, player_color)
+            if move is not None:
+                self.last_result = SearchResult(move, 0, 0, 0, time.perf_counter() - started)
+                return self.last_result
+        # a search of this position made while the opponent was thinking is reused, the
+        # searches of the other replies are dropped (their table entries stay)
+        pondered = self.ponder_results.pop(side_hash(position.hash, player_color), None)
+        self.ponder_results.clear()
+        result = self._iterative_deepening(position, player_color, started)
+        if pondered is not None and pondered.depth > result.depth:
+            result = pondered._replace(nodes=result.nodes, elapsed=result.elapsed)
+        self.last_result = result
+        return result
+
+    def _iterative_deepening(self, position, player_color, started):
+        """
+        Function to search one iteration deeper at a time, until the time budget, the
+        node limit or the stop event ends the search.
+        Returns:
+            SearchResult: The result of the deepest finished iteration.
+        """
+        # the search makes and unmakes moves in place on its own copy
+        position = position.copy()
+        self.nodes = 0
+        self.deadline = started + self.time_ms / 1000 if self.time_ms is not None else None
+        self.history.clear()
+        self.killers.clear()
+
+        moves = legal_moves(position, player_color)
+        if not moves:
+            return SearchResult(None, -WIN_SCORE, 0, 0, 0.0)
+        # a forced move needs no search
+        result = SearchResult(moves[0], 0, 0, 0, 0.0)
+        if len(moves) > 1:
+            self._order_root(moves)
+            for depth in range(min(self.first_depth, self.max_depth), self.max_depth + 1):
+                try:
+                    move, score = self._search_root(position, player_color, moves, depth)
+                except SearchTimeout:
+                    break
+                result = SearchResult(move, score, depth, self.nodes, time.perf_counter() - started)
+                # search the best move first in the next iteration
+                moves.remove(move)
+                moves.insert(0, move)
+                # nothing changes after a forced win or loss has been found
+                if abs(score) >= WIN_BOUND:
+                    break
+        return result._replace(nodes=self.nodes, elapsed=time.perf_counter() - started)
+
+    def ponder(self, position, player_color, stop_event):
+        """
+        Function to search on the opponent's time. The positions after every reply of the
+        opponent are searched one iteration deeper at a time, the opponent's best reply
+        first, until stop_event is set. The results are kept in ponder_results, the
+        transposition table keeps the rest.
+        """
+        replies = legal_moves(position, player_color)
+        if not replies:
+            return
+        opponent = opponent_of(player_color)
+        max_depth, time_ms = self.max_depth, self.time_ms
+        self.stop_event = stop_event
+        self.time_ms = None
+        try:
+            # a short search from the opponent's side finds the most likely reply
+            self.max_depth = min(4, max_depth)
+            guess = self._iterative_deepening(position.copy(), player_color, time.perf_counter()).move
+            replies.sort(key=lambda move: move != guess)
+            children = [play(position, move, player_color) for move in replies]
+            for depth in range(1, max_depth + 1):
+                self.max_depth = depth
+                for child in children:
+                    if stop_event.is_set():
+                        return
+                    key = side_hash(child.hash, opponent)
+                    if self.book is not None and self.book.choose(child, opponent) is not None:
+                        continue
+                    known = self.ponder_results.get(key)
+                    if known is not None and (known.depth >= depth or abs(known.score) >= WIN_BOUND):
+                        continue
+                    result = self._iterative_deepening(child, opponent, time.perf_counter())
+                    if result.depth and (known is None or result.depth > known.depth):
+                        self.ponder_results[key] = result
+        finally:
+            self.max_depth, self.time_ms = max_depth, time_ms
+            self.stop_event = None
+
+    def _order_root(self, moves):
+        """
+        Function to order the root moves before the first iteration.
+        They stay in generator order here, the helper processes of smp.py shuffle them.
+        """
+
+    def _search_root(self, position, player_color, moves, depth):
+        """
+        Function to search all root moves to the given depth.
+        Returns:
+            tuple: The best move and its score.
+        """
+        opponent = opponent_of(player_color)
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        best_move = moves[0]
+        for move in moves:
+            position.make(move, player_color)
+            if move is best_move:
+                score = -self._negamax(position, opponent, depth - 1, -beta, -alpha, 1)
+            else:
+                # the other moves only have to be shown worse than the best one so far,
+                # like the later moves in _negamax
+                score = -self._negamax(position, opponent, depth - 1, -alpha - 1, -alpha, 1)
+                if score > alpha:
+                    score = -self._negamax(position, opponent, depth - 1, -beta, -alpha, 1)
+            position.unmake()
+            if score > alpha:
+                alpha, best_move = score, move
+        self.tt.store(side_hash(position.hash, player_color), depth, EXACT, score_to_table(alpha, 0), encode_move(best_move))
+        return best_move, alpha
+
+    def _check_limits(self):
+        """
+        Function to stop the search when the time budget or the node limit is used up,
+        or when the stop event is set.
+        """
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout()
+        if self.node_limit is not None and self.nodes >= self.node_limit:
+            raise SearchTimeout()
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout()
+
+    def _order(self, moves, ply):
+        """
+        Function to sort moves so the most promising ones are searched first:
+        longer captures, promotions, the killer moves of the ply and moves with a good
+        cutoff history.
+        """
+        history = self.history
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        moves.sort(key=lambda move: (len(move.captured), move.promotion,
+                                     (move.path[0], move.path[-1]) in killers,
+                                     history.get((move.path[0], move.path[-1]), 0)), reverse=True)
+
+    def _add_killer(self, move, ply):
+        """
+        Function to remember a quiet move that caused a cutoff, for the ordering at the same ply.
+        """
+        killers = self.killers
+        while len(killers) <= ply:
+            killers.append([])
+        step = (move.path[0], move.path[-1])
+        if step not in killers[ply]:
+            killers[ply] = [step] + killers[ply][:1]
+
+    def _negamax(self, position, player_color, depth, alpha, beta, ply):
+        """
+        Function to search a position with negamax alpha-beta.
+        Args:
+            position (Position): The position to search.
+            player_color (str): The color of the player to move.
+            depth (int): The remaining depth, the search goes on below zero while captures are forced.
+            alpha (int): The lower bound of the search window.
+            beta (int): The upper bound of the search window.
+            ply (int): The distance from the root.
+        Returns:
+            int: The score from the point of view of the player to move.
+        """
+        self.nodes += 1
+        if self.nodes % CHECK_EVERY == 0:
+            self._check_limits()
+
+        tablebase = self.tablebase
+        if tablebase is not None and sum(position.counts) <= tablebase.max_pieces:
+            value = tablebase.probe_value(position.white, position.black, position.kings, player_color)
+            if value is not None:
+                if value == DRAW:
+                    return 0
+                # the stored distance counts from this position, the score from the root
+                distance = value - 1
+                return WIN_SCORE - ply - distance if distance % 2 else -WIN_SCORE + ply + distance
+
+        key = side_hash(position.hash, player_color)
+        entry = self.tt.probe(key)
+        table_move = NO_MOVE
+        if entry is not None:
+            entry_depth, bound, score, table_move = entry
+            if entry_depth >= depth:
+                score = score_from_table(score, ply)
+                if bound == EXACT or (bound == LOWER and score >= beta) or (bound == UPPER and score <= alpha):
+                    return score
+
+        if depth > 0:
+            moves = legal_moves(position, player_color)
+        else:
+            # quiescence: at the horizon only forced captures are searched further, the
+            # quiet moves are not generated, only whether there is one
+            moves = capture_moves(position, player_color)
+            if not moves and has_any_legal_move(position, player_color):
+                return evaluate(position, player_color)
+        if not moves:
+            # a player without moves has lost
+            return -WIN_SCORE + ply
+
+        if len(moves) > 1:
+            self._order(moves, ply)
+            # the best move of an earlier search of this position goes first
+            first = find_move(moves, table_move)
+            if first is not None and first is not moves[0]:
+                moves.remove(first)
+                moves.insert(0, first)
+        opponent = opponent_of(player_color)
+        original_alpha = alpha
+        best_score, best_move = -WIN_SCORE - 1, None
+        for index, move in enumerate(moves):
+            position.make(move, player_color)
+            if best_move is None:
+                score = -self._negamax(position, opponent, depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # late move reduction: a late quiet move is searched one ply less deep first
+                reduction = 1 if depth >= REDUCTION_DEPTH and index >= REDUCTION_MOVES and not move.captured else 0
+                # principal variation search: the later moves only have to be shown worse
+                # than the best one with a null window, a move that isn't is searched again
+                score = -self._negamax(position, opponent, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if reduction and score > alpha:
+                    score = -self._negamax(position, opponent, depth - 1, -alpha - 1, -alpha, ply + 1)
+                if alpha < score < beta:
+                    score = -self._negamax(position, opponent, depth - 1, -beta, -score, ply + 1)
+            position.unmake()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if not move.captured:
+                            history_key = (move.path[0], move.path[-1])
+                            self.history[history_key] = self.history.get(history_key, 0) + depth * depth
+                            self._add_killer(move, ply)
+                        break
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.tt.store(key, depth, bound, score_to_table(best_score, ply), encode_move(best_move))
+        return best_score
+
+
+def create_engine(level):
+    """
+    Function to create the computer player of a strength level from the menu.
+    Args:
+        level (str): The strength level ("1", "2", "3" or "4").
+    Returns:
+        Engine: The computer player.
+    """
+    settings = dict(STRENGTH_LEVELS[level])
+    # the endgame tables and the opening book are used when they have been built
+    # (python tablebase.py, python book.py)
+    settings['tablebase'] = load_tablebase()
+    settings['book'] = load_book()
+    if 'workers' in settings:
+        from smp import ParallelEngine
+        return ParallelEngine(**settings)
+    return AlphaBetaEngine(**settings)
+
+
+# The options of every engine name in a spec, see engine_from_spec
+SPEC_OPTIONS = {
+    'random': {'seed'},
+    'alphabeta': {'depth', 'nodes', 'time', 'tt', 'tb', 'book'},
+    'smp': {'workers', 'depth', 'nodes', 'time', 'tt', 'tb', 'book'},
+    'mcts': {'iterations', 'time', 'c', 'policy', 'plies', 'reuse', 'seed'},
+}
+
+
+def parse_spec(spec):
+    """
+    Function to read an engine description (see engine_from_spec) without creating the
+    engine, so a bad spec can be caught before anything is allocated or started.
+    Files are not opened and random generators not created, they stay as 'tb' and
+    'book' paths and a 'seed' number.
+    Args:
+        spec (str): The engine description.
+    Returns:
+        tuple: (engine name, keyword arguments of the engine class)
+    Raises:
+        ValueError: If the name, an option or a value is not valid.
+    """
+    name, _, options = spec.partition(":")
+    if name not in SPEC_OPTIONS:
+        raise ValueError(f"Unknown engine: {spec}")
+    settings = {}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        settings[key.strip()] = value.strip()
+    unknown = set(settings) - SPEC_OPTIONS[name]
+    if unknown:
+        raise ValueError(f"Unknown option {', '.join(sorted(unknown))} of engine {name}: {spec}")
+    arguments = {}
+    if 'seed' in settings:
+        arguments['seed'] = int(settings['seed'])
+    if name in ("alphabeta", "smp"):
+        if 'depth' in settings:
+            arguments['max_depth'] = int(settings['depth'])
+        if 'nodes' in settings:
+            arguments['node_limit'] = int(settings['nodes'])
+        if 'time' in settings:
+            arguments['time_ms'] = int(settings['time'])
+        elif arguments:
+            arguments['time_ms'] = None
+        if 'tt' in settings:
+            arguments['tt_mb'] = float(settings['tt'])
+        if 'tb' in settings:
+            arguments['tb'] = settings['tb']
+        if 'book' in settings:
+            arguments['book'] = settings['book']
+        if 'workers' in settings:
+            arguments['workers'] = int(settings['workers'])
+    elif name == "mcts":
+        if 'iterations' in settings:
+            arguments['iterations'] = int(settings['iterations'])
+        if 'time' in settings:
+            arguments['time_ms'] = int(settings['time'])
+        elif 'iterations' in settings:
+            arguments['time_ms'] = None
+        if 'c' in settings:
+            arguments['exploration'] = float(settings['c'])
+        if 'policy' in settings:
+            if settings['policy'] not in ('random', 'weighted'):
+                raise ValueError(f"Unknown playout policy: {settings['policy']}")
+            arguments['policy'] = settings['policy']
+        if 'plies' in settings:
+            arguments['playout_plies'] = int(settings['plies'])
+        if 'reuse' in settings:
+            arguments['reuse'] = settings['reuse'] not in ("0", "no", "false")
+    return name, arguments
+
+
+def engine_from_spec(spec):
+    """
+    Function to create an engine from a short text description, as used on the command line:
+        "random"
+        "alphabeta"                        (the defaults of AlphaBetaEngine)
+        "alphabeta:depth=6,time=200"       (depth limit, time budget in ms)
+        "alphabeta:nodes=5000,tt=4"        (node budget, transposition table in MB)
+        "smp:workers=8,time=1000"          (parallel search, see smp.py)
+        "alphabeta:depth=6,tb=tablebases"  (endgame tables of a directory, see tablebase.py)
+        "alphabeta:book=opening_book.bin"  (opening book file, see book.py)
+        "mcts:time=500,policy=weighted"    (Monte Carlo tree search, see mcts.py)
+        "mcts:iterations=2000,seed=1"      (playouts per move instead of a time budget)
+    A depth or node limit without a time budget searches without a clock, so games
+    between such engines can be repeated exactly.
+    Args:
+        spec (str): The engine description.
+    Returns:
+        Engine: The engine.
+    Raises:
+        ValueError: If the spec is not valid, see parse_spec.
+    """
+    name, arguments = parse_spec(spec)
+    if 'seed' in arguments:
+        seed = arguments.pop('seed')
+        arguments['rng'] = random.Random(seed)
+    if 'tb' in arguments:
+        arguments['tablebase'] = load_tablebase(arguments.pop('tb'))
+    if 'book' in arguments:
+        arguments['book'] = load_book(arguments['book'])
+    if name == "random":
+        return RandomEngine(**arguments)
+    if name == "smp":
+        # imported here, smp.py builds on this module
+        from smp import ParallelEngine
+        return ParallelEngine(arguments.pop('workers', None), **arguments)
+    if name == "mcts":
+        # imported here, mcts.py builds on this module
+        from mcts import MCTSEngine
+        return MCTSEngine(**arguments)
+    return AlphaBetaEngine(**arguments)
@@ -0,0 +1,97 @@
+# evaluation.py
+
+import json
+import os
+
+from bitboard import SQUARE_TO_RC, quiet_moves
+
+# Weights of the evaluation features. Scores are in hundredths of a man.
+DEFAULT_WEIGHTS = {
+    'man': 100,          # every man on the board
+    'king': 300,         # every king, flying kings are worth about three men
+    'advancement': 4,    # every row a man has moved towards promotion
+    'centre': 5,         # every piece on the eight centre squares
+    'back_rank': 8,      # every man still guarding the own back row
+    'mobility': 0,       # every non-capturing move, off by default: it needs the move generator
+}
+# Weights written by tuning.py, they replace the defaults when the file exists
+WEIGHTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "weights.json")
+
+
+def load_weights(path=WEIGHTS_FILE):
+    """
+    Function to load tuned weights.
+    Args:
+        path (str): The JSON file with a weight per feature name.
+    Returns:
+        dict: The default weights updated with the weights of the file, if it exists.
+    """
+    weights = dict(DEFAULT_WEIGHTS)
+    if os.path.exists(path):
+        with open(path) as f:
+            tuned = json.load(f)
+        unknown = set(tuned) - set(DEFAULT_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Unknown evaluation features in {path}: {', '.join(sorted(unknown))}")
+        weights.update({name: int(round(value)) for name, value in tuned.items()})
+    return weights
+
+
+WEIGHTS = load_weights()
+
+# Masks of the squares on every row
+ROW_MASKS = [0xF << (4 * row) for row in range(8)]
+# The eight dark squares on ranks 3 to 6 and files c to f
+CENTRE_MASK = sum(1 << sq for sq, (row, col) in enumerate(SQUARE_TO_RC) if 2 <= row <= 5 and 2 <= col <= 5)
+# (row mask, rows advanced) for the men of each color, rows without advancement are left out
+ADVANCEMENT_ROWS = {
+    'w': [(ROW_MASKS[row], 7 - row) for row in range(1, 7)],
+    'r': [(ROW_MASKS[row], row) for row in range(1, 7)],
+}
+# The same weights split into bit planes, (mask, bit value) pairs: three popcounts per
+# side instead of one per row, like batcheval.py does for many positions at once
+ADVANCEMENT_PLANES = {
+    color: [(sum(mask for mask, rows in parts if rows >> bit & 1), 1 << bit) for bit in range(3)]
+    for color, parts in ADVANCEMENT_ROWS.items()
+}
+BACK_RANK_MASK = {'w': ROW_MASKS[7], 'r': ROW_MASKS[0]}
+
+
+def side_score(own, kings, player_color, weights=WEIGHTS):
+    """
+    Function to score the pieces of one side.
+    Args:
+        own (int): Mask of the side's pieces.
+        kings (int): Mask of the kings of both colors.
+        player_color (str): The color of the side ('w' for white, 'r' for red).
+        weights (dict): The feature weights.
+    Returns:
+        int: The score of the side's pieces.
+    """
+    men = own & ~kings
+    score = weights['man'] * men.bit_count() + weights['king'] * (own & kings).bit_count()
+    advancement = 0
+    for mask, value in ADVANCEMENT_PLANES[player_color]:
+        advancement += (men & mask).bit_count() * value
+    score += weights['advancement'] * advancement
+    score += weights['centre'] * (own & CENTRE_MASK).bit_count()
+    score += weights['back_rank'] * (men & BACK_RANK_MASK[player_color]).bit_count()
+    return score
+
+
+def evaluate(position, player_color, weights=WEIGHTS):
+    """
+    Function to evaluate a position from the point of view of a player.
+    Args:
+        position (Position): The position to evaluate.
+        player_color (str): The color of the player ('w' for white, 'r' for red).
+        weights (dict): The feature weights.
+    Returns:
+        int: A positive score if the player stands better, a negative one otherwise.
+    """
+    white = side_score(position.white, position.kings, 'w', weights)
+    black = side_score(position.black, position.kings, 'r', weights)
+    if weights.get('mobility'):
+        white += weights['mobility'] * len(quiet_moves(position, 'w'))
+        black += weights['mobility'] * len(quiet_moves(position, 'r'))
+    return white - black if player_color == 'w' else black - white
@@ -1,8 +1,15 @@
 # game.py
 
 from board import initialize_board, display_board
-from rules import apply_capture, promote_to_queen, mandatory_capture, non_capture_moves, is_game_over, finalize_captures
-from ui import get_player_names, display_invalid_move_message, display_capture_required_message, display_game_over_message, display_winner
+from rules import apply_capture, promote_to_queen, mandatory_capture, is_game_over, finalize_captures, legal_moves, apply_move, has_capture, is_legal
+from bitboard import move_to_notation, from_board
+from draws import DrawTracker
+from engine import create_engine
+from ponder import Ponderer
+from renderer import RENDERER
+from profiling import PROFILER
+from pdn import game_from_history, write_games
+from ui import get_player_names, display_invalid_move_message, display_capture_required_message, display_game_over_message, display_winner, display_draw_message, display_game_saved_message
 import random
 
 def get_move(board, player_name, color, move_history, rotated):
@@ -74,15 +81,13 @@ def make_move(board, start_pos, end_pos, player_color, sequence, rotated, player
 
     # print(f"[Make Move] Start Pos: ({start_row}, {start_col}), End Pos: ({end_row}, {end_col}), Player Color: {player_color}, Piece: {board[start_row][start_col]}")  # Debug print
     capture_move_flag = False
-    # get mandatory captures list
-    possible_captures = mandatory_capture(board, player_color)
-    # print(f"[Make Move] Mandatory Captures: {possible_captures}")  # Debug print
-    # if there are any mandatory captures
-    if possible_captures:
-        # check if the player's move is in the mandatory capture's list
-        if ((start_row, start_col), (end_row, end_col)) not in possible_captures:
+    # if there are any mandatory captures (the check stops at the first one found)
+    if has_capture(board, player_color):
+        # check if the player's move is one of the mandatory captures
+        if not is_legal(board, player_color, (start_row, start_col), (end_row, end_col)):
             display_board(board, player_name, color, move_history, rotated)
-            display_capture_required_message(possible_captures)
+            # the full list is only built to show the options
+            display_capture_required_message(mandatory_capture(board, player_color))
             return False
         # setting captures move flag to True
         capture_move_flag = True
@@ -117,7 +122,8 @@ def make_move(board, start_pos, end_pos, player_color, sequence, rotated, player
                 # trying to set the next position of the capturing peice according to the player's input
                 next_capture_end = sequence[0]
                 # checking if the next capture from user's input is possible and make a move if yes
-                if ((end_row, end_col), convert_position(next_capture_end)) in additional_captures:
+                if is_legal(board, player_color, (end_row, end_col), convert_position(next_capture_end),
+                            specific_piece=(end_row, end_col)):
                     
                     return make_move(board, next_capture_start, next_capture_end, player_color, sequence[1:], rotated, player_name, color,move_history, player_move)
                 else:
@@ -138,8 +144,7 @@ def make_move(board, start_pos, end_pos, player_color, sequence, rotated, player
             # making move according to all above to next_capture_end
             return make_move(board, next_capture_start, next_capture_end, player_color, sequence, rotated, player_name, color,move_history, player_move)
     else:
-        non_capture_moves_list = non_capture_moves(board, player_color)
-        if ((start_row, start_col), (end_row, end_col)) not in non_capture_moves_list:
+        if not is_legal(board, player_color, (start_row, start_col), (end_row, end_col)):
             display_board(board, player_name, color, move_history, rotated)
             display_invalid_move_message()
             return False
@@ -151,24 +156,60 @@ def make_move(board, start_pos, end_pos, player_color, sequence, rotated, player
         promote_to_queen(board, (end_row, end_col))
     return True
 
-def get_computer_move(board, player_color):
-    possible_moves = mandatory_capture(board, player_color) or non_capture_moves(board, player_color)
+def get_computer_move(board, player_color, engine=None):
+    """
+    Function to choose the computer's move.
+    Args:
+        board (list): The current state of the board.
+        player_color (str): The color of the computer ('w' for white, 'r' for red).
+        engine (Engine): The engine that chooses the move, a random legal move is played without one.
+    Returns:
+        Move: A complete move with its whole capture sequence, or None if there are no moves.
+    """
+    if engine is not None:
+        return engine.choose_move(from_board(board), player_color)
+    possible_moves = legal_moves(board, player_color)
     if possible_moves:
         return random.choice(possible_moves)
     return None
 
-def play_game(choice, color_choice):
+def save_game(pdn_file, move_history, players, winner_color):
+    """
+    Function to add a finished game to a PDN file.
+    Args:
+        pdn_file (str): The PDN file.
+        move_history (dict): The moves of "White" and "Black".
+        players (list): The (name, color) of both players.
+        winner_color (str): "White", "Black" or "Draw".
+    """
+    names = dict((color, name) for name, color in players)
+    write_games(pdn_file, [game_from_history(move_history, names["White"], names["Black"], winner_color)])
+    display_game_saved_message(pdn_file)
+
+def play_game(choice, color_choice, level="2", pdn_file=None):
     """
     Function to manage the game play.
+    Args:
+        choice (str): The game mode from the menu ("1" for 2 players, "2" against the computer).
+        color_choice (str): The color of the human player against the computer.
+        level (str): The strength of the computer player ("1", "2", "3" or "4").
+        pdn_file (str): A PDN file the finished game is added to, if any.
+    Returns:
+        str: The result of the game: "White", "Black" or "Draw".
     """
     # print("\033c")
     # player1, player2 = get_player_names()
+    engine = None
+    ponderer = None
     if choice == "1":
         player1, player2 = get_player_names()
         players = [(player1, 'White'), (player2, 'Black')]
     else:
         player1 = input("\nEnter the name of player: ").strip()
         player2 = "Computer"
+        engine = create_engine(level)
+        # the computer thinks on the human player's time as well
+        ponderer = Ponderer(engine)
         if color_choice == "White":  
             players = [(player1, 'White'), (player2, 'Black')]
         else:
@@ -176,6 +217,8 @@ def play_game(choice, color_choice):
     
     
     board = initialize_board()
+    # the menu cleared the screen, the first board is drawn whole
+    RENDERER.reset()
     # Initialize move history for each player
     move_history = {"White": [], "Black": []}
     # players = [(player1, 'White'), (player2, 'Black')]
@@ -183,6 +226,8 @@ def play_game(choice, color_choice):
     current_player_index = 0
     # flag to rotate the board according to player's turn
     rotated = False
+    # positions and move counters for the draw rules
+    draws = DrawTracker(from_board(board), 'w')
 
     while True:
         # initialize player's tmp move sequence
@@ -193,19 +238,27 @@ def play_game(choice, color_choice):
         print("\n")
         # flag to know if there was a successful move
         move_successful = False
+        # current player color flag
+        player_color = 'w' if color == 'White' else 'r'
+        # timing and counters of the turn, only when profiling is on (main.py --profile)
+        turn = PROFILER.start_turn(engine)
+        if ponderer is not None and player_name != "Computer":
+            ponderer.start(from_board(board), player_color)
         while not move_successful:
-            # current player color flag
-            player_color = 'w' if color == 'White' else 'r'
             if player_name == "Computer":
-                start_pos, end_pos = None, None
-                move = get_computer_move(board, 'r' if color == 'Black' else 'w')
+                move = get_computer_move(board, player_color, engine)
                 if move:
-                    start_pos, end_pos = f"{chr(move[0][1] + ord('a'))}{8 - move[0][0]}", f"{chr(move[1][1] + ord('a'))}{8 - move[1][0]}"
-                    move_successful = make_move(board, start_pos, end_pos, 'r' if color == 'Black' else 'w', [], rotated, player_name, color, move_history, player_move)
+                    # the computer plays the whole capture sequence in one step
+                    apply_move(board, move, player_color)
+                    player_move.append(move_to_notation(move))
+                    move_successful = True
             else:
                 start_pos, end_pos, sequence = get_move(board, player_name, color, move_history, rotated)
                 # print(f"[Play Game] Player: {player_name}, Color: {color}, Player Color: {player_color}")  # Debug print
                 move_successful = make_move(board, start_pos, end_pos, player_color, sequence, rotated, player_name, color, move_history, player_move)
+        if ponderer is not None:
+            ponderer.stop()
+        PROFILER.end_turn(turn, player_color, engine if player_name == "Computer" else None)
         # adding full sequence of the current player's move to the move history
         move_history[color].append(player_move[0])
         # replace tagged for capture fields with dots
@@ -216,11 +269,28 @@ def play_game(choice, color_choice):
             player_name = next(player[0] for player in players if player[1] == color)
             display_board(board, player_name, color, move_history, rotated)
             display_winner(player_name, color)
+            result = color
+            if pdn_file:
+                save_game(pdn_file, move_history, players, color)
             display_game_over_message()
             break
-                
+        # check the draw rules with the opponent to move
+        draw_reason = draws.update(from_board(board), 'r' if player_color == 'w' else 'w')
+        if draw_reason:
+            display_board(board, player_name, color, move_history, rotated)
+            display_draw_message(draw_reason)
+            result = "Draw"
+            if pdn_file:
+                save_game(pdn_file, move_history, players, "Draw")
+            display_game_over_message()
+            break
+
         rotated = not rotated  # Toggle the rotation flag
         current_player_index = 1 - current_player_index  # Switch player turn
+    if engine is not None:
+        # the strongest level searches with background processes
+        engine.close()
+    return result
 
 if __name__ == "__main__":
     play_game()
@@ -0,0 +1,119 @@
+# gridscan.py
+
+# The move scan of the string grid that rules.py used before the bitboard backend
+# (bitboard.py), kept unchanged as the reference of the move generation benchmark,
+# see perft.py --generation. The game doesn't use it.
+
+def mandatory_capture(board, player_color, specific_piece=None):
+    """
+    Check for mandatory captures.
+    Args:
+        board (list): The current state of the board.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+        specific_piece (tuple): A specific piece position to check for captures, if any.
+    Returns:
+        list: A list of tuples indicating mandatory capture moves.
+    """
+    # Directions for regular pieces (capture by jumping 2 squares in a direction)
+    directions = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
+    # Directions for king pieces (can capture in multiple steps in any diagonal direction)
+    # king_directions = [(-i, -i) for i in range(1, 8)] + [(-i, i) for i in range(1, 8)] + \
+    #                   [(i, -i) for i in range(1, 8)] + [(i, i) for i in range(1, 8)]
+    king_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+    # variable to store mandatory capture moves
+    mandatory_captures = []
+    
+    # Determine which pieces to check for mandatory captures
+    if specific_piece:
+        pieces_to_check = [specific_piece]
+    else:
+        pieces_to_check = [(row, col) for row in range(8) for col in range(8) if board[row][col].lower() == player_color]
+    # Loop through each piece to check for possible captures
+    
+    for row, col in pieces_to_check:
+        piece = board[row][col]
+        if piece.lower() == player_color:
+            # Check captures for king pieces
+            if piece.isupper():
+                for direction in king_directions:
+                    step_row, step_col = direction
+                    opponent_encountered = False
+                    for distance in range(1, 8):
+                        row_next = row + step_row * distance
+                        col_next = col + step_col * distance
+                        if not (0 <= row_next < 8 and 0 <= col_next < 8):
+                            break
+                        if board[row_next][col_next] == '.':
+                            if opponent_encountered:
+                                mandatory_captures.append(((row, col), (row_next, col_next)))
+                        elif board[row_next][col_next].lower() != player_color.lower() and board[row_next][col_next] != '.' and board[row_next][col_next].lower() != 'c':
+                            if not opponent_encountered:
+                                opponent_encountered = True
+                            else:
+                                break
+                        else:
+                            break
+            # Check captures for regular pieces
+            else:
+                for direction in directions:
+                    row_next = row + direction[0]
+                    col_next = col + direction[1]
+
+                    if not (0 <= row_next < 8 and 0 <= col_next < 8):
+                        continue
+                    # Check if the position is within bounds
+                    mid_row = row + (row_next - row) // 2
+                    mid_col = col + (col_next - col) // 2
+                    # Check if the next position is empty and there's an opponent's piece to capture
+                    if (board[row_next][col_next] == '.' and 
+                        board[mid_row][mid_col].lower() != player_color.lower() and 
+                        board[mid_row][mid_col] != '.' and 
+                        board[mid_row][mid_col].lower() != 'c'):
+                        mandatory_captures.append(((row, col), (row_next, col_next)))
+
+    # Remove duplicate capture moves
+    # mandatory_captures = list(set(mandatory_captures))
+    
+    return mandatory_captures
+
+def non_capture_moves(board, player_color):
+    """
+    Get all possible non-capturing moves for the player's pieces.
+    Args:
+        board (list): The current state of the board.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        list: A list of tuples indicating non-capturing moves.
+    """
+    directions = [(-1, -1), (-1, 1)] if player_color == 'w' else [(1, -1), (1, 1)]
+    non_capture_moves_list = []
+
+    for row in range(8):
+        for col in range(8):
+            piece = board[row][col]
+            if piece.lower() == player_color:
+                # Check for regular non-capturing moves
+                for dr, dc in directions:
+                    new_row, new_col = row + dr, col + dc
+                    if 0 <= new_row < 8 and 0 <= new_col < 8:
+                        if board[new_row][new_col] == '.':
+                            non_capture_moves_list.append(((row, col), (new_row, new_col)))
+
+                if piece.isupper():  # Check for flying king non-capturing moves
+                    for dr in range(-7, 8):
+                        for dc in range(-7, 8):
+                            if abs(dr) == abs(dc) and (dr != 0 or dc != 0):
+                                new_row, new_col = row + dr, col + dc
+                                if 0 <= new_row < 8 and 0 <= new_col < 8 and board[new_row][new_col] == '.':
+                                    # Ensure there are no pieces blocking the path
+                                    path_clear = True
+                                    step_row = dr // abs(dr)
+                                    step_col = dc // abs(dc)
+                                    for step in range(1, abs(dr)):
+                                        if board[row + step * step_row][col + step * step_col] != '.':
+                                            path_clear = False
+                                            break
+                                    if path_clear:
+                                        non_capture_moves_list.append(((row, col), (new_row, new_col)))
+
+    return non_capture_moves_list
@@ -0,0 +1,67 @@
+# headless.py
+
+import random
+from collections import namedtuple
+
+from bitboard import from_board, legal_moves, move_to_notation, has_any_legal_move
+from board import initialize_board
+from draws import DrawTracker
+
+# Result of a game played without a terminal
+#     result (str): "White" or "Black" for the winner, "Draw" by a draw rule or the move cap.
+#     reason (str): "no moves" when the loser had no pieces or moves left, the draw rule
+#         (see draws.py) or "move cap" for a draw.
+#     moves (list): The moves of both players in 'a3-b4-d6' notation, White first.
+#     plies (int): The number of moves played.
+GameRecord = namedtuple('GameRecord', ['result', 'reason', 'moves', 'plies'])
+
+COLOR_NAMES = {'w': "White", 'r': "Black"}
+
+
+def play_headless_game(white_engine, black_engine, max_plies=300, opening_plies=0, rng=None, position=None):
+    """
+    Function to play a game between two engines without any input or output.
+    It uses the same move generator as the terminal game, so the rules are the same.
+    Args:
+        white_engine (Engine): The engine playing White.
+        black_engine (Engine): The engine playing Black (red pieces).
+        max_plies (int): The move cap, the game is a draw when it is reached.
+        opening_plies (int): The number of random moves played at the start to vary the openings.
+        rng (random.Random): The random generator for the opening moves.
+        position (Position): The starting position, the standard setup if None.
+    Returns:
+        GameRecord: The result and the moves of the game.
+    """
+    rng = rng or random.Random()
+    if position is None:
+        position = from_board(initialize_board())
+    else:
+        position = position.copy()
+    engines = {'w': white_engine, 'r': black_engine}
+    player_color = 'w'
+    moves = []
+    draws = DrawTracker(position, player_color)
+
+    while len(moves) < max_plies:
+        if len(moves) < opening_plies:
+            possible_moves = legal_moves(position, player_color)
+            move = rng.choice(possible_moves) if possible_moves else None
+        else:
+            move = engines[player_color].choose_move(position, player_color)
+        # a player without pieces or moves has lost
+        if move is None:
+            winner = 'r' if player_color == 'w' else 'w'
+            return GameRecord(COLOR_NAMES[winner], "no moves", moves, len(moves))
+        moves.append(move_to_notation(move))
+        position.make(move, player_color)
+        player_color = 'r' if player_color == 'w' else 'w'
+        # a move that leaves the opponent without pieces or moves wins, even when a draw
+        # rule fires on the same ply (as in game.py)
+        if not has_any_legal_move(position, player_color):
+            winner = 'r' if player_color == 'w' else 'w'
+            return GameRecord(COLOR_NAMES[winner], "no moves", moves, len(moves))
+        draw_reason = draws.update(position, player_color)
+        if draw_reason:
+            return GameRecord("Draw", draw_reason, moves, len(moves))
+
+    return GameRecord("Draw", "move cap", moves, len(moves))
@@ -0,0 +1,150 @@
+# loadtest.py
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+from server import HOST, PORT, LEVELS
+
+
+def percentile(values, fraction):
+    """
+    Function to get a percentile of sorted values, the nearest rank.
+    Args:
+        values (list): The values, sorted.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+    Returns:
+        float: The value, 0 if there are none.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class Client:
+    """
+    One connection to the server, sending one request at a time.
+    Attributes:
+        latencies (list): The seconds between sending every MOVE and getting its reply.
+    """
+
+    def __init__(self, reader, writer, latencies):
+        self.reader = reader
+        self.writer = writer
+        self.latencies = latencies
+
+    async def request(self, line):
+        """
+        Function to send a request and wait for the reply.
+        Returns:
+            list: The words of the reply after "OK".
+        Raises:
+            RuntimeError: If the server answers with an error.
+        """
+        self.writer.write(line.encode("ascii") + b"\n")
+        reply = (await self.reader.readline()).decode("ascii").split()
+        if not reply or reply[0] != "OK":
+            raise RuntimeError(f"{line}: {' '.join(reply) or 'connection closed'}")
+        return reply[1:]
+
+    async def play_game(self, side, level, rng, max_plies):
+        """
+        Function to play one game with random moves.
+        Returns:
+            int: The number of moves the client played.
+        """
+        reply = await self.request(f"NEW {side} {level}")
+        game_id, state = reply[0], reply[1]
+        played = 0
+        while state == "playing" and played < max_plies:
+            moves = await self.request(f"MOVES {game_id}")
+            started = time.perf_counter()
+            reply = await self.request(f"MOVE {game_id} {rng.choice(moves)}")
+            self.latencies.append(time.perf_counter() - started)
+            state = reply[0]
+            played += 1
+        await self.request(f"RESIGN {game_id}")
+        return played
+
+
+async def run(clients, games, side="both", level="random", host=HOST, port=PORT, unix_path=None,
+              max_plies=200, seed=0, log=sys.stdout):
+    """
+    Function to play games on the server from many connections at once.
+    Args:
+        clients (int): The number of connections, each plays its games one after the other.
+        games (int): The number of games per connection.
+        side (str): The color the clients play, "both" to play both colors.
+        level (str): The computer level when the clients play one color.
+        host (str): The address of the server.
+        port (int): The TCP port of the server.
+        unix_path (str): The Unix socket of the server instead of TCP, if any.
+        max_plies (int): Games are resigned after this many moves of the client.
+        seed (int): The seed of the random moves.
+        log (file): Where to print the results, None to print nothing.
+    Returns:
+        dict: The moves, the time, moves per second and the p50 and p99 latencies in ms.
+    """
+    latencies = []
+
+    async def client(index):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        connection = Client(reader, writer, latencies)
+        rng = random.Random(seed * 1000003 + index)
+        try:
+            for _ in range(games):
+                await connection.play_game(side, level, rng, max_plies)
+            await connection.request("QUIT")
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    report = {
+        'clients': clients,
+        'games': clients * games,
+        'moves': len(latencies),
+        'seconds': elapsed,
+        'moves_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+    if log:
+        print(f"{report['games']} games on {clients} connections: {report['moves']} moves in {elapsed:.1f} s, "
+              f"{report['moves_per_second']:.0f} moves/s, latency p50 {report['p50_ms']:.2f} ms "
+              f"p99 {report['p99_ms']:.2f} ms", file=log)
+    return report
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python loadtest.py --clients 1000 --games 5
+        python loadtest.py --clients 200 --side white --level 1
+    """
+    parser = argparse.ArgumentParser(description="Play random games on a running server.py and measure it.")
+    parser.add_argument("--clients", type=int, default=100, help="concurrent connections")
+    parser.add_argument("--games", type=int, default=1, help="games per connection")
+    parser.add_argument("--side", default="both", choices=("white", "black", "both"),
+                        help="color the clients play, the server's computer plays the other")
+    parser.add_argument("--level", default="random", choices=LEVELS, help="computer level against one color")
+    parser.add_argument("--host", default=HOST, help="address of the server")
+    parser.add_argument("--port", type=int, default=PORT, help="TCP port of the server")
+    parser.add_argument("--unix", default=None, metavar="PATH", help="Unix socket of the server")
+    parser.add_argument("--max-plies", type=int, default=200, help="resign after this many moves")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random moves")
+    args = parser.parse_args(argv)
+    asyncio.run(run(args.clients, args.games, args.side, args.level, args.host, args.port, args.unix,
+                    args.max_plies, args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,17 @@
 # main.py
 
+import argparse
+import cProfile
+import os
+import time
+
 # importing function to start the game
 from game import play_game
+import profiling
+from renderer import RENDERER
+
+# the file finished games are added to with --save, in Portable Draughts Notation
+SAVED_GAMES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "games.pdn")
 
 def display_menu():
     print("\033c")
@@ -27,19 +37,59 @@ def display_menu():
                 break
             else:
                 print("Invalid input. Please enter 'White' or 'Black'.")
-        return choice, color_choice
+        while True:
+            # the strength sets the search depth and the thinking time of the computer
+            level = input("Choose computer strength (1 - Easy, 2 - Medium, 3 - Hard, 4 - Hard on all cores): ").strip()
+            if level in ["1", "2", "3", "4"]:
+                break
+            else:
+                print("Invalid input. Please enter 1, 2, 3, or 4.")
+        return choice, color_choice, level
     else:
-        return choice, None
+        return choice, None, None
 
-def main():
+def main(argv=None):
     """
     Main function to start the game.
     """
-    choice, color_choice = display_menu()
+    parser = argparse.ArgumentParser(description="Checkers game in the terminal.")
+    parser.add_argument("--profile", nargs="?", const=profiling.DEFAULT_DIRECTORY, default=None, metavar="DIR",
+                        help="write a JSON report of the game to DIR (default: the profiles folder)")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="with --profile, also write cProfile stats (for snakeviz, flameprof or gprof2dot)")
+    parser.add_argument("--save", nargs="?", const=SAVED_GAMES, default=None, metavar="FILE",
+                        help="add the finished game to a PDN file (default: games.pdn next to main.py)")
+    parser.add_argument("--plain", action="store_true",
+                        help="draw the board as plain text without colors or cursor movement, e.g. for a log")
+    args = parser.parse_args(argv)
+    if args.plain:
+        RENDERER.plain = True
+
+    choice, color_choice, level = display_menu()
     if choice == "3":
         print("Exiting the game. Goodbye!\n")
         return
-    play_game(choice, color_choice)
+    if not args.profile:
+        play_game(choice, color_choice, level, args.save)
+        return
+
+    # the counters only run for the profiled game, the wrappers are removed afterwards
+    profiler = cProfile.Profile() if args.cprofile else None
+    profiling.enable()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        result = play_game(choice, color_choice, level, args.save)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        profiling.disable()
+    stem = os.path.join(args.profile, time.strftime("game-%Y%m%d-%H%M%S"))
+    profiling.PROFILER.write_report(stem + ".json", mode=choice, level=level, color=color_choice, result=result)
+    print(f"Profile written to {stem}.json")
+    if profiler is not None:
+        profiler.dump_stats(stem + ".prof")
+        print(f"cProfile stats written to {stem}.prof")
 
 if __name__ == "__main__":
     main()
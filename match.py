@@ -0,0 +1,257 @@
+# match.py
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from engine import engine_from_spec, parse_spec
+from headless import play_headless_game
+
+# Engines of the current worker process, built once by _init_worker
+_worker_engines = {}
+
+
+def elo_difference(score):
+    """
+    Function to convert a score fraction into an Elo difference.
+    Args:
+        score (float): The points scored divided by the games played.
+    Returns:
+        float: The Elo difference, +/- infinity for a score of 1 or 0.
+    """
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return -400 * math.log10(1 / score - 1)
+
+
+class MatchStats:
+    """
+    Running win/loss/draw counts of engine A against engine B, with the Elo difference
+    and its 95% error margin.
+    """
+
+    def __init__(self):
+        self.wins = 0
+        self.losses = 0
+        self.draws = 0
+        self.plies = 0
+        self.started = time.perf_counter()
+
+    @property
+    def games(self):
+        return self.wins + self.losses + self.draws
+
+    def add(self, points, plies):
+        """
+        Function to add the result of a game.
+        Args:
+            points (float): The points of engine A: 1, 0.5 or 0.
+            plies (int): The length of the game.
+        """
+        if points == 1:
+            self.wins += 1
+        elif points == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+        self.plies += plies
+
+    def score(self):
+        """
+        Function to get the score fraction of engine A.
+        """
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    def elo(self):
+        """
+        Function to get the Elo difference of engine A and its 95% error margin.
+        Returns:
+            tuple: (Elo difference, error margin)
+        """
+        games = self.games
+        if not games:
+            return 0.0, math.inf
+        score = self.score()
+        # a clean sweep has no finite Elo difference and no error margin
+        if score <= 0 or score >= 1:
+            return elo_difference(score), math.inf
+        variance = (self.wins * (1 - score) ** 2 + self.losses * score ** 2
+                    + self.draws * (0.5 - score) ** 2) / games
+        spread = 1.96 * math.sqrt(variance / games)
+        low, high = elo_difference(score - spread), elo_difference(score + spread)
+        return elo_difference(score), (high - low) / 2
+
+    def summary(self):
+        """
+        Function to get the statistics as a dict, e.g. for a JSON report.
+        Infinite Elo figures are given as None, JSON has no infinity.
+        """
+        elo, margin = (value if math.isfinite(value) else None for value in self.elo())
+        elapsed = time.perf_counter() - self.started
+        return {
+            'games': self.games,
+            'wins': self.wins,
+            'losses': self.losses,
+            'draws': self.draws,
+            'score': self.score(),
+            'elo': elo,
+            'elo_margin': margin,
+            'games_per_second': self.games / elapsed if elapsed > 0 else 0.0,
+            'average_plies': self.plies / self.games if self.games else 0.0,
+        }
+
+    def format(self):
+        """
+        Function to format the statistics as one line of text.
+        """
+        summary = self.summary()
+        elo, margin = self.elo()
+        return (f"games {summary['games']}  +{self.wins} -{self.losses} ={self.draws}  "
+                f"score {summary['score']:.3f}  Elo {elo:+.1f} +/- {margin:.1f}  "
+                f"{summary['games_per_second']:.1f} games/s  {summary['average_plies']:.0f} plies/game")
+
+
+def _check_spec(spec):
+    """
+    Function to read the spec of an engine of the match before any process is started.
+    The engines are built in the worker processes of the pool, which are daemon processes
+    and can't start processes of their own, so the parallel search 'smp' is refused.
+    Args:
+        spec (str): The engine description, see engine.engine_from_spec.
+    Raises:
+        ValueError: If the spec is not valid or names the smp engine.
+    """
+    name, _ = parse_spec(spec)
+    if name == "smp":
+        raise ValueError(f"The smp engine can't play in a match, the match workers can't start its "
+                         f"processes; use alphabeta (one process per game) instead: {spec}")
+
+
+def _init_worker(engine_a, engine_b):
+    """
+    Function to build the engines once in every worker process.
+    """
+    _worker_engines['A'] = engine_from_spec(engine_a)
+    _worker_engines['B'] = engine_from_spec(engine_b)
+
+
+def _play_task(task):
+    """
+    Function to play one game of the match in a worker process.
+    Engine A plays White in even games and Black in odd ones.
+    Args:
+        task (tuple): (game index, random seed, move cap, random opening plies, keep moves)
+    Returns:
+        dict: The game index, the color of engine A, the result and engine A's points.
+    """
+    index, seed, max_plies, opening_plies, keep_moves = task
+    engine_a, engine_b = _worker_engines['A'], _worker_engines['B']
+    engine_a.new_game()
+    engine_b.new_game()
+    a_is_white = index % 2 == 0
+    white, black = (engine_a, engine_b) if a_is_white else (engine_b, engine_a)
+    record = play_headless_game(white, black, max_plies, opening_plies, random.Random(seed))
+    if record.result == "Draw":
+        points = 0.5
+    else:
+        points = 1.0 if (record.result == "White") == a_is_white else 0.0
+    result = {
+        'game': index,
+        'a_color': "White" if a_is_white else "Black",
+        'result': record.result,
+        'reason': record.reason,
+        'plies': record.plies,
+        'a_points': points,
+    }
+    if keep_moves:
+        result['moves'] = record.moves
+    return result
+
+
+def run_match(engine_a, engine_b, games, workers=None, max_plies=300, opening_plies=4, seed=0,
+              output=None, report_every=100, keep_moves=False, log=sys.stdout):
+    """
+    Function to play a match between two engines on a pool of processes.
+    Results are streamed: every finished game is written to the output file right away and
+    the running statistics are printed every report_every games.
+    Args:
+        engine_a (str): The spec of engine A, see engine.engine_from_spec.
+        engine_b (str): The spec of engine B.
+        games (int): The number of games to play.
+        workers (int): The number of worker processes, all cores if None.
+        max_plies (int): The move cap per game, the game is a draw when it is reached.
+        opening_plies (int): The number of random moves at the start of every game.
+        seed (int): The base seed of the random openings, the match can be repeated with it.
+        output (str): A file to write one JSON line per game to, if any.
+        report_every (int): How often (in games) to print the statistics.
+        keep_moves (bool): True to write the moves of every game to the output file.
+        log (file): Where to print the statistics, None to print nothing.
+    Returns:
+        MatchStats: The statistics of the whole match.
+    Raises:
+        ValueError: If an engine spec is not valid or can't play in a match, see _check_spec.
+    """
+    # the specs are only read here, so a bad spec fails before any process is started
+    # without building engines (tables, processes) the parent doesn't use
+    _check_spec(engine_a)
+    _check_spec(engine_b)
+    workers = workers or os.cpu_count() or 1
+    stats = MatchStats()
+    # the tasks are generated lazily, long matches don't keep them all in memory
+    tasks = ((index, seed * 1000003 + index, max_plies, opening_plies, keep_moves) for index in range(games))
+    # small chunks keep the statistics streaming, larger ones cut the messaging overhead
+    chunksize = max(1, min(16, games // (workers * 8)))
+    out = open(output, "a") if output else None
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(engine_a, engine_b)) as pool:
+            for result in pool.imap_unordered(_play_task, tasks, chunksize=chunksize):
+                stats.add(result['a_points'], result['plies'])
+                if out:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+                if log and (stats.games % report_every == 0 or stats.games == games):
+                    print(stats.format(), file=log, flush=True)
+    finally:
+        if out:
+            out.close()
+    return stats
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python match.py --engine-a alphabeta:depth=4 --engine-b random --games 1000
+    """
+    parser = argparse.ArgumentParser(description="Play engine against engine on all cores.")
+    parser.add_argument("--engine-a", default="alphabeta:depth=4", help="engine A, e.g. alphabeta:depth=6,time=100")
+    parser.add_argument("--engine-b", default="random", help="engine B, e.g. random")
+    parser.add_argument("--games", type=int, default=100, help="number of games")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--max-plies", type=int, default=300, help="move cap per game, then it is a draw")
+    parser.add_argument("--opening-plies", type=int, default=4, help="random moves at the start of every game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random openings")
+    parser.add_argument("--output", default=None, help="file to append one JSON line per game to")
+    parser.add_argument("--moves", action="store_true", help="write the moves of every game to the output file")
+    parser.add_argument("--report-every", type=int, default=100, help="print the statistics every N games")
+    args = parser.parse_args(argv)
+    for spec in (args.engine_a, args.engine_b):
+        try:
+            _check_spec(spec)
+        except ValueError as error:
+            parser.error(str(error))
+
+    stats = run_match(args.engine_a, args.engine_b, args.games, args.workers, args.max_plies,
+                      args.opening_plies, args.seed, args.output, args.report_every, args.moves)
+    print(json.dumps(stats.summary()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+# mcts.py
+
+import math
+import random
+import time
+
+from bitboard import legal_moves
+from engine import Engine, SearchResult, opponent_of
+
+# Exploration constant of the UCT formula, sqrt(2) in theory
+EXPLORATION = 1.4
+# Playouts longer than this are stopped and judged by the material
+PLAYOUT_PLIES = 120
+# The material lead (in hundredths of a man) that counts as a win when a playout is stopped
+ADJUDICATION_MARGIN = 200
+
+
+class Node:
+    """
+    A position in the search tree. The position itself is not kept, it is reached by
+    making the moves of the path from the root.
+    Attributes:
+        move (Move): The move that leads to the node, None at the root.
+        parent (Node): The node before the move, None at the root.
+        player_color (str): The color of the player to move in the node.
+        key (tuple): The masks and the color to move, to find the node again when the tree is reused.
+        children (list): The expanded child nodes.
+        untried (list): The legal moves without a child node yet, None until the node is visited.
+        visits (int): The number of playouts through the node.
+        wins (float): The points of those playouts for the player who made the move, 0.5 per draw.
+    """
+    __slots__ = ('move', 'parent', 'player_color', 'key', 'children', 'untried', 'visits', 'wins')
+
+    def __init__(self, move, parent, player_color, key):
+        self.move = move
+        self.parent = parent
+        self.player_color = player_color
+        self.key = key
+        self.children = []
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self, exploration):
+        """
+        Function to pick the child with the highest upper confidence bound (UCT).
+        """
+        log_visits = math.log(self.visits)
+        return max(self.children,
+                   key=lambda child: child.wins / child.visits + exploration * math.sqrt(log_visits / child.visits))
+
+
+def _position_key(position, player_color):
+    """
+    Function to build the key of a node.
+    """
+    return (position.white, position.black, position.kings, player_color)
+
+
+class MCTSEngine(Engine):
+    """
+    Monte Carlo tree search with UCT selection. Every iteration walks down the tree,
+    adds one node and plays the game out with random moves from there; the result is
+    counted in every node of the path. The tree is kept between the moves of a game,
+    the part below the moves played is searched on.
+    Attributes:
+        time_ms (int): The time budget per move in milliseconds, None for no limit.
+        iterations (int): The number of playouts per move, None for no limit.
+        exploration (float): The exploration constant of the UCT formula.
+        policy (str): 'random' for uniform playouts, 'weighted' to prefer promotions and longer captures.
+        playout_plies (int): Playouts are stopped after this many plies and judged by the material.
+        reuse (bool): True to keep the tree between the moves.
+        rng (random.Random): The random generator of the playouts.
+    """
+    name = "mcts"
+
+    def __init__(self, time_ms=1000, iterations=None, exploration=EXPLORATION, policy='random',
+                 playout_plies=PLAYOUT_PLIES, reuse=True, rng=None):
+        if time_ms is None and iterations is None:
+            raise ValueError("MCTS needs a time budget or an iteration limit")
+        if policy not in ('random', 'weighted'):
+            raise ValueError(f"Unknown playout policy: {policy}")
+        self.time_ms = time_ms
+        self.iterations = iterations
+        self.exploration = exploration
+        self.policy = policy
+        self.playout_plies = playout_plies
+        self.reuse = reuse
+        self.rng = rng or random.Random()
+        self.root = None
+        self.last_result = None
+
+    def new_game(self):
+        self.root = None
+
+    def choose_move(self, position, player_color):
+        return self.search(position, player_color).move
+
+    def _find_root(self, key):
+        """
+        Function to find the node of the current position below the root of the last
+        search: after our own move and the reply of the opponent.
+        Returns:
+            Node: The node, or None if it is not in the tree.
+        """
+        if self.root is None:
+            return None
+        level = [self.root]
+        for _ in range(3):
+            for node in level:
+                if node.key == key:
+                    node.parent = None
+                    node.move = None
+                    return node
+            level = [child for node in level for child in node.children]
+        return None
+
+    def search(self, position, player_color):
+        """
+        Function to search a position until the time budget or the iterations are used up.
+        Args:
+            position (Position): The position to search.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        Returns:
+            SearchResult: The most visited move. Its score is the win rate scaled to
+                -1000..1000, the depth the deepest node reached and the nodes the playouts.
+        """
+        started = time.perf_counter()
+        deadline = started + self.time_ms / 1000 if self.time_ms is not None else None
+        key = _position_key(position, player_color)
+        root = self._find_root(key) if self.reuse else None
+        if root is None:
+            root = Node(None, None, player_color, key)
+        self.root = root
+
+        iterations, max_depth = 0, 0
+        while self.iterations is None or iterations < self.iterations:
+            if deadline is not None and iterations % 16 == 0 and time.perf_counter() >= deadline:
+                break
+            max_depth = max(max_depth, self._iterate(root, position.copy()))
+            iterations += 1
+            # only one move: nothing to choose
+            if root.untried == [] and len(root.children) <= 1:
+                break
+
+        if not root.children:
+            self.last_result = SearchResult(None, -1000, 0, iterations, time.perf_counter() - started)
+            return self.last_result
+        best = max(root.children, key=lambda child: child.visits)
+        score = round((best.wins / best.visits - 0.5) * 2000)
+        self.last_result = SearchResult(best.move, score, max_depth, iterations, time.perf_counter() - started)
+        return self.last_result
+
+    def ponder(self, position, player_color, stop_event):
+        """
+        Function to go on growing the tree on the opponent's time, from the position with
+        the opponent to move, until stop_event is set. The next search starts from the
+        node of the reply that was played.
+        """
+        if not self.reuse:
+            return
+        key = _position_key(position, player_color)
+        root = self._find_root(key) or Node(None, None, player_color, key)
+        self.root = root
+        while not stop_event.is_set():
+            self._iterate(root, position.copy())
+            # the game is over or the reply is forced: there is nothing to think about
+            if root.untried == [] and len(root.children) <= 1:
+                break
+
+    def _iterate(self, root, position):
+        """
+        Function to run one iteration: selection, expansion, playout and backpropagation.
+        Args:
+            root (Node): The root of the tree.
+            position (Position): A copy of the root position, it is changed.
+        Returns:
+            int: The depth of the node the playout started from.
+        """
+        node, depth = root, 0
+        # selection: down through fully expanded nodes
+        while node.untried == [] and node.children:
+            node = node.select_child(self.exploration)
+            position.make(node.move, opponent_of(node.player_color))
+            depth += 1
+        # expansion: the moves of a node are generated at its first visit
+        if node.untried is None:
+            node.untried = legal_moves(position, node.player_color)
+            self.rng.shuffle(node.untried)
+        if node.untried:
+            move = node.untried.pop()
+            position.make(move, node.player_color)
+            opponent = opponent_of(node.player_color)
+            child = Node(move, node, opponent, _position_key(position, opponent))
+            node.children.append(child)
+            node = child
+            depth += 1
+        winner = self._playout(position, node.player_color)
+        # backpropagation: every node counts the result for the player who moved into it
+        while node is not None:
+            node.visits += 1
+            if winner is None:
+                node.wins += 0.5
+            elif winner != node.player_color:
+                node.wins += 1
+            node = node.parent
+        return depth
+
+    def _playout(self, position, player_color):
+        """
+        Function to play a game out with random moves on the position, made in place.
+        Returns:
+            str: The color of the winner, None for a draw.
+        """
+        rng = self.rng
+        weighted = self.policy == 'weighted'
+        for _ in range(self.playout_plies):
+            moves = legal_moves(position, player_color)
+            # a player without moves has lost
+            if not moves:
+                return opponent_of(player_color)
+            if weighted and len(moves) > 1:
+                move = rng.choices(moves, [1 + len(move.captured) + 2 * move.promotion for move in moves])[0]
+            else:
+                move = moves[rng.randrange(len(moves))]
+            position.make(move, player_color)
+            player_color = opponent_of(player_color)
+        lead = position.material('w') - position.material('r')
+        if abs(lead) < ADJUDICATION_MARGIN:
+            return None
+        return 'w' if lead > 0 else 'r'
@@ -0,0 +1,148 @@
+# movecache.py
+
+from collections import OrderedDict
+
+from bitboard import capture_steps, quiet_moves, legal_moves
+
+# Default number of move lists kept
+DEFAULT_SIZE = 4096
+
+
+class MoveCache:
+    """
+    A bounded least-recently-used cache of generated move lists.
+    The key holds the piece masks and the side to move, nothing else, so a board that
+    is changed in place (apply_capture tags pieces, finalize_captures removes them)
+    simply gets another key: an outdated list can't be found again and drops out of
+    the cache when it is the oldest one.
+    Attributes:
+        maxsize (int): The number of lists kept, 0 turns the cache off.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that had to generate the moves.
+    """
+
+    def __init__(self, maxsize=DEFAULT_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key, generate):
+        """
+        Function to get a move list from the cache or generate and store it.
+        Args:
+            key (tuple): The key, see position_key.
+            generate (callable): Function without arguments that generates the list.
+        Returns:
+            tuple: The moves. They are shared with the cache, callers copy them to change them.
+        """
+        entries = self.entries
+        moves = entries.get(key)
+        if moves is not None:
+            self.hits += 1
+            entries.move_to_end(key)
+            return moves
+        self.misses += 1
+        moves = tuple(generate())
+        if self.maxsize > 0:
+            entries[key] = moves
+            if len(entries) > self.maxsize:
+                entries.popitem(last=False)
+        return moves
+
+    def peek(self, key):
+        """
+        Function to look at a cached list without generating it or counting the lookup.
+        Returns:
+            tuple: The moves, or None if they are not cached.
+        """
+        return self.entries.get(key)
+
+    def resize(self, maxsize):
+        """
+        Function to change the number of lists kept, dropping the oldest ones if needed.
+        """
+        self.maxsize = maxsize
+        while len(self.entries) > max(maxsize, 0):
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Function to empty the cache and reset the counters.
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        """
+        Function to get the usage statistics of the cache.
+        Returns:
+            dict: Size, hits, misses and hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+# The cache shared by the rules adapters and the game record tools
+MOVE_CACHE = MoveCache()
+
+
+def position_key(kind, position, player_color, specific_square=None):
+    """
+    Function to build the cache key of a move list.
+    Args:
+        kind (str): Which list: 'captures', 'quiet' or 'legal'.
+        position (Position): The position.
+        player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        specific_square (int): The square the captures are limited to, if any.
+    Returns:
+        tuple: The immutable key.
+    """
+    return (kind, position.white, position.black, position.kings, position.tagged, player_color, specific_square)
+
+
+def cached_capture_steps(position, player_color, specific_square=None):
+    """
+    Function to get the capture steps of bitboard.capture_steps through the cache.
+    Returns:
+        list: A new list of (start square, end square) tuples.
+    """
+    key = position_key('captures', position, player_color, specific_square)
+    return list(MOVE_CACHE.get(key, lambda: capture_steps(position, player_color, specific_square)))
+
+
+def cached_quiet_moves(position, player_color):
+    """
+    Function to get the non-capturing moves of bitboard.quiet_moves through the cache.
+    Returns:
+        list: A new list of (start square, end square) tuples.
+    """
+    key = position_key('quiet', position, player_color)
+    return list(MOVE_CACHE.get(key, lambda: quiet_moves(position, player_color)))
+
+
+def cached_legal_moves(position, player_color):
+    """
+    Function to get the complete moves of bitboard.legal_moves through the cache.
+    Returns:
+        list: A new list of Move tuples.
+    """
+    key = position_key('legal', position, player_color)
+    return list(MOVE_CACHE.get(key, lambda: legal_moves(position, player_color)))
+
+
+def configure(maxsize):
+    """
+    Function to set the size of the shared cache, 0 turns it off.
+    """
+    MOVE_CACHE.resize(maxsize)
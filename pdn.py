@@ -0,0 +1,387 @@
+# pdn.py
+
+import argparse
+import datetime
+import re
+import sys
+from collections import namedtuple
+
+from bitboard import RC_TO_SQUARE, Position, from_board, square_name, move_to_notation, to_board
+from board import Board, initialize_board
+from rules import legal_moves, apply_move
+
+# A game of a PDN file
+#     tags (dict): The tag pairs, e.g. {'White': ..., 'Black': ..., 'FEN': ...}.
+#     moves (list): The moves as written in the file, e.g. 'c3-d4' or 'c3:e5:g7'.
+#     result (str): '1-0', '0-1', '1/2-1/2' (or the Russian '2-0', '0-2', '1-1'), '*' if unknown.
+PdnGame = namedtuple('PdnGame', ['tags', 'moves', 'result'])
+
+# PDN game type of Russian draughts
+GAME_TYPE = "25"
+RESULTS = {'1-0': "White", '2-0': "White", '0-1': "Black", '0-2': "Black",
+           '1/2-1/2': "Draw", '1-1': "Draw", '*': None}
+RESULT_TAGS = {"White": '1-0', "Black": '0-1', "Draw": '1/2-1/2', None: '*'}
+# Tags written first, in this order, the others follow as they come
+TAG_ORDER = ['Event', 'Site', 'Date', 'Round', 'White', 'Black', 'Result', 'GameType', 'FEN']
+
+# Tokens of the move text. Results come first, '1-0' would also be a move in numeric notation.
+# Comments closed on the same line, move numbers and NAGs are matched as 'skip' and dropped;
+# an opened comment or variation is followed by the reader.
+_TOKEN = re.compile(r'''
+    (?P<result>(?:1/2-1/2|1-0|0-1|2-0|0-2|1-1|\*))(?![\w:/-])
+  | (?P<move>(?:[a-h][1-8]|\d{1,2})(?:[-x:](?:[a-h][1-8]|\d{1,2}))+)[!?]*
+  | (?P<skip>\{[^}]*\}|\d+\.(?:\.\.)?(?![-x:/\d])|\$\d+)
+  | \[\s*(?P<tag>\w+)\s+"(?P<value>(?:[^"\\]|\\.)*)"\s*\]
+  | (?P<comment>\{)
+  | (?P<line_comment>;)
+  | (?P<variation>\()
+  | (?P<variation_end>\))
+  | (?P<other>\S+)
+''', re.VERBOSE)
+# Plain move text is split into words, most of them are moves or move numbers
+_MOVE_WORD = re.compile(r'(?P<move>[a-h][1-8](?:[-x:][a-h][1-8])+)[!?]*|(?P<skip>\d+\.(?:\.\.)?)')
+_SPECIAL = re.compile(r'[\[{}();$"]')
+_SQUARE = re.compile(r'[a-h][1-8]')
+_ESCAPE = re.compile(r'\\(.)')
+
+
+class PdnError(ValueError):
+    """
+    Raised for text that is not valid PDN or FEN, or a move that is not legal.
+    """
+
+
+def parse_square(name):
+    """
+    Function to get the square number of a name in 'a3' format, or in the numeric
+    notation of 8x8 PDN files: the dark squares numbered 1 to 32 row by row from b8
+    (1 b8, 4 h8, 5 a7, ..., 29 a1, 32 g1), which is the order of the bitboard squares.
+    Raises:
+        PdnError: If the name is not a dark square.
+    """
+    if name.isdigit():
+        number = int(name)
+        if not 1 <= number <= 32:
+            raise PdnError(f"Not a playable square: {name} (numeric squares go from 1 to 32)")
+        return number - 1
+    square = RC_TO_SQUARE.get((8 - int(name[1]), ord(name[0]) - ord('a'))) if _SQUARE.fullmatch(name) else None
+    if square is None:
+        raise PdnError(f"Not a playable square: {name}")
+    return square
+
+
+def to_fen(position, player_color):
+    """
+    Function to write a position as a PDN FEN string, e.g. 'W:Wa1,c3,Kd4:Bb8,Kh8'.
+    Args:
+        position (Position): The position, with no piece tagged.
+        player_color (str): The color of the player to move ('w' for white, 'r' for red).
+    Returns:
+        str: The FEN string.
+    """
+    sections = ["W" if player_color == 'w' else "B"]
+    for letter, pieces in (("W", position.white), ("B", position.black)):
+        names = [("K" if position.kings >> square & 1 else "") + square_name(square)
+                 for square in range(32) if pieces >> square & 1]
+        sections.append(letter + ",".join(names))
+    return ":".join(sections)
+
+
+def from_fen(text):
+    """
+    Function to read a PDN FEN string.
+    Args:
+        text (str): The FEN string, e.g. 'B:Wa1,c3,Kd4:Bb8,Kh8', or with numeric squares
+            and ranges, e.g. 'W:W21-32:B1-12'.
+    Returns:
+        tuple: The position (Position) and the color to move ('w' or 'r').
+    Raises:
+        PdnError: If the string is not valid.
+    """
+    sections = [section.strip() for section in text.strip().rstrip(".").split(":")]
+    if len(sections) != 3 or sections[0].upper() not in ("W", "B"):
+        raise PdnError(f"Invalid FEN: {text}")
+    masks = {'W': 0, 'B': 0}
+    kings = 0
+    for section in sections[1:]:
+        letter = section[:1].upper()
+        if letter not in masks:
+            raise PdnError(f"Invalid FEN: {text}")
+        for item in filter(None, (item.strip() for item in section[1:].split(","))):
+            king = item[0] in "Kk"
+            name = item[1:] if king else item
+            first, _, last = name.partition("-")
+            if last and not (first.isdigit() and last.isdigit()):
+                raise PdnError(f"Invalid range {item} in FEN: {text}")
+            for square in range(parse_square(first), parse_square(last or first) + 1):
+                if (masks['W'] | masks['B']) >> square & 1:
+                    raise PdnError(f"Two pieces on {item} in FEN: {text}")
+                masks[letter] |= 1 << square
+                if king:
+                    kings |= 1 << square
+    return Position(masks['W'], masks['B'], kings), 'w' if sections[0].upper() == "W" else 'r'
+
+
+def _tokens(lines):
+    """
+    Function to split PDN text into tokens, line by line. Comments, variations and
+    move numbers are dropped on the way.
+    Yields:
+        tuple: (line number, token kind, token match)
+    """
+    in_comment = False
+    depth = 0
+    for number, line in enumerate(lines, 1):
+        start = 0
+        if in_comment:
+            start = line.find("}") + 1
+            if not start:
+                continue
+            in_comment = False
+        # most lines are plain move text, their words are checked one by one
+        if not start and not depth and not _SPECIAL.search(line):
+            for word in line.split():
+                match = _MOVE_WORD.fullmatch(word)
+                if match is not None:
+                    if match.lastgroup == 'move':
+                        yield number, 'move', match
+                    continue
+                for match in _TOKEN.finditer(word):
+                    kind = match.lastgroup
+                    if kind != 'skip':
+                        yield number, kind, match
+            continue
+        for match in _TOKEN.finditer(line, start):
+            kind = match.lastgroup
+            if kind == 'skip':
+                continue
+            if kind == 'move' or kind == 'value' or kind == 'result' or kind == 'other':
+                if not depth:
+                    yield number, 'tag' if kind == 'value' else kind, match
+            elif kind == 'comment':
+                # a comment closed on the same line is a 'skip' token
+                in_comment = True
+                break
+            elif kind == 'line_comment':
+                break
+            elif kind == 'variation':
+                depth += 1
+            else:
+                depth = max(depth - 1, 0)
+
+
+def read_games(source):
+    """
+    Function to read the games of a PDN file one at a time. Only the current game is
+    kept in memory, so files of any size can be read.
+    Args:
+        source (str or file): A file name or an open text file (any iterable of lines).
+    Yields:
+        PdnGame: Every game of the file.
+    Raises:
+        PdnError: At text that is not PDN, with its line number.
+    """
+    if isinstance(source, str):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            yield from read_games(f)
+        return
+    tags, moves = {}, []
+    for line_number, kind, match in _tokens(source):
+        if kind == 'tag':
+            # a tag after the moves starts the next game, even if the result was left out
+            if moves:
+                yield PdnGame(tags, moves, tags.get('Result', '*'))
+                tags, moves = {}, []
+            tags[match.group('tag')] = _ESCAPE.sub(r'\1', match.group('value'))
+        elif kind == 'move':
+            moves.append(match.group('move'))
+        elif kind == 'result':
+            if tags or moves:
+                yield PdnGame(tags, moves, match.group('result'))
+            tags, moves = {}, []
+        else:
+            raise PdnError(f"Line {line_number}: unexpected text {match.group()!r}")
+    if tags or moves:
+        yield PdnGame(tags, moves, tags.get('Result', '*'))
+
+
+def start_position(game):
+    """
+    Function to get the position a game starts from: its FEN tag, or the standard setup.
+    Returns:
+        tuple: The position and the color to move.
+    """
+    if 'FEN' in game.tags:
+        return from_fen(game.tags['FEN'])
+    return from_board(initialize_board()), 'w'
+
+
+def replay(game):
+    """
+    Function to play the moves of a game on the grid board with the rules of rules.py.
+    Every move has to be one of the legal moves of its position; a capture may be written
+    with all its squares or, when that is unambiguous, with only the first and the last.
+    Args:
+        game (PdnGame): The game.
+    Yields:
+        tuple: (board before the move, color to move, Move) for every move.
+    Raises:
+        PdnError: At the first move that is not legal, with its number.
+    """
+    position, player_color = start_position(game)
+    board = Board(to_board(position))
+    for ply, text in enumerate(game.moves):
+        try:
+            squares = tuple(parse_square(name) for name in re.split(r'[-x:]', text))
+        except PdnError as error:
+            raise PdnError(f"Move {ply // 2 + 1} ({text}): {error}") from None
+        moves = legal_moves(board, player_color)
+        matches = [move for move in moves if move.path == squares]
+        if not matches and len(squares) == 2:
+            matches = [move for move in moves if (move.path[0], move.path[-1]) == squares]
+        if len(matches) != 1:
+            problem = "is not legal" if not matches else "is ambiguous"
+            raise PdnError(f"Move {ply // 2 + 1} ({text}) {problem}")
+        yield board, player_color, matches[0]
+        apply_move(board, matches[0], player_color)
+        player_color = 'r' if player_color == 'w' else 'w'
+
+
+def pdn_notation(move):
+    """
+    Function to write a move in PDN: 'c3-d4' for a quiet move, 'c3:e5:g7' for a capture.
+    """
+    return (":" if move.captured else "-").join(square_name(square) for square in move.path)
+
+
+def game_from_history(move_history, white_name, black_name, winner=None, tags=None):
+    """
+    Function to make a PDN game of the move history kept by game.play_game.
+    The moves are replayed, so captures get the PDN ':' notation.
+    Args:
+        move_history (dict): The 'a3-b4-d6' moves of "White" and "Black".
+        white_name (str): The name of the white player.
+        black_name (str): The name of the black player.
+        winner (str): "White", "Black", "Draw" or None if the game was not finished.
+        tags (dict): More tags to write, if any.
+    Returns:
+        PdnGame: The game.
+    """
+    white, black = move_history["White"], move_history["Black"]
+    moves = [move for pair in zip(white, black) for move in pair] + white[len(black):]
+    result = RESULT_TAGS[winner]
+    game_tags = {'Event': "Checkers game", 'Date': datetime.date.today().strftime("%Y.%m.%d"),
+                 'White': white_name, 'Black': black_name, 'Result': result, 'GameType': GAME_TYPE}
+    game_tags.update(tags or {})
+    game = PdnGame(game_tags, moves, result)
+    return game._replace(moves=[pdn_notation(move) for _, _, move in replay(game)])
+
+
+def format_game(game, width=79):
+    """
+    Function to write a game as PDN text.
+    Args:
+        game (PdnGame): The game.
+        width (int): The longest line of the move text.
+    Returns:
+        str: The game, ending with an empty line.
+    """
+    tags = dict(game.tags, Result=game.result)
+    names = [name for name in TAG_ORDER if name in tags] + [name for name in tags if name not in TAG_ORDER]
+    lines = ['[{} "{}"]'.format(name, str(tags[name]).replace("\\", "\\\\").replace('"', '\\"')) for name in names]
+    lines.append("")
+    # a game from a FEN position with black to move starts with '1...'
+    black_first = 'FEN' in tags and tags['FEN'].strip()[:1].upper() == "B"
+    tokens = []
+    for ply, move in enumerate(game.moves):
+        turn = ply + black_first
+        if turn % 2 == 0:
+            tokens.append(f"{turn // 2 + 1}.")
+        elif ply == 0:
+            tokens.append(f"{turn // 2 + 1}...")
+        tokens.append(move)
+    tokens.append(game.result)
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > width:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n\n"
+
+
+def write_games(target, games):
+    """
+    Function to write games to a PDN file.
+    Args:
+        target (str or file): A file name, the games are added at its end, or an open text file.
+        games (iterable): The PdnGame tuples.
+    Returns:
+        int: The number of games written.
+    """
+    if isinstance(target, str):
+        with open(target, "a", encoding="utf-8") as f:
+            return write_games(f, games)
+    count = 0
+    for game in games:
+        target.write(format_game(game))
+        count += 1
+    return count
+
+
+def game_records(source):
+    """
+    Function to read the finished games of a PDN file as (result, moves) records for
+    the opening book, with the moves checked and written in 'a3-b4-d6' format.
+    Games with an unknown result or an illegal move are left out.
+    Yields:
+        tuple: ("White", "Black" or "Draw", list of moves)
+    """
+    for game in read_games(source):
+        result = RESULTS.get(game.result)
+        if result is None or 'FEN' in game.tags:
+            continue
+        try:
+            yield result, [move_to_notation(move) for _, _, move in replay(game)]
+        except PdnError:
+            continue
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python pdn.py games.pdn            (check every game of the file)
+        python pdn.py games.pdn --fen      (print the final position of every game)
+    """
+    parser = argparse.ArgumentParser(description="Check the games of a PDN file against the rules.")
+    parser.add_argument("file", help="PDN file")
+    parser.add_argument("--fen", action="store_true", help="print the final position of every game as FEN")
+    parser.add_argument("--quiet", action="store_true", help="print only the totals")
+    args = parser.parse_args(argv)
+
+    games = errors = moves = 0
+    for game in read_games(args.file):
+        games += 1
+        board = None
+        try:
+            for board, player_color, _ in replay(game):
+                moves += 1
+            if args.fen:
+                # the replay has made the last move on the board when it ends
+                if board is None:
+                    position, player_color = start_position(game)
+                else:
+                    position, player_color = from_board(board), 'r' if player_color == 'w' else 'w'
+                print(to_fen(position, player_color))
+        except PdnError as error:
+            errors += 1
+            if not args.quiet:
+                print(f"game {games} ({game.tags.get('White', '?')} - {game.tags.get('Black', '?')}): {error}")
+    print(f"{games} games, {moves} moves, {errors} with errors")
+    return 0 if not errors else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,387 @@
+# perft.py
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+from bitboard import from_board, legal_moves, legal_steps, move_to_notation, to_board
+from board import initialize_board
+import gridscan
+
+# Positions for checking the move generator. Every position is drawn like the grid board
+# (row 0 is rank 8): 'w'/'r' men, 'W'/'R' kings, 'c'/'C' pieces tagged during a capture.
+# The node counts up to depth 7 (8 for the start) were checked against a step-by-step
+# replay of the original grid rules (mandatory_capture/apply_capture on the 8x8 board),
+# with the landing squares of a king limited to those it can go on capturing from.
+PERFT_POSITIONS = {
+    'start': {
+        'board': [''.join(row) for row in initialize_board()],
+        'color': 'w',
+        'nodes': {1: 7, 2: 49, 3: 302, 4: 1469, 5: 7482, 6: 37986, 7: 190146, 8: 929905},
+    },
+    # a man with several capture sequences of different length
+    'multi_jump': {
+        'board': [
+            ".......r",
+            "r.....r.",
+            ".r...r..",
+            "........",
+            "...r.r..",
+            "........",
+            "...r...w",
+            "w.w.w.w.",
+        ],
+        'color': 'w',
+        'nodes': {1: 3, 2: 12, 3: 71, 4: 390, 5: 2059, 6: 10563, 7: 56640},
+    },
+    # a man that reaches the last row in the middle of a capture and goes on as a king
+    'promotion_capture': {
+        'board': [
+            ".......r",
+            "r...r...",
+            ".r...w.r",
+            "........",
+            "........",
+            "..r...w.",
+            "........",
+            "w.w.w...",
+        ],
+        'color': 'w',
+        'nodes': {1: 1, 2: 3, 3: 23, 4: 73, 5: 591, 6: 1998, 7: 15188},
+    },
+    # a king capture with several landing squares, only some of them lead to more captures
+    'king_landings': {
+        'board': [
+            ".r......",
+            "..r.....",
+            ".......r",
+            "r.....r.",
+            "...r....",
+            "....w...",
+            "........",
+            "W.w.....",
+        ],
+        'color': 'w',
+        'nodes': {1: 2, 2: 11, 3: 81, 4: 393, 5: 2732, 6: 12164, 7: 78853},
+    },
+    # a piece tagged during a capture still blocks the diagonal but can't be captured again
+    'tagged': {
+        'board': [
+            ".......r",
+            "......r.",
+            ".r...r..",
+            "....W...",
+            "...c....",
+            "..r...r.",
+            "........",
+            "w.w.....",
+        ],
+        'color': 'w',
+        'nodes': {1: 1, 2: 7, 3: 45, 4: 210, 5: 1251, 6: 5947, 7: 35820},
+    },
+    # flying kings of both sides
+    'kings_endgame': {
+        'board': [
+            ".R...R.R",
+            "........",
+            "...r....",
+            "........",
+            "........",
+            "W.....w.",
+            "........",
+            "..W.W...",
+        ],
+        'color': 'w',
+        'nodes': {1: 1, 2: 2, 3: 36, 4: 346, 5: 3716, 6: 48743, 7: 516422},
+    },
+}
+
+# Default file of the stored benchmark timings, next to this module
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "perft_baseline.json")
+
+
+def load_position(name):
+    """
+    Function to get a perft position by name.
+    Args:
+        name (str): The name of the position in PERFT_POSITIONS.
+    Returns:
+        tuple: The bitboard position and the color to move.
+    """
+    entry = PERFT_POSITIONS[name]
+    return from_board([list(row) for row in entry['board']]), entry['color']
+
+
+def perft(position, player_color, depth):
+    """
+    Function to count the leaf nodes of the move tree to a given depth.
+    Moves are made and unmade in place, the last ply is counted without making its moves.
+    Args:
+        position (Position): The position to start from.
+        player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        depth (int): The number of plies to search.
+    Returns:
+        int: The number of leaf nodes.
+    """
+    if depth == 0:
+        return 1
+    moves = legal_moves(position, player_color)
+    if depth == 1:
+        return len(moves)
+    opponent = 'r' if player_color == 'w' else 'w'
+    nodes = 0
+    for move in moves:
+        position.make(move, player_color)
+        nodes += perft(position, opponent, depth - 1)
+        position.unmake()
+    return nodes
+
+
+def divide(position, player_color, depth):
+    """
+    Function to count the leaf nodes below every root move.
+    Args:
+        position (Position): The position to start from.
+        player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        depth (int): The number of plies to search, including the root move.
+    Returns:
+        list: A list of (move notation, leaf nodes) tuples.
+    """
+    opponent = 'r' if player_color == 'w' else 'w'
+    counts = []
+    for move in legal_moves(position, player_color):
+        position.make(move, player_color)
+        counts.append((move_to_notation(move), perft(position, opponent, depth - 1)))
+        position.unmake()
+    return counts
+
+
+def run_perft(name, depth):
+    """
+    Function to run perft on a named position and time it.
+    Args:
+        name (str): The name of the position in PERFT_POSITIONS.
+        depth (int): The number of plies to search.
+    Returns:
+        dict: The position name, depth, node count, elapsed seconds, nodes per second and
+            whether the count matches the reference (None if there is no reference).
+    """
+    position, player_color = load_position(name)
+    started = time.perf_counter()
+    nodes = perft(position, player_color, depth)
+    elapsed = time.perf_counter() - started
+    expected = PERFT_POSITIONS[name]['nodes'].get(depth)
+    return {
+        'position': name,
+        'depth': depth,
+        'nodes': nodes,
+        'elapsed': elapsed,
+        'nps': nodes / elapsed if elapsed > 0 else 0.0,
+        'correct': None if expected is None else nodes == expected,
+    }
+
+
+def benchmark(depths, baseline_file=BASELINE_FILE, tolerance=0.25, save=False, repeat=5):
+    """
+    Function to run perft on every position and compare the speed with stored timings.
+    Every position is timed several times and the fastest run counts, to keep noise low.
+    A position without a stored timing for its depth fails the benchmark, unless the
+    results are saved; saving keeps the stored timings of the other positions.
+    Args:
+        depths (dict): The depth to search for every position name.
+        baseline_file (str): The JSON file with the stored nodes per second.
+        tolerance (float): The allowed slowdown against the baseline, 0.25 = 25%.
+        save (bool): True to store the results as the new baseline.
+        repeat (int): The number of runs per position.
+    Returns:
+        tuple: The list of results and True if every count is right and nothing is too slow.
+    """
+    baseline = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file) as f:
+            baseline = json.load(f)
+
+    results = []
+    passed = True
+    for name, depth in depths.items():
+        result = max((run_perft(name, depth) for _ in range(repeat)), key=lambda r: r['nps'])
+        stored = baseline.get(name)
+        result['baseline_nps'] = None
+        result['regression'] = False
+        result['missing'] = not (stored and stored.get('depth') == depth)
+        if not result['missing']:
+            result['baseline_nps'] = stored['nps']
+            result['regression'] = result['nps'] < stored['nps'] * (1 - tolerance)
+        if result['correct'] is False or result['regression'] or (result['missing'] and not save):
+            passed = False
+        results.append(result)
+
+    if save:
+        baseline.update({r['position']: {'depth': r['depth'], 'nps': r['nps']} for r in results})
+        with open(baseline_file, "w") as f:
+            json.dump(baseline, f, indent=2)
+    return results, passed
+
+
+# Depths used by the benchmark, chosen so every position takes up to about a second
+BENCH_DEPTHS = {
+    'start': 7,
+    'multi_jump': 7,
+    'promotion_capture': 7,
+    'king_landings': 7,
+    'tagged': 7,
+    'kings_endgame': 7,
+}
+
+
+def format_result(result):
+    """
+    Function to format a perft result as one line of text.
+    """
+    line = (f"{result['position']:<18} depth {result['depth']:<2} nodes {result['nodes']:>10} "
+            f"time {result['elapsed']:8.3f}s  {result['nps']:>10.0f} nodes/s")
+    if result['correct'] is not None:
+        line += "  ok" if result['correct'] else "  WRONG COUNT"
+    if result.get('baseline_nps'):
+        change = result['nps'] / result['baseline_nps'] - 1
+        line += f"  baseline {result['baseline_nps']:.0f} ({change:+.1%})"
+        if result['regression']:
+            line += "  REGRESSION"
+    elif result.get('missing'):
+        line += "  NO BASELINE"
+    return line
+
+
+def sample_positions(games=200, plies=120, seed=0):
+    """
+    Function to collect the positions of random games from the standard setup, the
+    positions the move generation benchmark runs on.
+    Args:
+        games (int): The number of games.
+        plies (int): The maximum length of a game.
+        seed (int): The seed of the first game.
+    Returns:
+        list: A list of (position, color to move) tuples, every position a copy.
+    """
+    positions = []
+    for game in range(games):
+        rng = random.Random(seed + game)
+        position, player_color = from_board(initialize_board(), with_hash=False), 'w'
+        for _ in range(plies):
+            moves = legal_moves(position, player_color)
+            if not moves:
+                break
+            positions.append((position.copy(), player_color))
+            position.make(rng.choice(moves), player_color)
+            player_color = 'r' if player_color == 'w' else 'w'
+    return positions
+
+
+def generation_benchmark(positions, repeat=5):
+    """
+    Function to time the move generation of the bitboards against the scan of the string
+    grid (gridscan.py), the steps the game checks a move against: the capture steps if
+    there are any, the non-capturing moves otherwise. The runs take turns, the fastest
+    run of every generator counts.
+    Args:
+        positions (list): A list of (position, color to move) tuples, see sample_positions.
+        repeat (int): The number of runs per generator.
+    Returns:
+        dict: The number of positions, the positions per second of the grid scan, of
+            bitboard.legal_steps and of bitboard.legal_moves (complete moves), and the
+            speedup of legal_steps.
+    """
+    boards = [(to_board(position), player_color) for position, player_color in positions]
+
+    def grid():
+        for board, player_color in boards:
+            gridscan.mandatory_capture(board, player_color) or gridscan.non_capture_moves(board, player_color)
+
+    def steps():
+        for position, player_color in positions:
+            legal_steps(position, player_color)
+
+    def moves():
+        for position, player_color in positions:
+            legal_moves(position, player_color)
+
+    best = {}
+    for _ in range(repeat):
+        for name, run in (('grid', grid), ('steps', steps), ('moves', moves)):
+            started = time.perf_counter()
+            run()
+            best[name] = min(best.get(name, float('inf')), time.perf_counter() - started)
+    rates = {name: len(positions) / elapsed for name, elapsed in best.items()}
+    return {
+        'positions': len(positions),
+        'grid_pps': rates['grid'],
+        'steps_pps': rates['steps'],
+        'moves_pps': rates['moves'],
+        'speedup': rates['steps'] / rates['grid'],
+    }
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python perft.py --depth 6
+        python perft.py --position multi_jump --depth 4 --divide
+        python perft.py --bench
+        python perft.py --generation
+    """
+    parser = argparse.ArgumentParser(description="Count move tree nodes to check and time the move generator.")
+    parser.add_argument("--position", default=None, choices=sorted(PERFT_POSITIONS),
+                        help="position to search (default: all of them)")
+    parser.add_argument("--depth", type=int, default=4, help="number of plies to search")
+    parser.add_argument("--divide", action="store_true", help="print the node count below every root move")
+    parser.add_argument("--bench", action="store_true", help="compare the speed with the stored baseline")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="JSON file of the baseline timings")
+    parser.add_argument("--save-baseline", action="store_true", help="store the benchmark results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--generation", action="store_true",
+                        help="compare the move generation with the scan of the string grid")
+    parser.add_argument("--games", type=int, default=200, help="random games the --generation positions come from")
+    args = parser.parse_args(argv)
+
+    if args.generation:
+        result = generation_benchmark(sample_positions(args.games))
+        print(f"{result['positions']} positions of {args.games} random games")
+        print(f"grid scan            {result['grid_pps']:>10.0f} positions/s")
+        print(f"bitboard steps       {result['steps_pps']:>10.0f} positions/s  {result['speedup']:.1f}x")
+        print(f"bitboard full moves  {result['moves_pps']:>10.0f} positions/s")
+        return 0
+
+    if args.bench:
+        depths = {args.position: BENCH_DEPTHS[args.position]} if args.position else BENCH_DEPTHS
+        results, passed = benchmark(depths, args.baseline, args.tolerance, args.save_baseline)
+        for result in results:
+            print(format_result(result))
+        if not args.save_baseline and any(result['missing'] for result in results):
+            print(f"no baseline timing in {args.baseline} for every position and depth, "
+                  "store one with --save-baseline", file=sys.stderr)
+        print("benchmark passed" if passed else "benchmark FAILED")
+        return 0 if passed else 1
+
+    names = [args.position] if args.position else list(PERFT_POSITIONS)
+    passed = True
+    for name in names:
+        if args.divide:
+            position, player_color = load_position(name)
+            total = 0
+            print(f"{name}, depth {args.depth}:")
+            for notation, nodes in divide(position, player_color, args.depth):
+                print(f"  {notation:<20} {nodes}")
+                total += nodes
+            print(f"  total {total}")
+            continue
+        result = run_perft(name, args.depth)
+        print(format_result(result))
+        passed = passed and result['correct'] is not False
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,42 @@
+# ponder.py
+
+import threading
+
+
+class Ponderer:
+    """
+    Runs Engine.ponder in a background thread while the human player thinks about the
+    move. The search only holds the interpreter lock between its steps, input() waits
+    without it, so typing and redrawing the board stay responsive.
+    Attributes:
+        engine (Engine): The computer player.
+        thread (Thread): The running ponder thread, None when it is stopped.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def start(self, position, player_color):
+        """
+        Function to start pondering.
+        Args:
+            position (Position): The current position, with the human player to move.
+            player_color (str): The color of the human player ('w' for white, 'r' for red).
+        """
+        self.stop()
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.engine.ponder, args=(position.copy(), player_color, self.stop_event),
+                                       name="ponder", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Function to stop pondering and wait for the engine to finish its step, so the
+        engine can be used again.
+        """
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,239 @@
+# profiling.py
+
+import functools
+import importlib
+import json
+import os
+import sys
+import time
+
+from movecache import MOVE_CACHE
+
+# Functions counted and timed while profiling is on, as (module, function name)
+TARGETS = [
+    ('rules', 'mandatory_capture'),
+    ('rules', 'non_capture_moves'),
+    ('rules', 'legal_moves'),
+    ('rules', 'has_capture'),
+    ('rules', 'is_legal'),
+    ('rules', 'apply_capture'),
+    ('rules', 'finalize_captures'),
+    ('rules', 'apply_move'),
+    ('rules', 'is_game_over'),
+    ('bitboard', 'legal_moves'),
+    ('bitboard', 'capture_steps'),
+    ('bitboard', 'quiet_moves'),
+    ('evaluation', 'evaluate'),
+]
+# The targets that generate moves, counted per turn
+MOVE_GENERATION = {'rules.mandatory_capture', 'rules.non_capture_moves', 'rules.legal_moves',
+                   'bitboard.legal_moves', 'bitboard.capture_steps', 'bitboard.quiet_moves'}
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+
+def _rate(hits, lookups):
+    return hits / lookups if lookups else 0.0
+
+
+def _table_counts(engine):
+    """
+    Function to read the probe counters of the tables of an engine.
+    Returns:
+        dict: table name -> (probes, hits)
+    """
+    counts = {}
+    for name in ('tt', 'tablebase'):
+        table = getattr(engine, name, None)
+        if table is not None and hasattr(table, 'probes'):
+            counts[name] = (table.probes, table.hits)
+    return counts
+
+
+class Profiler:
+    """
+    Call counts and times of the hot functions, and a record of every turn of a game.
+    Nothing is wrapped while profiling is off, so it costs nothing then: enable() puts
+    a counting wrapper in place of every target function in all modules that imported
+    it, disable() puts the functions back.
+    Attributes:
+        enabled (bool): True while the targets are wrapped.
+        functions (dict): 'module.function' -> [calls, seconds]. The seconds are
+            cumulative, they include the time of the targets called inside.
+        turns (list): One dict per finished turn, see end_turn.
+        engine (Engine): The last engine that played a turn, for the table counters.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.functions = {}
+        self.turns = []
+        self.engine = None
+        self.started = None
+        self._patches = []
+
+    def _wrap(self, name, function):
+        counter = self.functions.setdefault(name, [0, 0.0])
+        clock = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                counter[0] += 1
+                counter[1] += clock() - started
+        return wrapper
+
+    def enable(self, targets=TARGETS):
+        """
+        Function to start counting. The counters start from zero.
+        """
+        if self.enabled:
+            return
+        self.reset()
+        for module_name, function_name in targets:
+            original = getattr(importlib.import_module(module_name), function_name)
+            wrapper = self._wrap(f"{module_name}.{function_name}", original)
+            # 'from rules import legal_moves' made copies of the name, they are all replaced
+            for module in list(sys.modules.values()):
+                namespace = getattr(module, '__dict__', None)
+                if namespace is None:
+                    continue
+                for attribute, value in list(namespace.items()):
+                    if value is original:
+                        setattr(module, attribute, wrapper)
+                        self._patches.append((module, attribute, original))
+        self.enabled = True
+
+    def disable(self):
+        """
+        Function to stop counting, the counters are kept.
+        """
+        for module, attribute, original in reversed(self._patches):
+            setattr(module, attribute, original)
+        self._patches = []
+        self.enabled = False
+
+    def reset(self):
+        """
+        Function to set all counters to zero.
+        """
+        for counter in self.functions.values():
+            counter[0], counter[1] = 0, 0.0
+        self.turns = []
+        self.engine = None
+        self.started = time.perf_counter()
+        MOVE_CACHE.hits = MOVE_CACHE.misses = 0
+
+    def start_turn(self, engine=None):
+        """
+        Function to mark the start of a turn.
+        Args:
+            engine (Engine): The engine playing the turn, if any.
+        Returns:
+            tuple: What end_turn needs, or None if profiling is off.
+        """
+        if not self.enabled:
+            return None
+        calls = {name: counter[0] for name, counter in self.functions.items()}
+        return time.perf_counter(), calls, _table_counts(engine)
+
+    def end_turn(self, turn, player_color, engine=None):
+        """
+        Function to record a finished turn.
+        Args:
+            turn (tuple): The result of start_turn, nothing is recorded if it is None.
+            player_color (str): The color of the player who moved ('w' for white, 'r' for red).
+            engine (Engine): The engine that played the turn, if any.
+        """
+        if turn is None:
+            return
+        started, calls, tables = turn
+        seconds = time.perf_counter() - started
+        record = {
+            'ply': len(self.turns) + 1,
+            'color': player_color,
+            'seconds': seconds,
+            'move_generation': sum(counter[0] - calls.get(name, 0) for name, counter in self.functions.items()
+                                   if name in MOVE_GENERATION),
+        }
+        result = getattr(engine, 'last_result', None) if engine is not None else None
+        if result is not None:
+            record.update(depth=result.depth, nodes=result.nodes,
+                          nps=result.nodes / result.elapsed if result.elapsed > 0 else 0.0)
+        for name, (probes, hits) in _table_counts(engine).items():
+            probes -= tables.get(name, (0, 0))[0]
+            hits -= tables.get(name, (0, 0))[1]
+            record[f'{name}_hit_rate'] = _rate(hits, probes)
+        self.turns.append(record)
+        if engine is not None:
+            self.engine = engine
+
+    def stats(self, engine=None):
+        """
+        Function to get the counters collected so far.
+        Args:
+            engine (Engine): The engine whose table counters are added, the last one
+                that played a turn if None.
+        Returns:
+            dict: Per-function calls and times, search totals, cache and table hit rates.
+        """
+        engine = engine or self.engine
+        functions = {name: {'calls': calls, 'seconds': seconds, 'mean_us': seconds / calls * 1e6 if calls else 0.0}
+                     for name, (calls, seconds) in sorted(self.functions.items()) if calls}
+        searched = [turn for turn in self.turns if 'nodes' in turn]
+        nodes = sum(turn['nodes'] for turn in searched)
+        search_seconds = sum(turn['seconds'] for turn in searched)
+        tables = {'move_cache': MOVE_CACHE.stats()}
+        for name, (probes, hits) in _table_counts(engine).items():
+            tables[name] = {'probes': probes, 'hits': hits, 'hit_rate': _rate(hits, probes)}
+        return {
+            'seconds': time.perf_counter() - self.started if self.started is not None else 0.0,
+            'functions': functions,
+            'search': {'turns': len(searched), 'nodes': nodes, 'seconds': search_seconds,
+                       'nps': nodes / search_seconds if search_seconds > 0 else 0.0},
+            'tables': tables,
+        }
+
+    def write_report(self, path, engine=None, **info):
+        """
+        Function to write the stats and the turns as a JSON report.
+        Args:
+            path (str): The report file.
+            engine (Engine): The engine of the game, the last one that played a turn if None.
+            info: More fields for the report, e.g. the players and the result.
+        """
+        report = dict(info, **self.stats(engine), turns=self.turns)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+
+# The profiler of the game loop
+PROFILER = Profiler()
+
+
+def enable():
+    """
+    Function to start counting with the shared profiler.
+    """
+    PROFILER.enable()
+
+
+def disable():
+    """
+    Function to stop counting with the shared profiler.
+    """
+    PROFILER.disable()
+
+
+def stats(engine=None):
+    """
+    Function to get the counters of the shared profiler, see Profiler.stats.
+    """
+    return PROFILER.stats(engine)
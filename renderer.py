@@ -0,0 +1,212 @@
+# renderer.py
+
+import shutil
+import sys
+
+# Full moves shown in the move history at most, the older ones are paged out. On a
+# terminal fewer lines are shown when the screen is shorter, 6 on 24 lines.
+HISTORY_LINES = 8
+# Lines of the frame besides the history: the turn line, the letters and the 8 rows
+BOARD_LINES = 11
+# Lines of the history besides the moves: the title and a blank line
+HISTORY_TITLE_LINES = 2
+# Lines kept free under the board for messages and the input line; on a shorter
+# terminal the screen would scroll and every frame is drawn whole
+RESERVED_LINES = 5
+
+# How the cells look: the same characters and colors as the original display
+GLYPHS = {
+    'r': "\033[31m0\033[0m ",   # Red checkers
+    'w': "\033[37m0\033[0m ",   # White checkers
+    'R': "\033[31mX\033[0m ",   # Red queen
+    'W': "\033[37mX\033[0m ",   # White queen
+    'C': "\033[37m*\033[0m ",   # White captured piece
+    'c': "\033[31m*\033[0m ",   # Black captured piece
+    '.': "\033[37m·\033[0m ",   # White dots for empty fields
+}
+# Without colors the pieces keep their letters
+PLAIN_GLYPHS = {'r': "r ", 'w': "w ", 'R': "R ", 'W': "W ", 'C': "* ", 'c': "* ", '.': ". "}
+
+CLEAR_SCREEN = "\033[H\033[2J"
+CLEAR_LINE = "\033[K"
+CLEAR_BELOW = "\033[J"
+
+
+def _goto(row, col):
+    """
+    Function to get the escape sequence that moves the cursor, both counted from 0.
+    """
+    return f"\033[{row + 1};{col + 1}H"
+
+
+class Renderer:
+    """
+    Draws the board and the move history in the terminal. Every frame is built in one
+    buffer and written at once. The frame has the same size every turn and stays at
+    the top of the screen, so after the first one only the cells and lines that changed
+    are written, with cursor addressing, and everything under the frame (messages,
+    the input line) is cleared. In plain mode every frame is written whole as text,
+    without escape sequences, e.g. for a log file.
+    Attributes:
+        stream (file): Where the frames are written, sys.stdout at the time of drawing if None.
+        plain (bool): True for plain text, False for the terminal, None to choose by
+            whether the stream is a terminal.
+        history_lines (int): The number of full moves shown in the move history at most.
+        screen (list): The lines of the last frame drawn, None if the screen has to be drawn whole.
+    """
+
+    def __init__(self, stream=None, plain=None, history_lines=HISTORY_LINES):
+        self.stream = stream
+        self.plain = plain
+        self.history_lines = history_lines
+        self.screen = None
+        self._size = None
+
+    def reset(self):
+        """
+        Function to draw the next frame whole, e.g. after something else cleared the screen.
+        """
+        self.screen = None
+
+    def history_size(self, rows=None):
+        """
+        Function to get the number of full moves the move history shows.
+        Args:
+            rows (int): The height of the terminal, None for plain text without a limit.
+        Returns:
+            int: The number of moves, 0 if there is no room for the history.
+        """
+        if rows is None:
+            return self.history_lines
+        room = rows - BOARD_LINES - RESERVED_LINES - HISTORY_TITLE_LINES
+        return max(0, min(self.history_lines, room))
+
+    def history(self, move_history, size=None):
+        """
+        Function to build the lines of the move history: one full move per line, the
+        moves of the current page only. A new page starts when one is full, so until
+        then a move changes one line.
+        Args:
+            move_history (dict): The moves of "White" and "Black".
+            size (int): The number of full moves shown, history_lines if None.
+        Returns:
+            list: The title and size lines, nothing if size is 0.
+        """
+        size = self.history_lines if size is None else size
+        if size <= 0:
+            return []
+        white, black = move_history.get("White", []), move_history.get("Black", [])
+        count = max(len(white), len(black))
+        first = max(0, count - 1) // size * size
+        title = "Move History:" if first == 0 else f"Move History (from move {first + 1}):"
+        lines = [title]
+        for number in range(first, first + size):
+            if number < count:
+                white_move = white[number] if number < len(white) else ""
+                black_move = black[number] if number < len(black) else ""
+                lines.append(f"{number + 1:>3}. {white_move:<14}{black_move}".rstrip())
+            else:
+                lines.append("")
+        return lines
+
+    def frame(self, board, player_name, color, move_history, rotated=False, plain=False, history_size=None):
+        """
+        Function to build a frame.
+        Args:
+            board (list): A 2D list representing the checkers board.
+            player_name, color: The player to move.
+            move_history (dict): The moves of "White" and "Black".
+            rotated (bool): A flag indicating if the board should be displayed rotated.
+            plain (bool): True to build it without escape sequences.
+            history_size (int): The number of full moves shown, history_lines if None.
+        Returns:
+            list: The lines, each a tuple of (column, text) parts. The board rows have a
+                part per cell, so a changed cell can be written alone.
+        """
+        glyphs = PLAIN_GLYPHS if plain else GLYPHS
+        lines = [((0, line),) for line in self.history(move_history, history_size)]
+        if lines:
+            lines.append(((0, ""),))
+        # displaying who's turn is now
+        lines.append(((0, f"{player_name} ({color}), it's your turn."),))
+        # visualization settings for black's move
+        if rotated:
+            horizontal_labels = "  h g f e d c b a"
+            rows = range(7, -1, -1)
+            cols = range(7, -1, -1)
+        # visualization settings for white's move
+        else:
+            horizontal_labels = "  a b c d e f g h"
+            rows = range(8)
+            cols = range(8)
+        # upper line with letters
+        lines.append(((0, horizontal_labels),))
+        for row in rows:
+            row_label = 8 - row
+            # number from the left, the cells and the number from the right of the board
+            parts = [(0, f"{row_label} ")]
+            parts += [(2 + 2 * index, glyphs[board[row][col]]) for index, col in enumerate(cols)]
+            parts.append((18, f"{row_label}"))
+            lines.append(tuple(parts))
+        # bottom line with letters
+        lines.append(((0, horizontal_labels),))
+        return lines
+
+    def render(self, lines, size=None):
+        """
+        Function to get the text that turns the last frame on the screen into a new one.
+        Args:
+            lines (list): The new frame, see frame().
+            size (tuple): The size of the terminal, a change draws the frame whole.
+        Returns:
+            str: The text with the escape sequences.
+        """
+        screen = self.screen
+        if screen is None or len(screen) != len(lines) or size != self._size:
+            buffer = [CLEAR_SCREEN]
+            buffer += ["".join(text for _, text in line) + "\n" for line in lines]
+        else:
+            buffer = []
+            for row, (old, new) in enumerate(zip(screen, lines)):
+                if old == new:
+                    continue
+                if len(old) == len(new) and all(a[0] == b[0] for a, b in zip(old, new)):
+                    # same layout: only the parts that changed, the last one may have been longer
+                    buffer += [_goto(row, column) + text for (column, text), (_, before) in zip(new[:-1], old)
+                               if text != before]
+                    if new[-1] != old[-1]:
+                        buffer.append(_goto(row, new[-1][0]) + new[-1][1] + CLEAR_LINE)
+                else:
+                    buffer.append(_goto(row, 0) + "".join(text for _, text in new) + CLEAR_LINE)
+            # the messages and the input line of the last turn are cleared
+            buffer.append(_goto(len(lines), 0) + CLEAR_BELOW)
+        self.screen = lines
+        self._size = size
+        return "".join(buffer)
+
+    def draw(self, board, player_name, color, move_history, rotated=False):
+        """
+        Function to draw the board and the move history, see frame() for the arguments.
+        """
+        stream = self.stream or sys.stdout
+        plain = self.plain
+        if plain is None:
+            plain = not (hasattr(stream, "isatty") and stream.isatty())
+        if plain:
+            lines = self.frame(board, player_name, color, move_history, rotated, plain)
+            text = "".join("".join(part for _, part in line).rstrip() + "\n" for line in lines)
+        else:
+            size = tuple(shutil.get_terminal_size())
+            # the history gets the lines the board and the messages leave
+            lines = self.frame(board, player_name, color, move_history, rotated, plain,
+                               self.history_size(size[1]))
+            if size[1] < len(lines) + RESERVED_LINES:
+                # not even the board fits: the screen would scroll and the cursor addresses would be wrong
+                self.reset()
+            text = self.render(lines, size)
+        stream.write(text)
+        stream.flush()
+
+
+# The renderer of the terminal game
+RENDERER = Renderer()
@@ -1,5 +1,10 @@
 # rules.py
 
+from bitboard import SQUARE_TO_RC, RC_TO_SQUARE, from_board
+from board import Board
+from bitboard import iter_capture_steps, is_legal_step, has_any_legal_move as position_has_any_legal_move
+from movecache import MOVE_CACHE, position_key, cached_capture_steps, cached_quiet_moves, cached_legal_moves
+
 def apply_capture(board, start_pos, end_pos, player_color):
     """
     Apply the capture move to the board.
@@ -35,10 +40,10 @@ def finalize_captures(board):
     Args:
         board (list): The current state of the board.
     """
-    for row in range(8):
-        for col in range(8):
-            if board[row][col].lower() == 'c':
-                board[row][col] = '.'
+    # pieces only ever stand on the 32 dark squares
+    for row, col in SQUARE_TO_RC:
+        if board[row][col] in ('c', 'C'):
+            board[row][col] = '.'
 
 def promote_to_queen(board, pos):
     """
@@ -53,6 +58,29 @@ def promote_to_queen(board, pos):
     elif board[row][col] == 'r' and row == 7:
         board[row][col] = 'R'  # Red queen
 
+def _to_rc_moves(moves):
+    """
+    Convert square-number moves of the bitboard backend into (row, col) moves.
+    Args:
+        moves (list): A list of (start square, end square) tuples.
+    Returns:
+        list: A list of ((start_row, start_col), (end_row, end_col)) tuples.
+    """
+    return [(SQUARE_TO_RC[start], SQUARE_TO_RC[end]) for start, end in moves]
+
+def _position(board):
+    """
+    Get the bitboard position of a board: the one a Board keeps up to date, or a
+    position converted from the cells of any other board.
+    Args:
+        board (list): The current state of the board.
+    Returns:
+        Position: The position, only to be read.
+    """
+    if isinstance(board, Board):
+        return board.position
+    return from_board(board, with_hash=False)
+
 def mandatory_capture(board, player_color, specific_piece=None):
     """
     Check for mandatory captures.
@@ -63,67 +91,16 @@ def mandatory_capture(board, player_color, specific_piece=None):
     Returns:
         list: A list of tuples indicating mandatory capture moves.
     """
-    # Directions for regular pieces (capture by jumping 2 squares in a direction)
-    directions = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
-    # Directions for king pieces (can capture in multiple steps in any diagonal direction)
-    # king_directions = [(-i, -i) for i in range(1, 8)] + [(-i, i) for i in range(1, 8)] + \
-    #                   [(i, -i) for i in range(1, 8)] + [(i, i) for i in range(1, 8)]
-    king_directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-    # variable to store mandatory capture moves
-    mandatory_captures = []
-    
-    # Determine which pieces to check for mandatory captures
+    # the grid board is only an adapter, the moves are generated on bitboards
+    position = _position(board)
+    specific_square = None
     if specific_piece:
-        pieces_to_check = [specific_piece]
-    else:
-        pieces_to_check = [(row, col) for row in range(8) for col in range(8) if board[row][col].lower() == player_color]
-    # Loop through each piece to check for possible captures
-    
-    for row, col in pieces_to_check:
-        piece = board[row][col]
-        if piece.lower() == player_color:
-            # Check captures for king pieces
-            if piece.isupper():
-                for direction in king_directions:
-                    step_row, step_col = direction
-                    opponent_encountered = False
-                    for distance in range(1, 8):
-                        row_next = row + step_row * distance
-                        col_next = col + step_col * distance
-                        if not (0 <= row_next < 8 and 0 <= col_next < 8):
-                            break
-                        if board[row_next][col_next] == '.':
-                            if opponent_encountered:
-                                mandatory_captures.append(((row, col), (row_next, col_next)))
-                        elif board[row_next][col_next].lower() != player_color.lower() and board[row_next][col_next] != '.' and board[row_next][col_next].lower() != 'c':
-                            if not opponent_encountered:
-                                opponent_encountered = True
-                            else:
-                                break
-                        else:
-                            break
-            # Check captures for regular pieces
-            else:
-                for direction in directions:
-                    row_next = row + direction[0]
-                    col_next = col + direction[1]
-
-                    if not (0 <= row_next < 8 and 0 <= col_next < 8):
-                        continue
-                    # Check if the position is within bounds
-                    mid_row = row + (row_next - row) // 2
-                    mid_col = col + (col_next - col) // 2
-                    # Check if the next position is empty and there's an opponent's piece to capture
-                    if (board[row_next][col_next] == '.' and 
-                        board[mid_row][mid_col].lower() != player_color.lower() and 
-                        board[mid_row][mid_col] != '.' and 
-                        board[mid_row][mid_col].lower() != 'c'):
-                        mandatory_captures.append(((row, col), (row_next, col_next)))
-
-    # Remove duplicate capture moves
-    # mandatory_captures = list(set(mandatory_captures))
-    
-    return mandatory_captures
+        specific_square = RC_TO_SQUARE.get(tuple(specific_piece))
+        # light squares never hold a piece, so there is nothing to capture with
+        if specific_square is None:
+            return []
+    # the lists are cached by position, see movecache.py
+    return _to_rc_moves(cached_capture_steps(position, player_color, specific_square))
 
 def non_capture_moves(board, player_color):
     """
@@ -134,38 +111,97 @@ def non_capture_moves(board, player_color):
     Returns:
         list: A list of tuples indicating non-capturing moves.
     """
-    directions = [(-1, -1), (-1, 1)] if player_color == 'w' else [(1, -1), (1, 1)]
-    non_capture_moves_list = []
-
-    for row in range(8):
-        for col in range(8):
-            piece = board[row][col]
-            if piece.lower() == player_color:
-                # Check for regular non-capturing moves
-                for dr, dc in directions:
-                    new_row, new_col = row + dr, col + dc
-                    if 0 <= new_row < 8 and 0 <= new_col < 8:
-                        if board[new_row][new_col] == '.':
-                            non_capture_moves_list.append(((row, col), (new_row, new_col)))
-
-                if piece.isupper():  # Check for flying king non-capturing moves
-                    for dr in range(-7, 8):
-                        for dc in range(-7, 8):
-                            if abs(dr) == abs(dc) and (dr != 0 or dc != 0):
-                                new_row, new_col = row + dr, col + dc
-                                if 0 <= new_row < 8 and 0 <= new_col < 8 and board[new_row][new_col] == '.':
-                                    # Ensure there are no pieces blocking the path
-                                    path_clear = True
-                                    step_row = dr // abs(dr)
-                                    step_col = dc // abs(dc)
-                                    for step in range(1, abs(dr)):
-                                        if board[row + step * step_row][col + step * step_col] != '.':
-                                            path_clear = False
-                                            break
-                                    if path_clear:
-                                        non_capture_moves_list.append(((row, col), (new_row, new_col)))
-
-    return non_capture_moves_list
+    return _to_rc_moves(cached_quiet_moves(_position(board), player_color))
+
+def legal_moves(board, player_color):
+    """
+    Get all complete legal moves for the player's pieces, with whole capture sequences.
+    Args:
+        board (list): The current state of the board.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        list: A list of bitboard.Move tuples (path, captured squares, promotion flag).
+    """
+    return cached_legal_moves(_position(board), player_color)
+
+def has_capture(board, player_color):
+    """
+    Check if the player has to capture, stopping at the first capture found.
+    Args:
+        board (list): The current state of the board.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        bool: True if a capture is possible.
+    """
+    position = _position(board)
+    # a list generated before answers right away, otherwise only the first capture is looked for
+    captures = MOVE_CACHE.peek(position_key('captures', position, player_color))
+    if captures is not None:
+        return bool(captures)
+    return next(iter_capture_steps(position, player_color), None) is not None
+
+def has_any_legal_move(board, player_color):
+    """
+    Check if the player can move at all, without generating the moves.
+    Args:
+        board (list): The current state of the board.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    Returns:
+        bool: True if the player has a legal move.
+    """
+    return position_has_any_legal_move(_position(board), player_color)
+
+def is_legal(board, player_color, start_pos, end_pos, specific_piece=None):
+    """
+    Check a single step of a move, stopping at the first match: a capture step when
+    a capture is possible, a non-capturing move otherwise.
+    Args:
+        board (list): The current state of the board.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+        start_pos (tuple): The starting position as (row, col).
+        end_pos (tuple): The ending position as (row, col).
+        specific_piece (tuple): The piece that has to go on capturing, if any.
+    Returns:
+        bool: True if the step is legal.
+    """
+    start, end = RC_TO_SQUARE.get(tuple(start_pos)), RC_TO_SQUARE.get(tuple(end_pos))
+    # light squares never hold a piece
+    if start is None or end is None:
+        return False
+    specific_square = None
+    if specific_piece:
+        specific_square = RC_TO_SQUARE.get(tuple(specific_piece))
+        if specific_square is None:
+            return False
+    position = _position(board)
+    # lists generated before answer right away, otherwise the check stops at the first match
+    captures = MOVE_CACHE.peek(position_key('captures', position, player_color, specific_square))
+    if captures:
+        return (start, end) in captures
+    if captures is not None and specific_square is not None:
+        return False
+    quiet = MOVE_CACHE.peek(position_key('quiet', position, player_color))
+    if captures is not None and quiet is not None:
+        return (start, end) in quiet
+    return is_legal_step(position, player_color, start, end, specific_square)
+
+def apply_move(board, move, player_color):
+    """
+    Apply a complete move to the board in one step, including all of its captures.
+    Args:
+        board (list): The current state of the board.
+        move (Move): A complete move from legal_moves.
+        player_color (str): The color of the current player ('w' for white, 'r' for red).
+    """
+    start_row, start_col = SQUARE_TO_RC[move.path[0]]
+    end_row, end_col = SQUARE_TO_RC[move.path[-1]]
+    piece = board[start_row][start_col]
+    board[start_row][start_col] = '.'
+    # the captured pieces are removed right away, there is nothing left to finalize
+    for square in move.captured:
+        row, col = SQUARE_TO_RC[square]
+        board[row][col] = '.'
+    board[end_row][end_col] = piece.upper() if move.promotion else piece
 
 def is_game_over(board, player_color):
     """
@@ -178,10 +214,13 @@ def is_game_over(board, player_color):
     """
     # getting opponent's color
     opponent_color = 'r' if player_color == 'w' else 'w'
-    # counting the number of opponent's pieces on the board
-    opponent_pieces = sum(row.count(player_color) + row.count(player_color.upper()) for row in board)
+    # a Board keeps its position, the piece counts come with it
+    position = _position(board)
     # if no pieces or no any moves left
-    if opponent_pieces == 0 or not (mandatory_capture(board, opponent_color) or non_capture_moves(board, opponent_color)):
+    if position.piece_count(opponent_color) == 0:
+        return True
+    # only the existence of a move is checked, no move is generated
+    if not position_has_any_legal_move(position, opponent_color):
         return True
 
-    return False
\ No newline at end of file
+    return False
@@ -0,0 +1,323 @@
+# server.py
+
+import argparse
+import asyncio
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import from_board, move_to_notation
+from board import initialize_board
+from draws import DrawTracker
+from engine import create_engine, opponent_of, RandomEngine
+from pdn import to_fen
+from rules import legal_moves, apply_move, finalize_captures, is_game_over
+
+HOST = "127.0.0.1"
+PORT = 8765
+# Levels a client can ask for, level 4 would take all cores for one game
+LEVELS = ("random", "1", "2", "3")
+DEFAULT_LEVEL = "1"
+# Searches handed to the pool at a time per worker process, the rest wait in the event loop
+QUEUED_PER_WORKER = 2
+# Requests longer than this are refused
+MAX_LINE = 4096
+
+COLORS = {"white": 'w', "black": 'r'}
+STATES = {'w': "white", 'r': "black"}
+
+HELP = ("commands: NEW [white|black|both] [random|1|2|3], MOVE <game> <a3-b4-d6>, POSITION <game>, "
+        "MOVES <game>, RESIGN <game> (also closes a finished game), QUIT")
+
+# The engines of a worker process, one per level
+_worker_engines = {}
+
+
+def _search(level, board, player_color):
+    """
+    Function to choose the computer's move in a worker process.
+    Args:
+        level (str): The strength level, see LEVELS.
+        board (list): The current state of the board.
+        player_color (str): The color of the computer ('w' for white, 'r' for red).
+    Returns:
+        str: The move in 'a3-b4-d6' notation, None if there are no moves.
+    """
+    engine = _worker_engines.get(level)
+    if engine is None:
+        engine = _worker_engines[level] = RandomEngine() if level == "random" else create_engine(level)
+    move = engine.choose_move(from_board(board), player_color)
+    return move_to_notation(move) if move else None
+
+
+class ProtocolError(Exception):
+    """
+    Raised for a request the server can't carry out, the message goes back to the client.
+    """
+
+
+class Game:
+    """
+    One game hosted by the server. The board is the same 8x8 grid the terminal game
+    uses, every move is checked and made with rules.py.
+    Attributes:
+        board (list): The current state of the board.
+        player_color (str): The color to move ('w' for white, 'r' for red).
+        human (set): The colors the client plays, the computer plays the others.
+        level (str): The strength of the computer, see LEVELS.
+        moves (list): The moves played, in 'a3-b4-d6' notation.
+        state (str): "playing", the winner ("white" or "black") or "draw".
+        reason (str): Why the game ended, None while it is played.
+        draws (DrawTracker): The positions and move counters of the draw rules.
+    """
+
+    def __init__(self, human, level):
+        self.board = initialize_board()
+        self.player_color = 'w'
+        self.human = human
+        self.level = level
+        self.moves = []
+        self.state = "playing"
+        self.reason = None
+        self.draws = DrawTracker(from_board(self.board), self.player_color)
+
+    def legal_moves(self):
+        """
+        Function to get the legal moves of the player to move.
+        Returns:
+            dict: 'a3-b4-d6' notation -> Move.
+        """
+        return {move_to_notation(move): move for move in legal_moves(self.board, self.player_color)}
+
+    def play(self, notation):
+        """
+        Function to make a move of the player to move.
+        Args:
+            notation (str): The move in 'a3-b4-d6' notation, the whole capture sequence.
+        Raises:
+            ProtocolError: If the game is over or the move is not legal.
+        """
+        if self.state != "playing":
+            raise ProtocolError("game over")
+        move = self.legal_moves().get(notation.lower())
+        if move is None:
+            raise ProtocolError(f"illegal move {notation}")
+        apply_move(self.board, move, self.player_color)
+        finalize_captures(self.board)
+        self.moves.append(move_to_notation(move))
+        if is_game_over(self.board, self.player_color):
+            self.state, self.reason = STATES[self.player_color], "no moves"
+            return
+        self.player_color = opponent_of(self.player_color)
+        draw_reason = self.draws.update(from_board(self.board), self.player_color)
+        if draw_reason:
+            self.state, self.reason = "draw", draw_reason
+
+    def resign(self):
+        """
+        Function to give up the game for the client: for the player to move if the client
+        plays both colors.
+        """
+        loser = self.player_color if self.player_color in self.human else next(iter(self.human))
+        self.state, self.reason = STATES[opponent_of(loser)], "resignation"
+
+    def status(self):
+        """
+        Function to describe the state of the game in two words: "playing" and the color
+        to move, or the result and why the game ended.
+        """
+        if self.state == "playing":
+            return f"playing {STATES[self.player_color]}"
+        return f"{self.state} {self.reason.replace(' ', '_')}"
+
+
+class GameServer:
+    """
+    Hosts any number of games in one process over a line based text protocol. Every
+    request is one line and gets one line back, "OK ..." or "ERR message"; the requests
+    of a connection are answered in order. The games belong to the connection that
+    created them and end with it or with RESIGN. The computer's searches run on a fixed
+    pool of processes, so the event loop never waits for one.
+    Attributes:
+        games (dict): Game id -> Game.
+        workers (int): The number of search processes.
+        executor (ProcessPoolExecutor): The processes that search the computer's moves.
+        searches (Semaphore): Bounds the searches handed to the pool at a time.
+        default_level (str): The level of games created without one.
+        moves (int): The number of moves played on the server.
+    """
+
+    def __init__(self, workers=None, default_level=DEFAULT_LEVEL):
+        self.workers = workers or os.cpu_count() or 1
+        self.games = {}
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.searches = asyncio.Semaphore(self.workers * QUEUED_PER_WORKER)
+        self.default_level = default_level
+        self.moves = 0
+        self._ids = itertools.count(1)
+
+    def close(self):
+        """
+        Function to stop the worker processes.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def computer_moves(self, game):
+        """
+        Function to let the computer play until it is the client's turn or the game is over.
+        Returns:
+            list: The moves of the computer.
+        """
+        played = []
+        loop = asyncio.get_running_loop()
+        while game.state == "playing" and game.player_color not in game.human:
+            async with self.searches:
+                notation = await loop.run_in_executor(self.executor, _search, game.level,
+                                                      game.board, game.player_color)
+            if notation is None:
+                # is_game_over catches this after the move before, only a start without moves gets here
+                game.state, game.reason = STATES[opponent_of(game.player_color)], "no moves"
+                break
+            game.play(notation)
+            self.moves += 1
+            played.append(notation)
+        return played
+
+    def _game(self, owned, token):
+        """
+        Function to find a game of the connection by its id.
+        """
+        game = owned.get(token)
+        if game is None:
+            raise ProtocolError(f"no game {token}")
+        return game
+
+    async def handle(self, words, owned):
+        """
+        Function to carry out one request.
+        Args:
+            words (list): The words of the request line.
+            owned (dict): The games of the connection, game id -> Game.
+        Returns:
+            str: The reply without "OK".
+        Raises:
+            ProtocolError: If the request can't be carried out.
+        """
+        command, arguments = words[0].upper(), words[1:]
+        if command == "NEW":
+            side = arguments[0].lower() if arguments else "white"
+            level = arguments[1] if len(arguments) > 1 else self.default_level
+            if side not in ("white", "black", "both") or level not in LEVELS or len(arguments) > 2:
+                raise ProtocolError("usage: NEW [white|black|both] [random|1|2|3]")
+            human = set(COLORS.values()) if side == "both" else {COLORS[side]}
+            game_id = str(next(self._ids))
+            game = owned[game_id] = self.games[game_id] = Game(human, level)
+            played = await self.computer_moves(game)
+            return " ".join([game_id, game.status(), *played])
+        if command in ("MOVE", "POSITION", "MOVES", "RESIGN"):
+            if len(arguments) != (2 if command == "MOVE" else 1):
+                raise ProtocolError(f"usage: {command} <game>{' <move>' if command == 'MOVE' else ''}")
+            game = self._game(owned, arguments[0])
+            if command == "POSITION":
+                return f"{to_fen(from_board(game.board), game.player_color)} {game.status()} {len(game.moves)}"
+            if command == "MOVES":
+                return " ".join(game.legal_moves()) if game.state == "playing" else ""
+            if command == "RESIGN":
+                # a finished game is only closed
+                if game.state == "playing":
+                    game.resign()
+                del owned[arguments[0]], self.games[arguments[0]]
+                return game.status()
+            game.play(arguments[1])
+            self.moves += 1
+            played = await self.computer_moves(game)
+            return " ".join([game.status(), *played])
+        if command == "HELP":
+            return HELP
+        raise ProtocolError(f"unknown command {words[0]}")
+
+    async def serve_client(self, reader, writer):
+        """
+        Function to answer the requests of one connection until it closes or sends QUIT.
+        """
+        owned = {}
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    writer.write(b"ERR line too long\n")
+                    break
+                if not line:
+                    break
+                words = line.decode("ascii", "replace").split()
+                if not words:
+                    continue
+                if words[0].upper() == "QUIT":
+                    writer.write(b"OK bye\n")
+                    break
+                try:
+                    reply = "OK " + await self.handle(words, owned)
+                except ProtocolError as error:
+                    reply = f"ERR {error}"
+                # the bytes of a request that are not ASCII came in as U+FFFD, an error
+                # message that echoes them sends '?' instead
+                writer.write(reply.rstrip().encode("ascii", "replace") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for game_id in owned:
+                del self.games[game_id]
+            writer.close()
+
+
+async def serve(host=HOST, port=PORT, unix_path=None, workers=None, level=DEFAULT_LEVEL, log=sys.stdout):
+    """
+    Function to run the server until it is cancelled.
+    Args:
+        host (str): The address to listen on, localhost by default.
+        port (int): The TCP port.
+        unix_path (str): A Unix socket to listen on instead of TCP, if any.
+        workers (int): The number of search processes, all cores if None.
+        level (str): The computer level of games created without one.
+        log (file): Where to print the address, None to print nothing.
+    """
+    server = GameServer(workers, level)
+    try:
+        if unix_path:
+            listener = await asyncio.start_unix_server(server.serve_client, unix_path, limit=MAX_LINE)
+        else:
+            listener = await asyncio.start_server(server.serve_client, host, port, limit=MAX_LINE, backlog=1024)
+        if log:
+            address = unix_path or f"{host}:{port}"
+            print(f"checkers server on {address}, {server.workers} search processes", file=log, flush=True)
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        server.close()
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python server.py --port 8765 --workers 4
+        python server.py --unix /tmp/checkers.sock
+    """
+    parser = argparse.ArgumentParser(description="Host checkers games over a line based text protocol.")
+    parser.add_argument("--host", default=HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="TCP port")
+    parser.add_argument("--unix", default=None, metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="search processes (default: all cores)")
+    parser.add_argument("--level", default=DEFAULT_LEVEL, choices=LEVELS, help="computer level of NEW without one")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers, args.level))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,289 @@
+# smp.py
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+from engine import AlphaBetaEngine, Engine, SearchResult
+from perft import PERFT_POSITIONS, load_position
+from transposition import SharedTranspositionTable
+
+
+class HelperEngine(AlphaBetaEngine):
+    """
+    The search of one process of the parallel search (Lazy SMP). All processes search
+    the same root and share one transposition table, so what one of them finds cuts the
+    work of the others. Process 0 searches like AlphaBetaEngine, the helpers start one
+    iteration deeper every other process and shuffle the root moves, so they don't all
+    walk the same tree in the same order.
+    Attributes:
+        index (int): The number of the process, 0 for the main search.
+        stop_event (Event): Set by the driver to stop the search of all processes.
+    """
+    name = "smp-helper"
+
+    def __init__(self, index, stop_event, tt, max_depth=64, time_ms=1000, node_limit=None, tablebase=None):
+        super().__init__(max_depth, time_ms, node_limit, tt_mb=0, tablebase=tablebase)
+        # the private table made by AlphaBetaEngine is replaced by the shared one
+        self.tt = tt
+        self.index = index
+        self.stop_event = stop_event
+        self.first_depth = 1 + index % 2
+        self.rng = random.Random(index)
+
+    def _order_root(self, moves):
+        if self.index:
+            self.rng.shuffle(moves)
+
+
+def _worker_main(index, tt_name, tt_mb, settings, stop_event, tasks, results):
+    """
+    Function run by every search process: it searches every position it gets until
+    it is sent None.
+    Args:
+        index (int): The number of the process.
+        tt_name (str): The name of the shared memory block of the transposition table.
+        tt_mb (float): The size of the table in megabytes.
+        settings (dict): max_depth, time_ms, node_limit and tablebase of the search.
+        stop_event (Event): Set when the search has to stop.
+        tasks (Queue): The positions to search, as (position, player color).
+        results (Queue): Where the results are put, one dict per search.
+    """
+    tt = SharedTranspositionTable(tt_mb, tt_name)
+    engine = HelperEngine(index, stop_event, tt, **settings)
+    try:
+        for task in iter(tasks.get, None):
+            position, player_color = task
+            result = engine.search(position, player_color)
+            # the first process to finish stops the others, their deeper iterations can't finish in time
+            stop_event.set()
+            results.put({
+                'worker': index,
+                'move': result.move,
+                'score': result.score,
+                'depth': result.depth,
+                'nodes': result.nodes,
+                'elapsed': result.elapsed,
+            })
+    finally:
+        tt.close()
+
+
+class ParallelEngine(Engine):
+    """
+    Lazy SMP: several processes search the same position at the same time, sharing one
+    transposition table in shared memory. The move of the deepest finished search is played.
+    The processes are started at the first search and live until close().
+    Attributes:
+        workers (int): The number of search processes.
+        max_depth (int): The deepest iteration to search.
+        time_ms (int): The time budget per move in milliseconds, None for no limit.
+        node_limit (int): The node budget per move and process, None for no limit.
+        tt_mb (float): The size of the shared transposition table in megabytes.
+        tablebase (Tablebase): Endgame tables, every process maps the files itself.
+        book (OpeningBook): Opening moves played without a search, looked up in this process.
+        last_report (dict): Nodes and nodes per second of every process in the last search.
+    """
+    name = "smp"
+
+    def __init__(self, workers=None, max_depth=64, time_ms=1000, node_limit=None, tt_mb=64, tablebase=None, book=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_depth = max_depth
+        self.time_ms = time_ms
+        self.node_limit = node_limit
+        self.tt_mb = tt_mb
+        self.tablebase = tablebase
+        self.book = book
+        self.tt = None
+        self.processes = []
+        self.last_result = None
+        self.last_report = None
+
+    def _start(self):
+        """
+        Function to create the shared table and start the search processes.
+        """
+        self.tt = SharedTranspositionTable(self.tt_mb)
+        self.stop_event = multiprocessing.Event()
+        self.results = multiprocessing.Queue()
+        self.task_queues = []
+        settings = {'max_depth': self.max_depth, 'time_ms': self.time_ms, 'node_limit': self.node_limit,
+                    'tablebase': self.tablebase}
+        for index in range(self.workers):
+            tasks = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_worker_main, daemon=True,
+                args=(index, self.tt.name, self.tt_mb, settings, self.stop_event, tasks, self.results))
+            process.start()
+            self.task_queues.append(tasks)
+            self.processes.append(process)
+
+    def close(self):
+        """
+        Function to stop the search processes and free the shared table.
+        """
+        for tasks in getattr(self, 'task_queues', []):
+            tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.processes = []
+        self.task_queues = []
+        if self.tt is not None:
+            self.tt.close()
+            self.tt = None
+
+    def new_game(self):
+        if self.tt is not None:
+            self.tt.clear()
+
+    def choose_move(self, position, player_color):
+        return self.search(position, player_color).move
+
+    def search(self, position, player_color):
+        """
+        Function to search a position with all processes.
+        Args:
+            position (Position): The position to search.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        Returns:
+            SearchResult: The deepest result, with the nodes of all processes.
+        """
+        started = time.perf_counter()
+        if self.book is not None:
+            move = self.book.choose(position, player_color)
+            if move is not None:
+                self.last_result = SearchResult(move, 0, 0, 0, time.perf_counter() - started)
+                return self.last_result
+        if not self.processes:
+            self._start()
+        self.stop_event.clear()
+        task = (position.copy(), player_color)
+        for tasks in self.task_queues:
+            tasks.put(task)
+        reports = sorted((self.results.get() for _ in range(self.workers)), key=lambda r: r['worker'])
+        elapsed = time.perf_counter() - started
+
+        # the deepest search wins, the main process breaks ties
+        best = max(reports, key=lambda r: (r['depth'], -r['worker']))
+        nodes = sum(report['nodes'] for report in reports)
+        for report in reports:
+            report['nps'] = report['nodes'] / report['elapsed'] if report['elapsed'] > 0 else 0.0
+        self.last_report = {
+            'workers': [{key: report[key] for key in ('worker', 'depth', 'nodes', 'nps')} for report in reports],
+            'depth': best['depth'],
+            'nodes': nodes,
+            'elapsed': elapsed,
+            'nps': nodes / elapsed if elapsed > 0 else 0.0,
+        }
+        self.last_result = SearchResult(best['move'], best['score'], best['depth'], nodes, elapsed)
+        return self.last_result
+
+
+def scaling(max_workers, names, time_ms=1000, depth=None, tt_mb=64):
+    """
+    Function to measure how the parallel search scales from 1 to max_workers processes.
+    With a time budget it measures the nodes per second and the depth reached, with a
+    fixed depth (and no time budget) the time needed to reach it.
+    Args:
+        max_workers (int): The largest number of processes to try.
+        names (list): The names of the positions of perft.PERFT_POSITIONS to search.
+        time_ms (int): The time budget per position in milliseconds.
+        depth (int): The depth to search to instead of a time budget.
+        tt_mb (float): The size of the shared transposition table in megabytes.
+    Returns:
+        list: One dict per worker count with the totals over all positions.
+    """
+    rows = []
+    for workers in range(1, max_workers + 1):
+        if depth is None:
+            engine = ParallelEngine(workers, time_ms=time_ms, tt_mb=tt_mb)
+        else:
+            engine = ParallelEngine(workers, max_depth=depth, time_ms=None, tt_mb=tt_mb)
+        nodes, elapsed, depths = 0, 0.0, 0
+        try:
+            for name in names:
+                position, player_color = load_position(name)
+                engine.new_game()
+                result = engine.search(position, player_color)
+                nodes += result.nodes
+                elapsed += result.elapsed
+                depths += result.depth
+        finally:
+            engine.close()
+        rows.append({
+            'workers': workers,
+            'nodes': nodes,
+            'elapsed': elapsed,
+            'nps': nodes / elapsed if elapsed > 0 else 0.0,
+            'nps_per_worker': nodes / elapsed / workers if elapsed > 0 else 0.0,
+            'average_depth': depths / len(names),
+        })
+    for row in rows:
+        row['speedup'] = rows[0]['elapsed'] / row['elapsed'] if depth is not None else row['nps'] / rows[0]['nps']
+    return rows
+
+
+def format_report(report):
+    """
+    Function to format the report of one parallel search as text.
+    """
+    lines = [f"worker {r['worker']:>3}  depth {r['depth']:>2}  nodes {r['nodes']:>9}  {r['nps']:>9.0f} nodes/s"
+             for r in report['workers']]
+    lines.append(f"total       depth {report['depth']:>2}  nodes {report['nodes']:>9}  {report['nps']:>9.0f} nodes/s"
+                 f"  in {report['elapsed']:.2f}s")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python smp.py --workers 8 --time 2000
+        python smp.py --scaling 8 --time 2000
+        python smp.py --scaling 8 --depth 9
+    """
+    parser = argparse.ArgumentParser(description="Search with several processes sharing one transposition table.")
+    parser.add_argument("--workers", type=int, default=None, help="search processes (default: all cores)")
+    parser.add_argument("--position", default=None, choices=sorted(PERFT_POSITIONS),
+                        help="position to search (default: all of them)")
+    parser.add_argument("--time", type=int, default=1000, help="time budget per position in ms")
+    parser.add_argument("--depth", type=int, default=None, help="search to this depth without a time budget")
+    parser.add_argument("--tt", type=float, default=64, help="shared transposition table in MB")
+    parser.add_argument("--scaling", type=int, default=None, metavar="N", help="compare 1 to N processes")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    names = [args.position] if args.position else list(PERFT_POSITIONS)
+    if args.scaling:
+        rows = scaling(args.scaling, names, args.time, args.depth, args.tt)
+        if args.json:
+            print(json.dumps(rows))
+        for row in rows if not args.json else []:
+            print(f"workers {row['workers']:>3}  {row['nps']:>10.0f} nodes/s  {row['nps_per_worker']:>9.0f} per worker  "
+                  f"depth {row['average_depth']:5.2f}  time {row['elapsed']:7.2f}s  speedup {row['speedup']:5.2f}x")
+        return 0
+
+    if args.depth is None:
+        engine = ParallelEngine(args.workers, time_ms=args.time, tt_mb=args.tt)
+    else:
+        engine = ParallelEngine(args.workers, max_depth=args.depth, time_ms=None, tt_mb=args.tt)
+    try:
+        for name in names:
+            position, player_color = load_position(name)
+            engine.new_game()
+            engine.search(position, player_color)
+            if args.json:
+                print(json.dumps(dict(engine.last_report, position=name)))
+            else:
+                print(f"{name}:")
+                print(format_report(engine.last_report))
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
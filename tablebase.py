@@ -0,0 +1,458 @@
+# tablebase.py
+
+import argparse
+import itertools
+import mmap
+import multiprocessing
+import os
+import struct
+import sys
+import time
+from array import array
+from functools import lru_cache
+
+from bitboard import Position, legal_moves
+
+# Every position of a material signature has one byte per side to move:
+#     0       draw (or a square combination that can't happen, e.g. two pieces on one square)
+#     d + 1   the game ends after d more plies of best play: the side to move wins
+#             when d is odd and loses when d is even (d = 0: it has no pieces or moves)
+DRAW = 0
+MAX_DISTANCE = 254
+
+# A material signature is (white men, white kings, red men, red kings). Only one of a
+# signature and its color-flipped twin is stored: turning the board around (square s
+# becomes 31 - s) and swapping the colors gives the same game.
+# Header of a table file: magic, the signature and the number of entries per side.
+HEADER = struct.Struct("<4s4BI4x")
+MAGIC = b"CKTB"
+
+# Squares a man can stand on: white men promote on row 0, red men on row 7
+WHITE_MAN_SQUARES = tuple(range(4, 32))
+RED_MAN_SQUARES = tuple(range(0, 28))
+KING_SQUARES = tuple(range(32))
+
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tablebases")
+
+# Bit-reversed bytes, for turning the board around
+_REVERSED_BYTES = bytes(int(f"{b:08b}"[::-1], 2) for b in range(256))
+
+
+def flip_mask(mask):
+    """
+    Function to turn a square mask around the centre of the board (square s becomes 31 - s).
+    """
+    return int.from_bytes(mask.to_bytes(4, 'little').translate(_REVERSED_BYTES), 'big')
+
+
+def flip_signature(signature):
+    """
+    Function to swap the colors of a material signature.
+    """
+    white_men, white_kings, red_men, red_kings = signature
+    return red_men, red_kings, white_men, white_kings
+
+
+def canonical_signature(signature):
+    """
+    Function to get the signature whose table holds the positions of a signature.
+    Returns:
+        tuple: The stored signature and True if the colors have to be swapped to use it.
+    """
+    flipped = flip_signature(signature)
+    return (flipped, True) if flipped < signature else (signature, False)
+
+
+def signatures(max_pieces):
+    """
+    Function to list the stored signatures with up to max_pieces pieces, in the order
+    they can be solved: a signature needs the tables its captures and promotions lead to,
+    which have fewer pieces, or as many pieces and fewer men.
+    Args:
+        max_pieces (int): The largest number of pieces on the board.
+    Returns:
+        list: The canonical signatures in solving order.
+    """
+    found = set()
+    for pieces in range(2, max_pieces + 1):
+        for white in range(1, pieces):
+            red = pieces - white
+            for white_kings in range(white + 1):
+                for red_kings in range(red + 1):
+                    signature = (white - white_kings, white_kings, red - red_kings, red_kings)
+                    found.add(canonical_signature(signature)[0])
+    return sorted(found, key=lambda s: (sum(s), s[0] + s[2], s))
+
+
+@lru_cache(maxsize=None)
+def _combinations(domain, count):
+    """
+    Function to list the square masks of count pieces on a set of squares.
+    Returns:
+        tuple: The masks in index order and a dict from mask to index.
+    """
+    masks = [sum(1 << square for square in squares) for squares in itertools.combinations(domain, count)]
+    return masks, {mask: rank for rank, mask in enumerate(masks)}
+
+
+class SignatureIndex:
+    """
+    Numbering of the positions of one material signature. Every piece group (white men,
+    white kings, red men, red kings) is numbered as a combination of squares on its own,
+    the index is the mixed-radix number of the four group numbers. Indexes where two
+    groups share a square are left unused.
+    Attributes:
+        signature (tuple): (white men, white kings, red men, red kings).
+        size (int): The number of indexes per side to move.
+    """
+
+    def __init__(self, signature):
+        self.signature = tuple(signature)
+        white_men, white_kings, red_men, red_kings = signature
+        self.groups = [_combinations(WHITE_MAN_SQUARES, white_men), _combinations(KING_SQUARES, white_kings),
+                       _combinations(RED_MAN_SQUARES, red_men), _combinations(KING_SQUARES, red_kings)]
+        self.radix = [len(masks) for masks, _ in self.groups]
+        self.size = self.radix[0] * self.radix[1] * self.radix[2] * self.radix[3]
+
+    def index(self, white, black, kings):
+        """
+        Function to get the index of a position of this signature.
+        """
+        (_, white_men), (_, white_kings), (_, red_men), (_, red_kings) = self.groups
+        _, radix_1, radix_2, radix_3 = self.radix
+        return (((white_men[white & ~kings] * radix_1 + white_kings[white & kings]) * radix_2
+                 + red_men[black & ~kings]) * radix_3 + red_kings[black & kings])
+
+    def positions(self):
+        """
+        Function to go through all valid positions of this signature.
+        Yields:
+            tuple: (index, white mask, red mask, kings mask)
+        """
+        (white_men, _), (white_kings, _), (red_men, _), (red_kings, _) = self.groups
+        radix_1, radix_2, radix_3 = self.radix[1:]
+        for rank_0, mask_0 in enumerate(white_men):
+            for rank_1, mask_1 in enumerate(white_kings):
+                if mask_0 & mask_1:
+                    continue
+                white = mask_0 | mask_1
+                base_1 = (rank_0 * radix_1 + rank_1) * radix_2
+                for rank_2, mask_2 in enumerate(red_men):
+                    if white & mask_2:
+                        continue
+                    base_2 = (base_1 + rank_2) * radix_3
+                    for rank_3, mask_3 in enumerate(red_kings):
+                        if (white | mask_2) & mask_3:
+                            continue
+                        yield base_2 + rank_3, white, mask_2 | mask_3, mask_1 | mask_3
+
+
+def table_path(directory, signature):
+    """
+    Function to get the file name of a signature's table, e.g. '0111.cktb' for
+    no white men, one white king, one red man and one red king.
+    """
+    return os.path.join(directory, "".join(str(count) for count in signature) + ".cktb")
+
+
+class Tablebase:
+    """
+    Read access to the tables of a directory. The files are memory-mapped when they
+    are first needed and read a byte at a time, they are never loaded as a whole.
+    Attributes:
+        directory (str): The directory of the table files.
+        max_pieces (int): The largest number of pieces of the available tables.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY):
+        self.directory = directory
+        # signature -> (index, mmap), or None if the file doesn't exist
+        self.tables = {}
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                stem, extension = os.path.splitext(name)
+                if extension == ".cktb" and len(stem) == 4 and stem.isdigit():
+                    self.max_pieces = max(self.max_pieces, sum(int(count) for count in stem))
+        self.probes = 0
+        self.hits = 0
+
+    def __reduce__(self):
+        # the maps can't be sent to another process, it opens them again
+        return Tablebase, (self.directory,)
+
+    def _table(self, signature):
+        """
+        Function to open the table of a canonical signature.
+        """
+        if signature in self.tables:
+            return self.tables[signature]
+        path = table_path(self.directory, signature)
+        table = None
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, *stored, size = HEADER.unpack_from(data)
+            index = SignatureIndex(signature)
+            if magic != MAGIC or tuple(stored) != signature or size != index.size:
+                data.close()
+                raise ValueError(f"Broken tablebase file: {path}")
+            table = (index, data)
+        self.tables[signature] = table
+        return table
+
+    def probe_value(self, white, black, kings, player_color):
+        """
+        Function to look up the stored byte of a position.
+        Args:
+            white (int): Mask of the white pieces.
+            black (int): Mask of the red pieces.
+            kings (int): Mask of the kings of both colors.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        Returns:
+            int: The stored byte (DRAW or distance + 1), or None if there is no table.
+        """
+        self.probes += 1
+        if not (white if player_color == 'w' else black):
+            # a player without pieces has lost
+            self.hits += 1
+            return 1
+        signature = ((white & ~kings).bit_count(), (white & kings).bit_count(),
+                     (black & ~kings).bit_count(), (black & kings).bit_count())
+        signature, flipped = canonical_signature(signature)
+        table = self._table(signature)
+        if table is None:
+            return None
+        index, data = table
+        if flipped:
+            white, black, kings = flip_mask(black), flip_mask(white), flip_mask(kings)
+            player_color = 'r' if player_color == 'w' else 'w'
+        side = 0 if player_color == 'w' else index.size
+        self.hits += 1
+        return data[HEADER.size + side + index.index(white, black, kings)]
+
+    def probe(self, position, player_color):
+        """
+        Function to look up a position.
+        Args:
+            position (Position): The position, with no piece tagged.
+            player_color (str): The color of the player to move ('w' for white, 'r' for red).
+        Returns:
+            tuple: ('win', 'loss' or 'draw', plies to the end of the game or None for a draw),
+                or None if the position is not in the available tables.
+        """
+        value = self.probe_value(position.white, position.black, position.kings, player_color)
+        if value is None:
+            return None
+        if value == DRAW:
+            return 'draw', None
+        distance = value - 1
+        return ('win' if distance % 2 else 'loss'), distance
+
+    def close(self):
+        """
+        Function to unmap all open tables.
+        """
+        for table in self.tables.values():
+            if table is not None:
+                table[1].close()
+        self.tables = {}
+
+
+def load_tablebase(directory=DEFAULT_DIRECTORY):
+    """
+    Function to open the tables of a directory for the engine.
+    Returns:
+        Tablebase: The tables, or None if the directory has none.
+    """
+    tablebase = Tablebase(directory)
+    return tablebase if tablebase.max_pieces else None
+
+
+def solve_signature(signature, directory):
+    """
+    Function to solve all positions of a signature by retrograde analysis and write its table.
+    Every position is expanded once. Moves that keep the signature become edges of a graph,
+    the others (captures, promotions) are looked up in the tables already solved. Then the
+    results are spread backwards through the graph in order of distance: a position is won
+    in d + 1 plies as soon as one move leads to a position lost in d, and lost as soon as
+    all its moves lead to won positions. Whatever is left is a draw.
+    The table is written to a temporary file first, so an interrupted run leaves no broken table.
+    Args:
+        signature (tuple): The canonical signature.
+        directory (str): The directory of the tables.
+    Returns:
+        dict: The signature and the number of wins, losses and draws.
+    """
+    signature = tuple(signature)
+    index = SignatureIndex(signature)
+    size = index.size
+    nodes = 2 * size
+    lower = Tablebase(directory)
+    colors = ('w', 'r')
+
+    valid = bytearray(nodes)
+    # unresolved moves within the signature, worst (longest) win of the moves outside it,
+    # and whether a move outside it doesn't lead to a won position (then it can't be lost)
+    remaining = array('H', bytes(2 * nodes))
+    outside_win = array('H', bytes(2 * nodes))
+    not_lost = bytearray(nodes)
+    edge_from, edge_to = array('I'), array('I')
+    # buckets[d]: positions that are decided at distance d, the earliest bucket counts
+    buckets = [[]]
+
+    def push(distance, node):
+        if distance > MAX_DISTANCE:
+            raise ValueError(f"Distance over {MAX_DISTANCE} plies in {signature}")
+        while len(buckets) <= distance:
+            buckets.append([])
+        buckets[distance].append(node)
+
+    position = Position(hash=0)
+    for number, white, black, kings in index.positions():
+        for side, player_color in enumerate(colors):
+            node = side * size + number
+            valid[node] = 1
+            opponent = colors[1 - side]
+            # the hash isn't needed here, it is left at zero instead of being computed
+            position.white, position.black, position.kings, position.tagged = white, black, kings, 0
+            position.counts[:] = signature
+            moves = legal_moves(position, player_color)
+            if not moves:
+                push(0, node)
+                continue
+            for move in moves:
+                position.make(move, player_color)
+                if tuple(position.counts) == signature:
+                    edge_from.append(node)
+                    edge_to.append((1 - side) * size + index.index(position.white, position.black, position.kings))
+                    remaining[node] += 1
+                else:
+                    value = lower.probe_value(position.white, position.black, position.kings, opponent)
+                    if value is None:
+                        raise ValueError(f"Table missing for a successor of {signature}")
+                    if value == DRAW:
+                        not_lost[node] = 1
+                    elif (value - 1) % 2:
+                        outside_win[node] = max(outside_win[node], value - 1)
+                    else:
+                        not_lost[node] = 1
+                        push(value, node)
+                position.unmake()
+            if not remaining[node] and not not_lost[node]:
+                push(outside_win[node] + 1, node)
+    lower.close()
+
+    # predecessors of every position, grouped by position (counting sort of the edges)
+    start = array('I', bytes(4 * (nodes + 1)))
+    for child in edge_to:
+        start[child + 1] += 1
+    for node in range(nodes):
+        start[node + 1] += start[node]
+    fill = array('I', start)
+    parents = array('I', bytes(4 * len(edge_to)))
+    for parent, child in zip(edge_from, edge_to):
+        parents[fill[child]] = parent
+        fill[child] += 1
+    del edge_from, edge_to, fill
+
+    result = bytearray(nodes)
+    distance = 0
+    while distance < len(buckets):
+        for node in buckets[distance]:
+            if result[node]:
+                continue
+            result[node] = distance + 1
+            for parent in parents[start[node]:start[node + 1]]:
+                if result[parent]:
+                    continue
+                if distance % 2 == 0:
+                    push(distance + 1, parent)
+                else:
+                    remaining[parent] -= 1
+                    if not remaining[parent] and not not_lost[parent]:
+                        push(max(outside_win[parent], distance) + 1, parent)
+        buckets[distance] = None
+        distance += 1
+
+    os.makedirs(directory, exist_ok=True)
+    path = table_path(directory, signature)
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, *signature, size))
+        f.write(result)
+    os.replace(path + ".tmp", path)
+
+    wins = losses = 0
+    for node, value in enumerate(result):
+        if value:
+            if (value - 1) % 2:
+                wins += 1
+            else:
+                losses += 1
+    positions = sum(valid)
+    return {'signature': signature, 'positions': positions, 'wins': wins, 'losses': losses,
+            'draws': positions - wins - losses}
+
+
+def _solve_task(task):
+    """
+    Function to solve one signature in a worker process and time it.
+    """
+    signature, directory = task
+    started = time.perf_counter()
+    summary = solve_signature(signature, directory)
+    summary['elapsed'] = time.perf_counter() - started
+    return summary
+
+
+def generate(directory=DEFAULT_DIRECTORY, max_pieces=4, workers=None, log=sys.stdout):
+    """
+    Function to build all tables with up to max_pieces pieces.
+    Signatures with the same number of pieces and men don't depend on each other, they
+    are solved in parallel; the groups are solved one after another. Tables that already
+    exist are kept, so an interrupted run goes on where it stopped.
+    Args:
+        directory (str): The directory of the tables.
+        max_pieces (int): The largest number of pieces on the board.
+        workers (int): The number of worker processes, all cores if None.
+        log (file): Where to print the progress, None to print nothing.
+    Returns:
+        list: The summaries of the signatures solved in this run.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(directory, exist_ok=True)
+    summaries = []
+    for _, group in itertools.groupby(signatures(max_pieces), key=lambda s: (sum(s), s[0] + s[2])):
+        todo = [(signature, directory) for signature in group
+                if not os.path.exists(table_path(directory, signature))]
+        if not todo:
+            continue
+        with multiprocessing.Pool(min(workers, len(todo))) as pool:
+            for summary in pool.imap_unordered(_solve_task, todo):
+                summaries.append(summary)
+                if log:
+                    print(f"{''.join(map(str, summary['signature']))}: {summary['positions']} positions, "
+                          f"{summary['wins']} wins, {summary['losses']} losses, {summary['draws']} draws "
+                          f"in {summary['elapsed']:.1f}s", file=log, flush=True)
+    return summaries
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python tablebase.py --pieces 4
+    """
+    parser = argparse.ArgumentParser(description="Build the endgame tablebase by retrograde analysis.")
+    parser.add_argument("--pieces", type=int, default=4, help="largest number of pieces on the board")
+    parser.add_argument("--directory", default=DEFAULT_DIRECTORY, help="directory of the table files")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    summaries = generate(args.directory, args.pieces, args.workers)
+    print(f"{len(summaries)} tables built in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+# conftest.py
+
+import os
+import random
+import sys
+
+import pytest
+
+# the modules of the game are in the folder above, as for main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bitboard import from_board, legal_moves  # noqa: E402
+from board import initialize_board  # noqa: E402
+
+
+@pytest.fixture
+def random_game():
+    """
+    Fixture to play random legal moves from the standard setup.
+    Returns:
+        function: random_game(seed, plies) -> list of the Move tuples played, shorter if
+            the game ended.
+    """
+    def play(seed, plies):
+        rng = random.Random(seed)
+        position, player_color = from_board(initialize_board()), 'w'
+        moves = []
+        for _ in range(plies):
+            possible_moves = legal_moves(position, player_color)
+            if not possible_moves:
+                break
+            move = rng.choice(possible_moves)
+            position.make(move, player_color)
+            moves.append(move)
+            player_color = 'r' if player_color == 'w' else 'w'
+        return moves
+    return play
@@ -0,0 +1,41 @@
+# test_book.py
+
+import pytest
+
+from bitboard import legal_moves, move_to_notation
+from book import HEADER, MAGIC, OpeningBook, collect, find_book_move, move_code, write_book
+from pdn import from_fen
+
+
+def test_captures_with_the_same_squares_get_their_own_codes():
+    # both captures of the king go from c3 to a1, one over b2 only, the other around the board
+    position, player_color = from_fen('W:WKc3:Bc7,e7,b4,b2')
+    moves = legal_moves(position, player_color)
+    assert sorted(move_to_notation(move) for move in moves) == ['c3-a1', 'c3-a5-d8-f6-a1']
+    codes = [move_code(move) for move in moves]
+    assert codes[0] != codes[1]
+    assert [find_book_move(moves, code) for code in codes] == moves
+
+
+def test_book_round_trip(tmp_path, random_game):
+    games = [("White" if seed % 2 else "Draw", [move_to_notation(move) for move in random_game(seed, 12)])
+             for seed in range(4)]
+    # every game is counted twice, so no move falls under min_games
+    path = str(tmp_path / "book.bin")
+    assert write_book(collect(games * 2), path) > 0
+    book = OpeningBook(path)
+    position, player_color = from_fen('W:W21-32:B1-12')
+    played = {move_to_notation(move) for move in legal_moves(position, player_color)}
+    entries = book.entries(position, player_color)
+    assert sum(wins + draws + losses for _, wins, draws, losses in entries) == 8
+    assert {move_to_notation(find_book_move(legal_moves(position, player_color), code))
+            for code, _, _, _ in entries} <= played
+    book.close()
+
+
+def test_old_books_are_refused(tmp_path):
+    path = str(tmp_path / "old.bin")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, 0, 0))
+    with pytest.raises(ValueError, match="version 1"):
+        OpeningBook(path)
@@ -0,0 +1,109 @@
+# test_draws.py
+
+from bitboard import Position, legal_moves, move_to_notation, play
+from draws import (DrawTracker, ENDGAME, ENDGAME_PLIES, KING_MOVE_PLIES, KING_MOVES, LONE_KING, LONE_KING_PLIES,
+                   REPETITION, _endgame_limit)
+from pdn import from_fen, parse_square
+
+
+def play_notation(position, player_color, notation):
+    """
+    Function to play a move given in 'a1-b2' notation.
+    """
+    move = next(move for move in legal_moves(position, player_color) if move_to_notation(move) == notation)
+    return play(position, move, player_color)
+
+
+def walk(tracker, position, player_color, notations):
+    """
+    Function to play moves and update the tracker after every one of them.
+    Returns:
+        list: The reason of the tracker after every move.
+    """
+    reasons = []
+    for notation in notations:
+        position = play_notation(position, player_color, notation)
+        player_color = 'r' if player_color == 'w' else 'w'
+        reasons.append(tracker.update(position, player_color))
+    return reasons
+
+
+def test_threefold_repetition():
+    position, player_color = from_fen('W:WKa1:BKa7')
+    tracker = DrawTracker(position, player_color)
+    reasons = walk(tracker, position, player_color, ['a1-b2', 'a7-b8', 'b2-a1', 'b8-a7'] * 2)
+    # the start position comes back after 4 and after 8 plies
+    assert reasons[:7] == [None] * 7
+    assert reasons[7] == REPETITION
+
+
+def test_man_move_clears_the_history():
+    position, player_color = from_fen('W:WKa1,h2:BKa7')
+    tracker = DrawTracker(position, player_color)
+    walk(tracker, position, player_color, ['a1-b2', 'a7-b8', 'b2-a1', 'b8-a7'])
+    assert tracker.king_plies == 4
+    position = play_notation(position, 'w', 'h2-g3')
+    tracker.update(position, 'r')
+    assert tracker.king_plies == 0
+    assert len(tracker.seen) == 1
+
+
+def king_position(white_square, red_square):
+    """
+    Function to make a position with one king of each color.
+    """
+    white, black = 1 << parse_square(white_square), 1 << parse_square(red_square)
+    return Position(white, black, white | black)
+
+
+def test_king_moves_without_captures():
+    # the tracker only keeps books, the kings may jump around: both of them go through
+    # eight squares, so no position comes back before the limit
+    white_squares = ['a1', 'c1', 'e1', 'g1', 'b2', 'd2', 'f2', 'h2']
+    red_squares = ['b8', 'd8', 'f8', 'h8', 'a7', 'c7', 'e7', 'g7']
+    tracker = DrawTracker(king_position(white_squares[0], red_squares[0]), 'w')
+    reasons = []
+    for ply in range(1, KING_MOVE_PLIES + 1):
+        position = king_position(white_squares[(ply + 1) // 2 % 8], red_squares[ply // 2 % 8])
+        reasons.append(tracker.update(position, 'r' if ply % 2 else 'w'))
+    assert reasons[:-1] == [None] * (KING_MOVE_PLIES - 1)
+    assert reasons[-1] == KING_MOVES
+
+
+def test_endgame_without_progress():
+    # men of both sides step forward, so positions never repeat and the king counter
+    # restarts, but nothing is captured or promoted
+    position, player_color = from_fen('W:WKh2,c1,e1:BKa7,d8,f8')
+    tracker = DrawTracker(position, player_color)
+    assert _endgame_limit(position.counts) == (ENDGAME_PLIES[6], ENDGAME)
+    moves = ['c1-b2', 'f8-g7', 'b2-a3', 'g7-h6', 'e1-d2', 'd8-e7', 'd2-c3', 'e7-f6']
+    reasons = walk(tracker, position, player_color, moves)
+    assert reasons == [None] * len(moves)
+    assert tracker.material_plies == len(moves)
+    assert tracker.king_plies == 0
+
+
+def test_endgame_limits():
+    # white men, white kings, red men, red kings
+    assert _endgame_limit([0, 3, 0, 1]) == (LONE_KING_PLIES, LONE_KING)
+    assert _endgame_limit([0, 1, 0, 3]) == (LONE_KING_PLIES, LONE_KING)
+    assert _endgame_limit([1, 1, 1, 1]) == (ENDGAME_PLIES[4], ENDGAME)
+    assert _endgame_limit([4, 1, 1, 1]) == (ENDGAME_PLIES[7], ENDGAME)
+    # kings on one side only, or too many pieces: no limit
+    assert _endgame_limit([2, 0, 1, 1]) is None
+    assert _endgame_limit([5, 1, 1, 1]) is None
+
+
+def test_endgame_draw_after_the_limit():
+    position, player_color = from_fen('W:WKa1,c1:BKh8,f8')
+    tracker = DrawTracker(position, player_color)
+    tracker.material_plies = ENDGAME_PLIES[4] - 1
+    assert tracker.update(play_notation(position, 'w', 'c1-d2'), 'r') == ENDGAME
+
+
+def test_capture_resets_the_endgame_counter():
+    position, player_color = from_fen('W:WKa1,c3:BKh8,d4')
+    tracker = DrawTracker(position, player_color)
+    tracker.material_plies = ENDGAME_PLIES[4] - 1
+    assert tracker.update(play_notation(position, 'w', 'c3-e5'), 'r') is None
+    assert tracker.material_plies == 0
@@ -0,0 +1,85 @@
+# test_encoding.py
+
+import pytest
+
+from bitboard import Position, legal_moves, move_to_notation
+from encoding import (GAMES_HEADER, GameWriter, PositionWriter, decode_moves, encode_moves, iter_games, iter_positions,
+                      pack_position, unpack_position)
+from pdn import from_fen, parse_square
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_moves_round_trip(random_game, seed):
+    moves = random_game(seed, 120)
+    codes = encode_moves(moves)
+    assert [move for _, _, move in decode_moves(codes)] == moves
+    # the 'a3-b4-d6' notation gives the same codes
+    assert encode_moves([move_to_notation(move) for move in moves]) == codes
+
+
+def test_moves_round_trip_from_a_position():
+    position, player_color = from_fen('B:WKa1,c3,e3:Bb8,Kh8')
+    moves = []
+    for _ in range(6):
+        move = legal_moves(position, player_color)[-1]
+        moves.append(move)
+        position.make(move, player_color)
+        player_color = 'r' if player_color == 'w' else 'w'
+    start, first_color = from_fen('B:WKa1,c3,e3:Bb8,Kh8')
+    codes = encode_moves(moves, start, first_color)
+    assert [move for _, _, move in decode_moves(codes, start, first_color)] == moves
+    # the starting position is copied, not changed
+    assert start == from_fen('B:WKa1,c3,e3:Bb8,Kh8')[0]
+
+
+def test_moves_are_stored_by_their_squares():
+    # the codes don't depend on the order of the generated moves: a quiet move is the
+    # number of captured pieces and its start and end square, a capture adds the captured squares
+    position, player_color = from_fen('W:WKa1:Bc3,e3,h8')
+    move = legal_moves(position, player_color)[0]
+    squares = [parse_square(name) for name in move_to_notation(move).split('-')]
+    assert encode_moves([move], position, player_color) == bytes([2, *squares, parse_square('c3'), parse_square('e3')])
+    assert encode_moves(['c3-d4']) == bytes([0, parse_square('c3'), parse_square('d4')])
+
+
+def test_broken_codes():
+    with pytest.raises(ValueError, match="Broken game record"):
+        list(decode_moves(bytes([0, 200])))
+    with pytest.raises(ValueError, match="Broken game record"):
+        list(decode_moves(bytes([0, 21, 40])))
+    # c3-e5 is a capture of nothing
+    with pytest.raises(ValueError, match="Broken game record: illegal move c3-e5"):
+        list(decode_moves(bytes([0, parse_square('c3'), parse_square('e5')])))
+    with pytest.raises(ValueError, match="Illegal move"):
+        encode_moves(['a3-a4'])
+
+
+def test_position_round_trip():
+    position, player_color = from_fen('B:WKa1,c3,e3:Bb8,Kh8')
+    record = pack_position(position, player_color, result=-1, ply=57)
+    assert len(record) == 16
+    assert unpack_position(record) == (position, player_color, -1, 57)
+
+
+def test_files_round_trip(tmp_path, random_game):
+    games = [(1, random_game(1, 50)), (0, random_game(2, 90)), (-1, random_game(3, 10))]
+    with PositionWriter(str(tmp_path / "positions.ckps")) as positions, \
+            GameWriter(str(tmp_path / "games.ckgm")) as game_file:
+        for result, moves in games:
+            codes = encode_moves(moves)
+            positions.write_game(result, codes)
+            game_file.write(result, codes)
+    assert [(result, [move for _, _, move in decode_moves(codes)])
+            for result, codes in iter_games(str(tmp_path / "games.ckgm"))] == games
+    stored = list(iter_positions(str(tmp_path / "positions.ckps")))
+    assert len(stored) == sum(len(moves) for _, moves in games)
+    assert all(isinstance(position, Position) for position, _, _, _ in stored)
+
+
+def test_old_game_files_are_refused(tmp_path):
+    # version 1 game files numbered the moves in the generated move lists
+    path = str(tmp_path / "old.ckgm")
+    with open(path, "wb") as f:
+        f.write(GAMES_HEADER.pack(b"CKGM", 1, 0))
+    with pytest.raises(ValueError, match="Not a version 2 CKGM file"):
+        list(iter_games(path))
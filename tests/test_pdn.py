@@ -0,0 +1,69 @@
+# test_pdn.py
+
+import io
+
+import pytest
+
+from bitboard import Position, from_board, move_to_notation
+from board import initialize_board
+from pdn import PdnError, format_game, from_fen, game_from_history, parse_square, read_games, replay, to_fen
+
+
+def history_of(moves):
+    """
+    Function to split moves into the move history kept by game.play_game.
+    """
+    notations = [move_to_notation(move) for move in moves]
+    return {"White": notations[0::2], "Black": notations[1::2]}
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_game_round_trip(random_game, seed):
+    moves = random_game(seed, 80)
+    game = game_from_history(history_of(moves), "White player", "Black \"player\"", winner="Draw")
+    games = list(read_games(io.StringIO(format_game(game))))
+    assert len(games) == 1
+    assert games[0].tags == game.tags
+    assert games[0].moves == game.moves
+    assert games[0].result == '1/2-1/2'
+    assert [move for _, _, move in replay(games[0])] == moves
+
+
+def test_several_games_in_one_file(random_game):
+    games = [game_from_history(history_of(random_game(seed, 20)), "A", "B", winner=winner)
+             for seed, winner in enumerate(("White", "Black", None))]
+    text = "".join(format_game(game) for game in games)
+    assert [(game.moves, game.result) for game in read_games(io.StringIO(text))] == \
+           [(game.moves, game.result) for game in games]
+
+
+def test_fen_round_trip(random_game):
+    position, player_color = from_board(initialize_board()), 'w'
+    for move in random_game(7, 60):
+        position.make(move, player_color)
+        player_color = 'r' if player_color == 'w' else 'w'
+        assert from_fen(to_fen(position, player_color)) == (position, player_color)
+
+
+def test_numeric_notation():
+    assert parse_square('1') == parse_square('b8')
+    assert parse_square('32') == parse_square('g1')
+    position, player_color = from_fen('W:W21-32:B1-12')
+    assert (position.white, position.black, player_color) == (0xFFF00000, 0x00000FFF, 'w')
+    game = next(read_games(io.StringIO('[FEN "B:WK29:B1"]\n1... 1-6 29-25 *\n')))
+    assert [move_to_notation(move) for _, _, move in replay(game)] == ['b8-c7', 'a1-b2']
+
+
+def test_illegal_move_is_reported():
+    game = next(read_games(io.StringIO('1. c3-d4 f6-e5 2. d4-c5 *\n')))
+    with pytest.raises(PdnError, match="Move 2"):
+        list(replay(game))
+
+
+def test_invalid_fen():
+    with pytest.raises(PdnError):
+        from_fen('W:Wa1,a1:Bb8')
+    with pytest.raises(PdnError):
+        from_fen('X:Wa1:Bb8')
+    assert from_fen('B:WKd4:Bh8') == (Position(1 << parse_square('d4'), 1 << parse_square('h8'),
+                                               1 << parse_square('d4')), 'r')
@@ -0,0 +1,56 @@
+# test_perft.py
+
+import pytest
+
+import gridscan
+from bitboard import SQUARE_TO_RC, capture_steps, legal_moves, legal_steps, move_to_notation, to_board
+from pdn import from_fen, parse_square
+from perft import PERFT_POSITIONS, divide, generation_benchmark, load_position, perft, sample_positions
+
+
+@pytest.mark.parametrize('name', sorted(PERFT_POSITIONS))
+@pytest.mark.parametrize('depth', [1, 2, 3, 4])
+def test_perft_counts(name, depth):
+    position, player_color = load_position(name)
+    assert perft(position, player_color, depth) == PERFT_POSITIONS[name]['nodes'][depth]
+
+
+def test_perft_leaves_the_position_unchanged():
+    position, player_color = load_position('king_landings')
+    before = position.copy()
+    perft(position, player_color, 4)
+    assert position == before
+    assert position.hash == before.hash
+    assert position.counts == before.counts
+
+
+def test_divide_adds_up_to_perft():
+    position, player_color = load_position('multi_jump')
+    assert sum(nodes for _, nodes in divide(position, player_color, 4)) == PERFT_POSITIONS['multi_jump']['nodes'][4]
+
+
+def test_king_lands_where_it_can_go_on_capturing():
+    # behind c3 the king could stop on d4, e5, f6 or g7, but only from d4 it captures e3
+    position, player_color = from_fen('W:WKa1:Bc3,e3,h8')
+    assert sorted(move_to_notation(move) for move in legal_moves(position, player_color)) == ['a1-d4-f2', 'a1-d4-g1']
+    assert capture_steps(position, player_color) == [(parse_square('a1'), parse_square('d4'))]
+    # without a second capture every landing square is allowed
+    position, player_color = from_fen('W:WKa1:Bc3,h8')
+    assert sorted(move_to_notation(move) for move in legal_moves(position, player_color)) == \
+        ['a1-d4', 'a1-e5', 'a1-f6', 'a1-g7']
+
+
+def test_generation_benchmark_compares_the_same_steps():
+    # without kings the grid scan and the bitboards find the same steps (the kings of the
+    # grid scan still stop anywhere behind a captured piece)
+    positions = sample_positions(games=10)
+    for position, player_color in positions:
+        if position.kings:
+            continue
+        board = to_board(position)
+        grid_steps = gridscan.mandatory_capture(board, player_color) or gridscan.non_capture_moves(board, player_color)
+        steps = [(SQUARE_TO_RC[start], SQUARE_TO_RC[end]) for start, end in legal_steps(position, player_color)]
+        assert sorted(steps) == sorted(grid_steps), (position, player_color)
+    result = generation_benchmark(positions[:50], repeat=1)
+    assert result['positions'] == 50
+    assert result['speedup'] > 1
@@ -0,0 +1,41 @@
+# test_rules.py
+
+from bitboard import to_board
+from board import Board
+from movecache import MOVE_CACHE
+from pdn import from_fen
+from rules import apply_capture, is_legal, legal_moves, mandatory_capture, non_capture_moves
+
+
+def test_adapters_share_the_move_cache():
+    position, player_color = from_fen('W:Wc3,e1,Kh2:Bd4,b8')
+    board = Board(to_board(position))
+    MOVE_CACHE.clear()
+    captures = mandatory_capture(board, player_color)
+    assert captures == [((5, 2), (3, 4))]
+    # a plain list board with the same pieces finds the same list
+    assert mandatory_capture([list(row) for row in board], player_color) == captures
+    assert MOVE_CACHE.stats()['hits'] == 1
+    # the lists are copies, changing them leaves the cached ones alone
+    captures.clear()
+    assert mandatory_capture(board, player_color) == [((5, 2), (3, 4))]
+    assert MOVE_CACHE.stats()['hits'] == 2
+    # a changed board gets another key
+    board[4][3] = '.'
+    assert mandatory_capture(board, player_color) == []
+    assert sorted(non_capture_moves(board, player_color))[:2] == [((5, 2), (4, 1)), ((5, 2), (4, 3))]
+    assert len(legal_moves(board, player_color)) == len(non_capture_moves(board, player_color))
+    assert MOVE_CACHE.stats()['misses'] == 4
+
+
+def test_is_legal_steps():
+    # white has to capture: c3 over d4, then on over f6 from e5; a1 may capture as well
+    position, player_color = from_fen('W:Wa1,c3:Bd4,f6,b2')
+    board = Board(to_board(position))
+    assert is_legal(board, 'w', (5, 2), (3, 4))
+    assert not is_legal(board, 'w', (5, 2), (4, 1))
+    apply_capture(board, (5, 2), (3, 4), 'w')
+    # only the capturing piece goes on
+    assert is_legal(board, 'w', (3, 4), (1, 6), specific_piece=(3, 4))
+    assert not is_legal(board, 'w', (7, 0), (5, 2), specific_piece=(3, 4))
+    assert is_legal(board, 'w', (7, 0), (5, 2))
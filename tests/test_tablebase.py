@@ -0,0 +1,88 @@
+# test_tablebase.py
+
+import pytest
+
+from bitboard import Position, legal_moves, play
+from engine import AlphaBetaEngine, WIN_BOUND
+from pdn import from_fen
+from tablebase import DRAW, SignatureIndex, Tablebase, flip_mask, generate, signatures
+
+
+@pytest.fixture(scope="module")
+def tablebase(tmp_path_factory):
+    """
+    Fixture with the tables of all positions with two pieces, built for the tests
+    (well under a second).
+    """
+    directory = str(tmp_path_factory.mktemp("tablebases"))
+    generate(directory, max_pieces=2, workers=1, log=None)
+    tablebase = Tablebase(directory)
+    yield tablebase
+    tablebase.close()
+
+
+def expected_value(tablebase, position, player_color):
+    """
+    Function to get the value of a position from the stored values of its moves,
+    as the retrograde analysis defines it.
+    """
+    moves = legal_moves(position, player_color)
+    if not moves:
+        return 1
+    opponent = 'r' if player_color == 'w' else 'w'
+    distances = []
+    for move in moves:
+        child = play(position, move, player_color)
+        value = tablebase.probe_value(child.white, child.black, child.kings, opponent)
+        distances.append(None if value == DRAW else value - 1)
+    # a move to a lost position wins, as fast as possible
+    losses = [distance for distance in distances if distance is not None and distance % 2 == 0]
+    if losses:
+        return min(losses) + 2
+    if None in distances:
+        return DRAW
+    # every move leads to a won position: lost, as slowly as possible
+    return max(distances) + 2
+
+
+def test_two_piece_tables(tablebase):
+    assert tablebase.max_pieces == 2
+    assert signatures(2) == [(0, 1, 0, 1), (0, 1, 1, 0), (1, 0, 1, 0)]
+
+
+@pytest.mark.parametrize('signature', [(0, 1, 0, 1), (0, 1, 1, 0), (1, 0, 1, 0)])
+def test_values_agree_with_the_moves(tablebase, signature):
+    for _, white, black, kings in SignatureIndex(signature).positions():
+        position = Position(white, black, kings)
+        for player_color in ('w', 'r'):
+            value = tablebase.probe_value(white, black, kings, player_color)
+            assert value == expected_value(tablebase, position, player_color), (position, player_color)
+
+
+def test_flipped_colors(tablebase):
+    # red positions of the stored white signatures are read with the board turned around
+    for _, white, black, kings in SignatureIndex((0, 1, 1, 0)).positions():
+        for player_color, other in (('w', 'r'), ('r', 'w')):
+            assert (tablebase.probe_value(white, black, kings, player_color)
+                    == tablebase.probe_value(flip_mask(black), flip_mask(white), flip_mask(kings), other))
+
+
+def test_probes(tablebase):
+    # the king captures the man at once
+    position, player_color = from_fen('W:WKa1:Bc3')
+    assert tablebase.probe(position, player_color) == ('win', 1)
+    # the side to move has no pieces left
+    position, player_color = from_fen('B:WKa1:B')
+    assert tablebase.probe(position, player_color) == ('loss', 0)
+    # a lone king against a lone king far away can't be won
+    position, player_color = from_fen('W:WKa1:BKh2')
+    assert tablebase.probe(position, player_color) == ('draw', None)
+    # no table for three pieces
+    position, player_color = from_fen('W:WKa1,c1:BKh2')
+    assert tablebase.probe(position, player_color) is None
+
+
+def test_engine_uses_the_tables(tablebase):
+    position, player_color = from_fen('W:WKa1:Bc3')
+    result = AlphaBetaEngine(max_depth=4, time_ms=None, tablebase=tablebase).search(position, player_color)
+    assert result.score >= WIN_BOUND
@@ -0,0 +1,237 @@
+# transposition.py
+
+from array import array
+from multiprocessing import shared_memory
+
+# Bound types of a stored score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Every entry takes two 64-bit words: the position key and the packed data.
+# The key word holds key XOR data, so an entry torn by two processes writing it at the
+# same time (see smp.py) doesn't match any key and is never read back.
+ENTRY_BYTES = 16
+# Entries per bucket: slot 0 keeps the deepest search, slot 1 is always replaced
+BUCKET_SIZE = 2
+
+# Layout of the data word:
+#     bit 0        entry is used
+#     bits 1-2     bound type
+#     bits 3-10    depth (0..255)
+#     bits 11-21   best move as start * 32 + end + 1 (0 = no move)
+#     bits 22-53   score + 2**31
+SCORE_OFFSET = 1 << 31
+NO_MOVE = 0
+
+
+def encode_move(move):
+    """
+    Function to pack the start and end square of a move into the table's move field.
+    Args:
+        move (Move): The move to pack, or None.
+    Returns:
+        int: The move code, NO_MOVE for None.
+    """
+    if move is None:
+        return NO_MOVE
+    return move.path[0] * 32 + move.path[-1] + 1
+
+
+def find_move(moves, code):
+    """
+    Function to find the move with a stored move code in a list of legal moves.
+    Args:
+        moves (list): The legal moves of the position.
+        code (int): The move code from the table.
+    Returns:
+        Move: The first move with the same start and end square, or None.
+    """
+    if code == NO_MOVE:
+        return None
+    for move in moves:
+        if move.path[0] * 32 + move.path[-1] + 1 == code:
+            return move
+    return None
+
+
+def pack(depth, bound, score, move_code):
+    """
+    Function to pack an entry into the data word.
+    """
+    return 1 | bound << 1 | min(max(depth, 0), 255) << 3 | move_code << 11 | (score + SCORE_OFFSET) << 22
+
+
+def unpack(data):
+    """
+    Function to unpack the data word.
+    Returns:
+        tuple: (depth, bound, score, move code)
+    """
+    return (data >> 3 & 0xFF, data >> 1 & 0x3, (data >> 22 & 0xFFFFFFFF) - SCORE_OFFSET, data >> 11 & 0x7FF)
+
+
+class TranspositionTable:
+    """
+    A fixed-size hash table of searched positions. The table is split into buckets of
+    two entries: the first one is replaced only by a search at least as deep (depth-preferred),
+    the second one by every new entry that doesn't go into the first (always-replace).
+    Attributes:
+        memory_mb (float): The memory cap of the table in megabytes.
+        bucket_count (int): The number of buckets, a power of two.
+    """
+
+    def __init__(self, memory_mb=16):
+        self.memory_mb = memory_mb
+        buckets = max(1, int(memory_mb * 1024 * 1024) // (ENTRY_BYTES * BUCKET_SIZE))
+        # round down to a power of two so the bucket index is a simple mask
+        self.bucket_count = 1 << (buckets.bit_length() - 1)
+        self.mask = self.bucket_count - 1
+        self.size = self.bucket_count * BUCKET_SIZE
+        self._allocate()
+        self.reset_stats()
+        self.used = 0
+
+    def _allocate(self):
+        """
+        Function to create the empty key and data words.
+        """
+        self.keys = array('Q', bytes(8 * self.size))
+        self.data = array('Q', bytes(8 * self.size))
+
+    def reset_stats(self):
+        """
+        Function to reset the probe and store counters.
+        """
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def clear(self):
+        """
+        Function to empty the table.
+        """
+        self._allocate()
+        self.used = 0
+        self.reset_stats()
+
+    def probe(self, key):
+        """
+        Function to look up a position.
+        Args:
+            key (int): The 64-bit hash of the position including the side to move.
+        Returns:
+            tuple: (depth, bound, score, move code) of the stored entry, or None.
+        """
+        self.probes += 1
+        index = (key & self.mask) * BUCKET_SIZE
+        keys, data = self.keys, self.data
+        # read every data word once, the check and the result must use the same value
+        word = data[index]
+        if word and keys[index] ^ word == key:
+            self.hits += 1
+            return unpack(word)
+        word = data[index + 1]
+        if word and keys[index + 1] ^ word == key:
+            self.hits += 1
+            return unpack(word)
+        return None
+
+    def store(self, key, depth, bound, score, move_code):
+        """
+        Function to store the result of a search.
+        Args:
+            key (int): The 64-bit hash of the position including the side to move.
+            depth (int): The depth the position was searched to.
+            bound (int): EXACT, LOWER or UPPER.
+            score (int): The score of the position.
+            move_code (int): The best move from encode_move.
+        """
+        self.stores += 1
+        index = (key & self.mask) * BUCKET_SIZE
+        keys, data = self.keys, self.data
+        # the depth-preferred slot takes the entry if it is empty, holds the same
+        # position or was searched less deep, otherwise the always-replace slot does
+        word = data[index]
+        if not word or keys[index] ^ word == key or depth >= (word >> 3 & 0xFF):
+            slot = index
+        else:
+            slot = index + 1
+            word = data[slot]
+        same = word and keys[slot] ^ word == key
+        if not word:
+            self.used += 1
+        elif not same:
+            self.replacements += 1
+        # keep the old best move if the new search didn't find one
+        if move_code == NO_MOVE and same:
+            move_code = word >> 11 & 0x7FF
+        word = pack(depth, bound, score, move_code)
+        data[slot] = word
+        keys[slot] = key ^ word
+
+    def stats(self):
+        """
+        Function to get the usage statistics of the table.
+        Returns:
+            dict: Capacity, memory, fill and hit rate figures.
+        """
+        capacity = self.size
+        return {
+            'capacity': capacity,
+            'memory_bytes': capacity * ENTRY_BYTES,
+            'used': self.used,
+            'fill': self.used / capacity,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'stores': self.stores,
+            'replacements': self.replacements,
+        }
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    A transposition table held in shared memory, so the search processes of smp.py
+    read and write the same entries. There are no locks: every entry is checked with
+    its key XOR data word, a half-written entry is simply a miss.
+    The probe and store counters, and used, count the calls of this process only.
+    Attributes:
+        name (str): The name of the shared memory block, to attach other processes with.
+        owner (bool): True in the process that created the block and removes it on close.
+    """
+
+    def __init__(self, memory_mb=16, name=None):
+        self.name = name
+        self.owner = name is None
+        self.shm = None
+        super().__init__(memory_mb)
+
+    def _allocate(self):
+        if self.shm is None:
+            if self.owner:
+                self.shm = shared_memory.SharedMemory(create=True, size=8 * 2 * self.size)
+                self.name = self.shm.name
+            else:
+                self.shm = shared_memory.SharedMemory(name=self.name)
+            self.words = self.shm.buf.cast('Q')
+            self.keys = self.words[:self.size]
+            self.data = self.words[self.size:2 * self.size]
+        elif self.owner:
+            # a new block would not be seen by the other processes, the old one is emptied
+            self.shm.buf[:8 * 2 * self.size] = bytes(8 * 2 * self.size)
+
+    def close(self):
+        """
+        Function to detach from the shared memory, the creator also removes it.
+        """
+        if self.shm is None:
+            return
+        # the views must be released before the block can be closed
+        self.keys.release()
+        self.data.release()
+        self.words.release()
+        self.keys = self.data = self.words = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
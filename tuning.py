@@ -0,0 +1,221 @@
+# tuning.py
+
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from batcheval import FEATURES, features, weight_vector
+from encoding import convert, load_positions
+from evaluation import DEFAULT_WEIGHTS, WEIGHTS, WEIGHTS_FILE
+
+# Positions read and used for one gradient step at a time, the memory stays the same
+# whatever the size of the data
+CHUNK_SIZE = 65536
+# Positions used to fit the scale of the win probability
+SCALE_SAMPLE = 1000000
+# Weights kept as they are: the man is the unit of the scores, and a mobility weight
+# other than 0 makes evaluate() generate the quiet moves of both sides at every leaf,
+# which slows the search of every level down (tuning.py --tune-mobility tunes it anyway)
+FIXED = ('man', 'mobility')
+
+
+def iter_chunks(paths, chunk_size=CHUNK_SIZE, min_ply=8, rng=None, limit=None):
+    """
+    Function to read labelled positions from position files in chunks.
+    Args:
+        paths (list): Position files (encoding.py --positions).
+        chunk_size (int): The number of records read at a time.
+        min_ply (int): Positions from earlier plies are left out, the result of the game
+            says little about them.
+        rng (numpy.random.Generator): To read the chunks in random order, in file order if None.
+        limit (int): The number of positions to read at most.
+    Yields:
+        tuple: (feature matrix as float64, results as 1 for a White win, 0.5 for a draw, 0 for a loss)
+    """
+    parts = []
+    for path in paths:
+        positions = load_positions(path)
+        parts.extend((positions, start) for start in range(0, len(positions), chunk_size))
+    if rng is not None:
+        rng.shuffle(parts)
+    for positions, start in parts:
+        chunk = positions[start:start + chunk_size]
+        chunk = chunk[chunk['ply'] >= min_ply]
+        if limit is not None:
+            chunk = chunk[:limit]
+            limit -= len(chunk)
+        if len(chunk):
+            yield features(chunk).astype(np.float64), (chunk['result'].astype(np.float64) + 1) / 2
+        if limit is not None and limit <= 0:
+            return
+
+
+def sigmoid(values):
+    """
+    Function to turn scores into win probabilities.
+    """
+    return 1 / (1 + np.exp(-values))
+
+
+def mean_error(chunks, vector, scale):
+    """
+    Function to compute the mean squared error of the predicted results.
+    Args:
+        chunks (iterable): (features, results) chunks from iter_chunks.
+        vector (ndarray): The weights in the order of batcheval.FEATURES.
+        scale (float): The factor that turns a score into the argument of the sigmoid.
+    Returns:
+        float: The mean error over all positions.
+    """
+    total, count = 0.0, 0
+    for matrix, results in chunks:
+        total += float(np.sum((sigmoid(scale * (matrix @ vector)) - results) ** 2))
+        count += len(results)
+    return total / count if count else 0.0
+
+
+def fit_scale(chunks, vector):
+    """
+    Function to find the scale of the sigmoid that predicts the results best with the
+    given weights, by a golden-section search over its logarithm.
+    Args:
+        chunks (list): A sample of (features, results) chunks, kept in memory.
+        vector (ndarray): The weights in the order of batcheval.FEATURES.
+    Returns:
+        float: The scale.
+    """
+    low, high = math.log(1e-4), math.log(1.0)
+    ratio = (math.sqrt(5) - 1) / 2
+    a, b = high - ratio * (high - low), low + ratio * (high - low)
+    error_a, error_b = mean_error(chunks, vector, math.exp(a)), mean_error(chunks, vector, math.exp(b))
+    for _ in range(40):
+        if error_a < error_b:
+            high, b, error_b = b, a, error_a
+            a = high - ratio * (high - low)
+            error_a = mean_error(chunks, vector, math.exp(a))
+        else:
+            low, a, error_a = a, b, error_b
+            b = low + ratio * (high - low)
+            error_b = mean_error(chunks, vector, math.exp(b))
+    return math.exp((low + high) / 2)
+
+
+def tune(paths, weights=WEIGHTS, epochs=10, learning_rate=1.0, chunk_size=CHUNK_SIZE, min_ply=8, seed=0,
+         fixed=FIXED, log=sys.stdout):
+    """
+    Function to tune the evaluation weights on labelled positions (Texel's method): the
+    scores are turned into win probabilities and the squared error against the game
+    results is minimised with Adam, one step per chunk of positions.
+    Args:
+        paths (list): Position files (encoding.py --positions).
+        weights (dict): The weights to start from.
+        epochs (int): The number of passes over the data.
+        learning_rate (float): The largest change of a weight per step, in score units.
+        chunk_size (int): The number of positions per step.
+        min_ply (int): Positions from earlier plies are left out.
+        seed (int): The seed of the chunk order.
+        fixed (tuple): The features whose weights stay as they are.
+        log (file): Where the progress is written, None for no output.
+    Returns:
+        tuple: (tuned weights dict, scale of the sigmoid, mean error before, mean error after)
+    """
+    vector = weight_vector(weights)
+    free = np.array([name not in fixed for name in FEATURES])
+    sample = list(iter_chunks(paths, chunk_size, min_ply, limit=SCALE_SAMPLE))
+    if not sample:
+        raise ValueError("No positions to tune on")
+    scale = fit_scale(sample, vector)
+    error_before = mean_error(sample, vector, scale)
+    if log:
+        print(f"scale {scale:.5f}, error {error_before:.6f} on {sum(len(r) for _, r in sample)} positions", file=log)
+
+    rng = np.random.default_rng(seed)
+    # Adam keeps a running mean of the gradient and of its square for every weight
+    mean, square = np.zeros_like(vector), np.zeros_like(vector)
+    beta1, beta2, epsilon = 0.9, 0.999, 1e-12
+    step = 0
+    for epoch in range(1, epochs + 1):
+        for matrix, results in iter_chunks(paths, chunk_size, min_ply, rng):
+            predicted = sigmoid(scale * (matrix @ vector))
+            gradient = matrix.T @ (2 * (predicted - results) * predicted * (1 - predicted) * scale) / len(results)
+            gradient[~free] = 0
+            step += 1
+            mean = beta1 * mean + (1 - beta1) * gradient
+            square = beta2 * square + (1 - beta2) * gradient ** 2
+            vector -= learning_rate * (mean / (1 - beta1 ** step)) / (np.sqrt(square / (1 - beta2 ** step)) + epsilon)
+        if log:
+            print(f"epoch {epoch}: error {mean_error(sample, vector, scale):.6f}  "
+                  + "  ".join(f"{name} {value:.1f}" for name, value in zip(FEATURES, vector)), file=log)
+
+    tuned = dict(weights)
+    tuned.update({name: int(round(value)) for name, value in zip(FEATURES, vector)})
+    return tuned, scale, error_before, mean_error(sample, weight_vector(tuned), scale)
+
+
+def write_weights(weights, path=WEIGHTS_FILE):
+    """
+    Function to write the weights as the JSON file that evaluation.py loads.
+    """
+    with open(path + ".tmp", "w") as f:
+        json.dump({name: weights[name] for name in FEATURES}, f, indent=4)
+        f.write("\n")
+    os.replace(path + ".tmp", path)
+
+
+def main(argv=None):
+    """
+    Command line interface, e.g.:
+        python tuning.py --positions positions.ckps
+        python tuning.py --games results.jsonl --epochs 20 --output weights.json
+    """
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights on the results of played games.")
+    parser.add_argument("--positions", action="append", default=[], help="position file (encoding.py --positions)")
+    parser.add_argument("--games", action="append", default=[], help="JSON lines file of games with moves (match.py --moves)")
+    parser.add_argument("--pdn", action="append", default=[], help="PDN file of games")
+    parser.add_argument("--epochs", type=int, default=10, help="passes over the positions")
+    parser.add_argument("--learning-rate", type=float, default=1.0, help="largest weight change per step")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="positions per step")
+    parser.add_argument("--min-ply", type=int, default=8, help="leave out the positions of the first plies")
+    parser.add_argument("--defaults", action="store_true", help="start from the built-in weights, not the current file")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the chunk order")
+    parser.add_argument("--tune-mobility", action="store_true",
+                        help="tune the mobility weight too; a weight other than 0 costs search speed, "
+                             "evaluate() then generates the moves of both sides at every leaf")
+    parser.add_argument("--output", default=WEIGHTS_FILE, help="weights file the engine loads")
+    parser.add_argument("--dry-run", action="store_true", help="print the tuned weights without writing them")
+    args = parser.parse_args(argv)
+
+    if not (args.positions or args.games or args.pdn):
+        parser.error("no positions, give --positions, --games or --pdn")
+    with tempfile.TemporaryDirectory() as directory:
+        paths = list(args.positions)
+        if args.games or args.pdn:
+            # imported here, they are only needed to read the game records
+            from book import read_records
+            from pdn import game_records
+            sources = [read_records(path) for path in args.games] + [game_records(path) for path in args.pdn]
+            path = os.path.join(directory, "positions.ckps")
+            games, positions = convert(itertools.chain.from_iterable(sources), positions_path=path)
+            print(f"{games} games, {positions} positions")
+            paths.append(path)
+        fixed = tuple(name for name in FIXED if not (args.tune_mobility and name == 'mobility'))
+        weights, _, before, after = tune(paths, DEFAULT_WEIGHTS if args.defaults else WEIGHTS, args.epochs,
+                                         args.learning_rate, args.chunk, args.min_ply, args.seed, fixed)
+    print(f"error {before:.6f} -> {after:.6f}")
+    print(json.dumps(weights))
+    if weights.get('mobility'):
+        print("mobility weight is not 0: the engine generates the moves of both sides at every leaf and searches slower")
+    if not args.dry_run:
+        write_weights(weights, args.output)
+        print(f"weights written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
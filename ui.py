@@ -48,11 +48,24 @@ def display_winner(player_name, player_color):
     """
     print(f"{player_name} ({player_color}) is the winner. Congratulations!")
 
-# def display_draw_message():
-#     """
-#     Function to display a message when the game is a draw.
-#     """
-#     print("The game is a draw. Well played, both players!")
+def display_draw_message(reason=None):
+    """
+    Function to display a message when the game is a draw.
+    Args:
+        reason (str): The draw rule that ended the game, if any.
+    """
+    if reason:
+        print(f"\nDraw by {reason}.")
+    print("The game is a draw. Well played, both players!")
+
+def display_game_saved_message(pdn_file):
+    """
+    Function to display where the finished game was saved.
+    Args:
+        pdn_file (str): The PDN file the game was added to.
+    """
+    print(f"The game was saved to {pdn_file}.")
+
 def display_game_over_message():
     """
     Function to display a game over message.
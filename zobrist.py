@@ -0,0 +1,54 @@
+# zobrist.py
+
+import random
+
+# Zobrist keys: one random 64-bit number per piece kind and square. The hash of a position
+# is the XOR of the keys of all its pieces, so a move only has to XOR the keys of the
+# squares it changes. The generator is seeded, every process gets the same keys.
+_rng = random.Random(20240601)
+
+WHITE_MAN, WHITE_KING, RED_MAN, RED_KING = 0, 1, 2, 3
+PIECE_KEYS = [[_rng.getrandbits(64) for _ in range(32)] for _ in range(4)]
+# XORed into the hash when red is to move
+SIDE_KEY = _rng.getrandbits(64)
+
+
+def piece_kind(player_color, king):
+    """
+    Function to get the index of a piece kind in PIECE_KEYS.
+    Args:
+        player_color (str): The color of the piece ('w' for white, 'r' for red).
+        king (bool): True if the piece is a king.
+    """
+    return (WHITE_MAN if player_color == 'w' else RED_MAN) + (1 if king else 0)
+
+
+def hash_masks(white, black, kings):
+    """
+    Function to compute the hash of a position from scratch.
+    Args:
+        white (int): Mask of the white pieces.
+        black (int): Mask of the red pieces.
+        kings (int): Mask of the kings of both colors.
+    Returns:
+        int: The 64-bit hash of the pieces.
+    """
+    key = 0
+    for kind, bits in ((WHITE_MAN, white & ~kings), (WHITE_KING, white & kings),
+                       (RED_MAN, black & ~kings), (RED_KING, black & kings)):
+        keys = PIECE_KEYS[kind]
+        while bits:
+            low = bits & -bits
+            key ^= keys[low.bit_length() - 1]
+            bits ^= low
+    return key
+
+
+def side_hash(key, player_color):
+    """
+    Function to add the side to move to the hash of the pieces.
+    Args:
+        key (int): The hash of the pieces.
+        player_color (str): The color of the player to move ('w' for white, 'r' for red).
+    """
+    return key ^ SIDE_KEY if player_color == 'r' else key